@@ -0,0 +1,156 @@
+"""
+Time the dashboard read queries on a large SQLite history with and without
+the timestamp indexes added by schema migration 3, then compare downsampling
+the whole history from raw rows against the rollup tiers.
+
+The database is seeded with N aggregate rows at 30s spacing (about a year at
+the default interval for N=1,000,000), three dns_measurements rows per cycle
+and one speedtest per hour. Each helper is then timed on the unindexed tables,
+the indexes are created through migrate_time_indexes and the timings repeated.
+Finally the rollups are backfilled and a 720-point view of the full history
+is bucketed from raw rows and from the rollup tier, as /api/score/recent does.
+
+Usage:
+    python benchmarks/bench_db_queries.py [rows]
+"""
+
+import random
+import sqlite3
+import sys
+import time
+
+from benchutil import load_app, timed
+
+INDEXES = (
+    "idx_measurements_ts",
+    "idx_dns_measurements_ts_server",
+    "idx_dns_queries_ts",
+    "idx_dns_queries_server_ts",
+    "idx_ping_samples_ts",
+    "idx_ping_samples_host_ts",
+    "idx_speedtests_ts",
+)
+DNS_SERVERS = ("1.1.1.1", "8.8.8.8", "9.9.9.9")
+BATCH = 50000
+
+
+def seed(db_path, rows):
+    conn = sqlite3.connect(db_path)
+    for name in INDEXES:
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+    start_ts = int(time.time()) - rows * 30
+    rng = random.Random(1)
+    for offset in range(0, rows, BATCH):
+        batch = range(offset, min(rows, offset + BATCH))
+        conn.executemany(
+            """
+            INSERT INTO measurements
+            (ts, avg_latency_ms, avg_jitter_ms, avg_loss_pct,
+             avg_dns_latency_ms, score)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            [
+                (start_ts + i * 30, rng.uniform(5, 40), rng.uniform(0, 5), 0.0,
+                 rng.uniform(5, 60), rng.uniform(80, 100))
+                for i in batch
+            ],
+        )
+        conn.executemany(
+            """
+            INSERT INTO dns_measurements
+            (ts, server_ip, latency_ms, queries, success_pct, p95_ms)
+            VALUES (?, ?, ?, 3, 100.0, ?)
+            """,
+            [
+                (start_ts + i * 30, server, rng.uniform(5, 60), rng.uniform(5, 90))
+                for i in batch
+                for server in DNS_SERVERS
+            ],
+        )
+        conn.executemany(
+            """
+            INSERT INTO speedtests (ts, ping_ms, download_mbps, upload_mbps)
+            VALUES (?, ?, ?, ?)
+            """,
+            [
+                (start_ts + i * 30, rng.uniform(5, 30), rng.uniform(100, 900),
+                 rng.uniform(20, 100))
+                for i in batch
+                if i % 120 == 0
+            ],
+        )
+        conn.commit()
+    conn.close()
+
+
+def run_queries(app):
+    recent = app.fetch_recent(2880)
+    first_ts, last_ts = recent[0][0], recent[-1][0]
+    queries = (
+        ("fetch_recent(2880)", lambda: app.fetch_recent(2880), 5),
+        ("fetch_latest()", app.fetch_latest, 20),
+        ("fetch_dns_for_range(2880 cycles)",
+         lambda: app.fetch_dns_for_range(first_ts, last_ts), 3),
+        ("fetch_speedtests(100)", lambda: app.fetch_speedtests(100), 20),
+        ("fetch_latest_speedtest()", app.fetch_latest_speedtest, 20),
+    )
+    return {label: timed(func, repeat)[0] for label, func, repeat in queries}
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    # A day-long interval keeps the app's own probe loop from writing while
+    # the history is seeded and migrated.
+    app = load_app(PROBE_INTERVAL=86400)
+
+    seed_start = time.perf_counter()
+    seed(app.DB_PATH, rows)
+    print(
+        f"seeded {rows} measurements, {rows * len(DNS_SERVERS)} dns rows "
+        f"in {time.perf_counter() - seed_start:.1f}s"
+    )
+
+    before = run_queries(app)
+
+    conn = app.get_db_connection()
+    try:
+        index_start = time.perf_counter()
+        app.migrate_time_indexes(conn.cursor())
+        conn.commit()
+        print(f"created indexes in {time.perf_counter() - index_start:.1f}s")
+    finally:
+        conn.close()
+
+    after = run_queries(app)
+
+    print(f"{'query':<36}{'no index':>12}{'indexed':>12}")
+    for label, seconds in before.items():
+        print(
+            f"{label:<36}{seconds * 1000:>10.2f}ms{after[label] * 1000:>10.2f}ms"
+        )
+
+    conn = app.get_db_connection()
+    try:
+        backfill_start = time.perf_counter()
+        app.migrate_backfill_rollups(conn.cursor())
+        conn.commit()
+        print(f"backfilled rollups in {time.perf_counter() - backfill_start:.1f}s")
+    finally:
+        conn.close()
+
+    first_ts, last_ts = app.fetch_recent_window(rows)
+    bucket = app.align_bucket_to_rollups((last_ts - first_ts + 1) // 720)
+    raw_seconds = timed(
+        lambda: app.fetch_raw_measurement_buckets(first_ts, last_ts, bucket), 3
+    )[0]
+    tier_seconds = timed(
+        lambda: app.fetch_measurement_buckets(first_ts, last_ts, bucket), 3
+    )[0]
+    print(
+        f"full history in {bucket}s buckets: raw={raw_seconds * 1000:.2f}ms "
+        f"rollup={tier_seconds * 1000:.2f}ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
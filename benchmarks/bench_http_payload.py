@@ -0,0 +1,120 @@
+"""
+Compare the bytes the dashboard endpoints send before and after HTTP caching
+and compression.
+
+The database is seeded with N probe cycles at 30s spacing (three DNS servers
+each) and one speedtest per hour. For each endpoint the script reports the
+identity payload (what every poll used to transfer), the gzip and, when the
+optional brotli package is installed, brotli payloads, and the size and time
+of a repeat poll that presents the ETag of the first response and gets
+304 Not Modified back.
+
+Usage:
+    python benchmarks/bench_http_payload.py [cycles]
+"""
+
+import random
+import sqlite3
+import sys
+import time
+
+from benchutil import load_app, timed
+
+DNS_SERVERS = ("1.1.1.1", "8.8.8.8", "9.9.9.9")
+
+
+def seed(db_path, cycles):
+    conn = sqlite3.connect(db_path)
+    start_ts = int(time.time()) - cycles * 30
+    rng = random.Random(1)
+    conn.executemany(
+        """
+        INSERT INTO measurements
+        (ts, avg_latency_ms, avg_jitter_ms, avg_loss_pct,
+         avg_dns_latency_ms, score)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """,
+        [
+            (start_ts + i * 30, rng.uniform(5, 40), rng.uniform(0, 5), 0.0,
+             rng.uniform(5, 60), rng.uniform(80, 100))
+            for i in range(cycles)
+        ],
+    )
+    conn.executemany(
+        """
+        INSERT INTO dns_measurements
+        (ts, server_ip, latency_ms, queries, success_pct, p95_ms)
+        VALUES (?, ?, ?, 3, 100.0, ?)
+        """,
+        [
+            (start_ts + i * 30, server, rng.uniform(5, 60), rng.uniform(5, 90))
+            for i in range(cycles)
+            for server in DNS_SERVERS
+        ],
+    )
+    conn.executemany(
+        """
+        INSERT INTO speedtests
+        (ts, ping_ms, download_mbps, upload_mbps, server_id, server_name,
+         server_host, server_country, backend)
+        VALUES (?, ?, ?, ?, '12345', 'Example ISP', 'speed.example.com:8080',
+                'US', 'python')
+        """,
+        [
+            (start_ts + i * 30, rng.uniform(5, 30), rng.uniform(100, 900),
+             rng.uniform(20, 100))
+            for i in range(cycles)
+            if i % 120 == 0
+        ],
+    )
+    conn.commit()
+    conn.close()
+
+
+def main():
+    cycles = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    app = load_app(PROBE_INTERVAL=86400)
+    seed(app.DB_PATH, cycles)
+    # The rows were written behind the app's back; reload its hot window.
+    app.load_hot_window()
+
+    client = app.app.test_client()
+    html = client.get("/").get_data(as_text=True)
+    urls = [
+        f"/api/score/recent?limit={cycles}",
+        f"/api/speedtest/history?limit={cycles}",
+    ]
+    urls += [
+        part.split('"')[0]
+        for part in html.split('src="')[1:]
+        if part.startswith("/static/")
+    ]
+    encodings = ["identity", "gzip"] + (["br"] if app.brotli else [])
+
+    print(
+        f"{'url':<44}"
+        + "".join(f"{encoding:>12}" for encoding in encodings)
+        + f"{'304 poll':>12}{'200 ms':>10}{'304 ms':>10}"
+    )
+    for url in urls:
+        sizes = [
+            len(client.get(url, headers={"Accept-Encoding": encoding}).data)
+            for encoding in encodings
+        ]
+        first = client.get(url)
+        etag = first.headers["ETag"]
+        revalidate = client.get(url, headers={"If-None-Match": etag})
+        full_seconds = timed(lambda: client.get(url), 5)[0]
+        not_modified_seconds = timed(
+            lambda: client.get(url, headers={"If-None-Match": etag}), 20
+        )[0]
+        print(
+            f"{url.split('?v=')[0]:<44}"
+            + "".join(f"{size:>12}" for size in sizes)
+            + f"{revalidate.status_code:>6} {len(revalidate.data):>4}B"
+            + f"{full_seconds * 1000:>10.2f}{not_modified_seconds * 1000:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
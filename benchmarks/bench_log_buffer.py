@@ -0,0 +1,125 @@
+"""
+Measure the live log buffer under concurrent readers.
+
+One writer thread emits log records through the app's InMemoryLogHandler
+while R reader threads tail the buffer the way browser tabs poll
+/api/logs/live (a small ``since`` delta each time). The same run is repeated
+against a copy of the previous implementation, a lock-guarded deque that
+every reader scanned in full. The script reports the mean and p99 time of
+one emit (how long a probe thread is held up by logging) and the mean
+reader call time for both.
+
+Usage:
+    python benchmarks/bench_log_buffer.py [readers] [seconds]
+"""
+
+import logging
+import sys
+import threading
+import time
+from collections import deque
+
+from benchutil import load_app
+
+
+class LegacyLogHandler(logging.Handler):
+    """The deque + full-scan buffer get_live_logs used to read."""
+
+    def __init__(self, size):
+        super().__init__()
+        self.buffer = deque(maxlen=size)
+        self.buffer_lock = threading.Lock()
+        self.sequence = 0
+
+    def emit(self, record):
+        try:
+            line = self.format(record)
+        except Exception:
+            line = record.getMessage()
+        with self.buffer_lock:
+            self.sequence += 1
+            self.buffer.append({"seq": self.sequence, "line": line})
+
+    def read(self, since_seq, limit):
+        with self.buffer_lock:
+            lines = [entry for entry in self.buffer if entry["seq"] > since_seq]
+            if len(lines) > limit:
+                lines = lines[-limit:]
+            next_seq = self.sequence
+        return {"lines": [entry["line"] for entry in lines], "next_seq": next_seq}
+
+
+def run(emit, read, readers, seconds):
+    stop = threading.Event()
+    emit_times = []
+    reads = []
+
+    def writer():
+        count = 0
+        while not stop.is_set():
+            started = time.perf_counter()
+            emit(f"Probe ts={count} score=99.0 loss=0.00% latency=10.0ms")
+            emit_times.append(time.perf_counter() - started)
+            count += 1
+
+    def reader():
+        calls, busy, since = 0, 0.0, 0
+        while not stop.is_set():
+            started = time.perf_counter()
+            since = read(since, 120)["next_seq"]
+            busy += time.perf_counter() - started
+            calls += 1
+        reads.append((calls, busy))
+
+    for _ in range(1000):
+        emit("warm-up line")
+    threads = [threading.Thread(target=writer)]
+    threads += [threading.Thread(target=reader) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    emit_times.sort()
+    calls = sum(count for count, _ in reads)
+    busy = sum(seconds_spent for _, seconds_spent in reads)
+    return (
+        sum(emit_times) / len(emit_times) * 1e6,
+        emit_times[int(len(emit_times) * 0.99)] * 1e6,
+        busy / max(1, calls) * 1e6,
+    )
+
+
+def main():
+    readers = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 3.0
+    app = load_app(PROBE_INTERVAL=86400)
+
+    record = logging.LogRecord("netprobe", logging.INFO, __file__, 0, "", (), None)
+
+    def emitter(handler):
+        def emit(line):
+            record.msg = line
+            handler.emit(record)
+
+        return emit
+
+    legacy = LegacyLogHandler(app.LOG_BUFFER_MAX_LINES)
+    legacy.setFormatter(app.live_log_handler.formatter)
+    results = (
+        ("deque + full scan", run(emitter(legacy), legacy.read, readers, seconds)),
+        (
+            "sequence ring",
+            run(emitter(app.live_log_handler), app.get_live_logs, readers, seconds),
+        ),
+    )
+
+    print(f"{readers} readers, {app.LOG_BUFFER_MAX_LINES}-line buffer, {seconds:.0f}s each")
+    print(f"{'buffer':<20}{'emit us':>10}{'emit p99':>10}{'read us':>10}")
+    for label, (emit_us, emit_p99_us, read_us) in results:
+        print(f"{label:<20}{emit_us:>10.1f}{emit_p99_us:>10.1f}{read_us:>10.1f}")
+
+if __name__ == "__main__":
+    main()
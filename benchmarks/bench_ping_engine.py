@@ -0,0 +1,97 @@
+"""
+Compare the per-cycle overhead of the ping subprocess path and the native
+ICMP engine.
+
+The subprocess path pays one fork/exec plus stdout parsing per target. The
+native engine sends every echo from one socket. Targets are loopback
+addresses so network latency does not dominate; the interesting numbers are
+the CPU time per cycle and the spawn cost the native engine no longer pays.
+
+Usage:
+    python benchmarks/bench_ping_engine.py [targets]
+
+The native half needs either net.ipv4.ping_group_range to include the current
+group or CAP_NET_RAW; it is skipped otherwise.
+"""
+
+import resource
+import shutil
+import subprocess
+import sys
+
+from benchutil import load_app, timed
+
+SAMPLE_PING_OUTPUT = """PING 127.0.0.1 (127.0.0.1) 56(84) bytes of data.
+
+--- 127.0.0.1 ping statistics ---
+1 packets transmitted, 1 received, 0% packet loss, time 0ms
+rtt min/avg/max/mdev = 0.045/0.045/0.045/0.000 ms
+"""
+
+
+def children_cpu():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def main():
+    target_count = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+    app = load_app()
+    targets = [f"127.0.0.{i}" for i in range(1, target_count + 1)]
+
+    # Fork/exec cost: start the ping binary without sending anything so only
+    # process creation is measured. Fall back to `true` when ping is missing.
+    ping_binary = shutil.which("ping")
+    spawn_command = [ping_binary, "-V"] if ping_binary else ["true"]
+    child_cpu_before = children_cpu()
+    spawn_wall, spawn_cpu = timed(
+        lambda: [
+            subprocess.run(spawn_command, capture_output=True, check=False)
+            for _ in targets
+        ]
+    )
+    spawn_cpu += children_cpu() - child_cpu_before
+
+    # Parsing cost: feed run_ping a canned summary instead of spawning.
+    real_run = app.subprocess.run
+    app.subprocess.run = lambda *args, **kwargs: subprocess.CompletedProcess(
+        args, 0, SAMPLE_PING_OUTPUT, ""
+    )
+    try:
+        parse_wall, parse_cpu = timed(
+            lambda: [app.run_ping(host, 1) for host in targets], repeat=20
+        )
+    finally:
+        app.subprocess.run = real_run
+
+    print(f"targets: {target_count}")
+    print(
+        f"subprocess spawn ({' '.join(spawn_command)}): "
+        f"wall={spawn_wall * 1000:.1f}ms cpu={spawn_cpu * 1000:.1f}ms per cycle"
+    )
+    print(
+        f"subprocess output parsing: wall={parse_wall * 1000:.2f}ms "
+        f"cpu={parse_cpu * 1000:.2f}ms per cycle"
+    )
+
+    sock, kind = app.open_icmp_socket()
+    if sock is None:
+        print("native ICMP engine: skipped (no ICMP socket permission)")
+        return
+    sock.close()
+
+    native_wall, native_cpu = timed(lambda: app.run_icmp_probe(targets, 1), repeat=3)
+    results = app.run_icmp_probe(targets, 1)
+    replies = sum(len(result.get("rtts", [])) for result in results)
+    print(
+        f"native ICMP engine ({kind} socket): wall={native_wall * 1000:.1f}ms "
+        f"cpu={native_cpu * 1000:.2f}ms per cycle, "
+        f"{replies}/{target_count} replies"
+    )
+    print(
+        f"CPU saved per cycle: {(spawn_cpu + parse_cpu - native_cpu) * 1000:.1f}ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Shared helpers for the NetProbe benchmark scripts.
+
+The benchmarks import ``probe/app.py`` directly. Importing the app creates the
+schema and starts the probe loop, so ``load_app`` points the database at a
+throwaway SQLite file and empties the target lists before the import to keep
+the background loop from adding network noise to the measurements.
+"""
+
+import logging
+import os
+import sys
+import tempfile
+import time
+
+PROBE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "probe")
+
+
+def load_app(**env):
+    """Import ``probe/app.py`` with quiet, self-contained settings."""
+    workdir = tempfile.mkdtemp(prefix="netprobe-bench-")
+    defaults = {
+        "DB_ENGINE": "sqlite",
+        "DB_PATH": os.path.join(workdir, "netprobe.sqlite"),
+        "SITES": "",
+        "ROUTER_IP": "",
+        "SPEEDTEST_ENABLED": "false",
+    }
+    for i in range(1, 5):
+        defaults[f"DNS_NAMESERVER_{i}_IP"] = ""
+    defaults.update(env)
+    os.environ.update({key: str(value) for key, value in defaults.items()})
+
+    sys.path.insert(0, os.path.abspath(PROBE_DIR))
+    import app  # noqa: E402
+
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger("netprobe").setLevel(logging.WARNING)
+    return app
+
+
+def timed(func, repeat=1):
+    """Return ``(wall_seconds, cpu_seconds)`` per call averaged over ``repeat``."""
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    for _ in range(repeat):
+        func()
+    return (
+        (time.perf_counter() - wall_start) / repeat,
+        (time.process_time() - cpu_start) / repeat,
+    )
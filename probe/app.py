@@ -1,18 +1,37 @@
+import bisect
+import copy
+import fcntl
+import functools
+import gzip
+import hashlib
+import itertools
 import json
 import logging
+import math
 import os
+import queue
 import re
+import select
 import shutil
+import socket
 import sqlite3
 import statistics
+import struct
 import subprocess
 import threading
 import time
 from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime, timezone
 
-from flask import Flask, jsonify, render_template, request
-import dns.resolver
+from flask import Flask, Response, jsonify, make_response, render_template, request
+from werkzeug.security import safe_join
+import dns.inet
+import dns.exception
+import dns.message
+import dns.query
+import dns.rcode
+import dns.rdatatype
 import speedtest
 
 try:
@@ -20,6 +39,11 @@ try:
 except ImportError:
     psycopg2 = None
 
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
 # -------------------------
 # Logging setup
 # -------------------------
@@ -41,10 +65,161 @@ if not logger.handlers:
 # We keep a rolling in-memory copy as well so the web UI can "tail" recent
 # activity without changing the Docker logging driver or shelling out to
 # docker logs from inside the container.
-LOG_BUFFER_MAX_LINES = 1000
-LOG_BUFFER = deque(maxlen=LOG_BUFFER_MAX_LINES)
+#
+# Lines live in a ring indexed by sequence number: line ``seq`` sits in slot
+# ``seq % LOG_BUFFER_MAX_LINES``. Writers fill the slot before publishing the
+# new LOG_SEQUENCE, so readers never take the lock. A tail read walks only
+# the slots it returns and skips any that a writer has since overwritten.
+#
+# Each line is also kept as a structured record (time, level, logger,
+# component, message and the key=value fields in it). Writers only store the
+# raw message and the record attributes needed later; the component, fields
+# and search index are filled in by the first reader that asks for them, so
+# logging from a probe thread costs little more than formatting the line.
+try:
+    LOG_BUFFER_MAX_LINES = max(1, int(os.getenv("LIVE_LOG_BUFFER_LINES", "1000")))
+except (TypeError, ValueError):
+    LOG_BUFFER_MAX_LINES = 1000
+LOG_BUFFER = [None] * LOG_BUFFER_MAX_LINES
 LOG_BUFFER_LOCK = threading.Lock()
 LOG_SEQUENCE = 0
+# Search index over the ring, brought up to date by filtered readers under
+# LOG_INDEX_LOCK (writers never take it). Each index maps a key to the set of
+# seqs carrying it; LOG_TOKENS keeps the token keys sorted for prefix lookups
+# and LOG_INDEXED the keys of every indexed seq so it can be dropped again.
+LOG_INDEX_LOCK = threading.Lock()
+LOG_INDEXED_SEQ = 0
+LOG_INDEXED = {}
+LOG_LEVEL_INDEX = {}
+LOG_COMPONENT_INDEX = {}
+LOG_TOKEN_INDEX = {}
+LOG_TOKENS = []
+
+# Component of a record, matched in order against its message template
+# (record.msg) unless the call passes extra={"component": ...}.
+LOG_COMPONENT_PATTERNS = (
+    ("speedtest", re.compile(r"speedtest|ookla", re.IGNORECASE)),
+    ("dns", re.compile(r"^dns\b|\bdns (query|phase)", re.IGNORECASE)),
+    ("ping", re.compile(r"\bping\b|icmp", re.IGNORECASE)),
+    (
+        "db",
+        re.compile(
+            r"sqlite|postgres|database|schema|partition|retention|hot window",
+            re.IGNORECASE,
+        ),
+    ),
+    ("probe", re.compile(r"^probe|^targets|cycle (failed|took)|gateway", re.IGNORECASE)),
+    ("web", re.compile(r"^http|^live ", re.IGNORECASE)),
+)
+LOG_COMPONENTS = tuple(name for name, _ in LOG_COMPONENT_PATTERNS) + ("app",)
+LOG_COMPONENT_CACHE = {}
+LOG_FIELD_RE = re.compile(r"(\w+)=([^\s,;()]+)")
+LOG_NUMBER_RE = re.compile(r"^(-?\d+(?:\.\d+)?)(?:ms|%|mbps|s|mb)?$", re.IGNORECASE)
+LOG_TOKEN_RE = re.compile(r"[\w.:-]+")
+# Attributes a call can attach with extra={...} to add or override fields.
+LOG_EXTRA_FIELDS = ("host", "server", "domain")
+
+
+# -------------------------
+# Live event hub
+# -------------------------
+#
+# New probe cycles, speedtest results and log lines are published here as
+# they are produced and fanned out to every open /api/events stream, so
+# browsers get live updates pushed instead of polling the database. Each
+# stream has its own bounded queue; a client that falls that far behind is
+# dropped and catches up through the regular APIs when it reconnects.
+EVENT_QUEUE_MAX = 500
+EVENT_SUBSCRIBERS = set()
+EVENT_SUBSCRIBERS_LOCK = threading.Lock()
+
+
+def subscribe_events(max_clients):
+    """Open a queue for a new stream, or return None if max_clients are open."""
+    with EVENT_SUBSCRIBERS_LOCK:
+        if len(EVENT_SUBSCRIBERS) >= max_clients:
+            return None
+        events = queue.Queue(maxsize=EVENT_QUEUE_MAX)
+        EVENT_SUBSCRIBERS.add(events)
+    return events
+
+
+def unsubscribe_events(events):
+    with EVENT_SUBSCRIBERS_LOCK:
+        EVENT_SUBSCRIBERS.discard(events)
+
+
+def publish_event(kind, payload):
+    """Queue ``payload`` as an SSE event of type ``kind`` for every stream."""
+    with EVENT_SUBSCRIBERS_LOCK:
+        subscribers = list(EVENT_SUBSCRIBERS)
+    if not subscribers:
+        return
+    message = f"event: {kind}\ndata: {json.dumps(payload)}\n\n"
+    for events in subscribers:
+        try:
+            events.put_nowait(message)
+        except queue.Full:
+            unsubscribe_events(events)
+
+
+def log_component(template):
+    """Component whose pattern matches a message template, else "app"."""
+    template = str(template)
+    component = LOG_COMPONENT_CACHE.get(template)
+    if component is None:
+        component = next(
+            (name for name, pattern in LOG_COMPONENT_PATTERNS if pattern.search(template)),
+            "app",
+        )
+        if len(LOG_COMPONENT_CACHE) < 1000:
+            LOG_COMPONENT_CACHE[template] = component
+    return component
+
+
+def log_fields(message, extras):
+    """key=value pairs in the message (numbers as floats) plus extra fields."""
+    fields = {}
+    for key, value in LOG_FIELD_RE.findall(message):
+        number = LOG_NUMBER_RE.match(value)
+        fields[key] = float(number.group(1)) if number else value
+    fields.update(extras)
+    return fields
+
+
+def log_entry(item):
+    """
+    Structured record of a ring slot, built from the raw values emit stored.
+
+    The first reader to ask builds it and keeps it in the slot. Readers racing
+    on the same slot build equal records and either one may be kept.
+    """
+    entry = item[2]
+    if entry is None:
+        created, levelname, name, message, _, template, component, extras = item[3]
+        entry = {
+            "seq": item[0],
+            "ts": round(created, 3),
+            "level": levelname,
+            "logger": name,
+            "component": component or log_component(template),
+            "message": message,
+            "fields": log_fields(message, extras),
+            "line": item[1],
+        }
+        item[2] = entry
+    return entry
+
+
+def parse_log_level(value):
+    """Level name or number to a levelno, or None."""
+    value = str(value or "").strip()
+    if not value:
+        return None
+    if value.isdigit():
+        return int(value)
+    level = logging.getLevelName(value.upper())
+    return level if isinstance(level, int) else None
 
 
 class InMemoryLogHandler(logging.Handler):
@@ -52,11 +227,35 @@ class InMemoryLogHandler(logging.Handler):
         global LOG_SEQUENCE
         try:
             line = self.format(record)
+            # Formatter.format() leaves the merged message on the record.
+            message = record.message
         except Exception:
-            line = record.getMessage()
+            line = message = str(record.msg)
+        extras = {}
+        for key in LOG_EXTRA_FIELDS:
+            value = getattr(record, key, None)
+            if value is not None:
+                extras[key] = value
+        raw = (
+            record.created,
+            record.levelname,
+            record.name,
+            message,
+            record.levelno,
+            record.msg,
+            getattr(record, "component", None),
+            extras,
+        )
+
+        # The lock only orders writers; unfiltered readers never wait on it.
+        # Slots are [seq, line, structured record or None, raw values].
         with LOG_BUFFER_LOCK:
-            LOG_SEQUENCE += 1
-            LOG_BUFFER.append({"seq": LOG_SEQUENCE, "line": line})
+            seq = LOG_SEQUENCE + 1
+            item = [seq, line, None, raw]
+            LOG_BUFFER[seq % LOG_BUFFER_MAX_LINES] = item
+            LOG_SEQUENCE = seq
+        if EVENT_SUBSCRIBERS:
+            publish_event("log", log_entry(item))
 
 
 live_log_handler = InMemoryLogHandler()
@@ -65,12 +264,67 @@ live_log_handler.setFormatter(logging.Formatter("%(asctime)s [%(levelname)s] %(m
 logging.getLogger().addHandler(live_log_handler)
 
 
-def get_live_logs(since_seq=0, limit=250):
+def discard_log_key(index, key, seq):
+    seqs = index[key]
+    seqs.discard(seq)
+    if not seqs:
+        del index[key]
+        if index is LOG_TOKEN_INDEX:
+            del LOG_TOKENS[bisect.bisect_left(LOG_TOKENS, key)]
+
+
+def unindex_log_seq(seq):
+    keys = LOG_INDEXED.pop(seq, None)
+    if keys is None:
+        return
+    levelno, component, tokens = keys
+    discard_log_key(LOG_LEVEL_INDEX, levelno, seq)
+    discard_log_key(LOG_COMPONENT_INDEX, component, seq)
+    for token in tokens:
+        discard_log_key(LOG_TOKEN_INDEX, token, seq)
+
+
+def index_log_seq(item):
+    seq, entry = item[0], log_entry(item)
+    tokens = frozenset(LOG_TOKEN_RE.findall(entry["message"].lower()))
+    keys = (item[3][4], entry["component"], tokens)
+    LOG_INDEXED[seq] = keys
+    LOG_LEVEL_INDEX.setdefault(keys[0], set()).add(seq)
+    LOG_COMPONENT_INDEX.setdefault(keys[1], set()).add(seq)
+    for token in keys[2]:
+        seqs = LOG_TOKEN_INDEX.get(token)
+        if seqs is None:
+            seqs = LOG_TOKEN_INDEX[token] = set()
+            bisect.insort(LOG_TOKENS, token)
+        seqs.add(seq)
+
+
+def update_log_index(next_seq):
+    """Index lines up to ``next_seq`` and drop the ones the ring has overwritten."""
+    global LOG_INDEXED_SEQ
+    oldest = next_seq - LOG_BUFFER_MAX_LINES
+    first_indexed = max(0, LOG_INDEXED_SEQ - LOG_BUFFER_MAX_LINES) + 1
+    for seq in range(first_indexed, min(oldest, LOG_INDEXED_SEQ) + 1):
+        unindex_log_seq(seq)
+    for seq in range(max(LOG_INDEXED_SEQ, oldest) + 1, next_seq + 1):
+        item = LOG_BUFFER[seq % LOG_BUFFER_MAX_LINES]
+        if item is not None and item[0] == seq:
+            index_log_seq(item)
+    LOG_INDEXED_SEQ = max(LOG_INDEXED_SEQ, next_seq)
+
+
+def get_live_logs(since_seq=0, limit=250, level=None, component=None, query=None):
     """
     Return buffered log lines newer than the provided sequence number.
 
     The caller passes the last seen sequence number and gets back only the new
     lines plus the newest sequence marker to continue tailing from the UI.
+    ``records`` holds the same lines as structured records.
+
+    Optional filters, evaluated against the search index:
+    - level: minimum level name or number (``warning`` keeps WARNING and up)
+    - component: one of LOG_COMPONENTS
+    - query: words that must all start a token of the message
     """
     try:
         since_seq = int(since_seq)
@@ -84,14 +338,45 @@ def get_live_logs(since_seq=0, limit=250):
 
     limit = max(1, min(limit, LOG_BUFFER_MAX_LINES))
 
-    with LOG_BUFFER_LOCK:
-        lines = [entry for entry in LOG_BUFFER if entry["seq"] > since_seq]
-        if len(lines) > limit:
-            lines = lines[-limit:]
-        next_seq = LOG_SEQUENCE
+    min_level = parse_log_level(level)
+    component = str(component or "").strip().lower()
+    terms = LOG_TOKEN_RE.findall(str(query or "").lower())
+
+    next_seq = LOG_SEQUENCE
+    if min_level is not None or component or terms:
+        with LOG_INDEX_LOCK:
+            update_log_index(next_seq)
+            # One candidate set per filter; a record must be in all of them.
+            candidates = []
+            if min_level is not None:
+                found = set()
+                for levelno, seqs in LOG_LEVEL_INDEX.items():
+                    if levelno >= min_level:
+                        found.update(seqs)
+                candidates.append(found)
+            if component:
+                candidates.append(set(LOG_COMPONENT_INDEX.get(component, ())))
+            for term in terms:
+                found = set()
+                position = bisect.bisect_left(LOG_TOKENS, term)
+                while position < len(LOG_TOKENS) and LOG_TOKENS[position].startswith(term):
+                    found.update(LOG_TOKEN_INDEX[LOG_TOKENS[position]])
+                    position += 1
+                candidates.append(found)
+        matches = set.intersection(*candidates)
+        seqs = sorted(seq for seq in matches if since_seq < seq <= next_seq)[-limit:]
+    else:
+        seqs = range(max(since_seq, next_seq - limit) + 1, next_seq + 1)
+
+    records = []
+    for seq in seqs:
+        item = LOG_BUFFER[seq % LOG_BUFFER_MAX_LINES]
+        if item is not None and item[0] == seq:
+            records.append(log_entry(item))
 
     return {
-        "lines": [entry["line"] for entry in lines],
+        "lines": [record["line"] for record in records],
+        "records": records,
         "next_seq": next_seq,
         "buffer_size": LOG_BUFFER_MAX_LINES,
     }
@@ -143,6 +428,14 @@ def normalize_speedtest_backend(value, variable_name="SPEEDTEST_BACKEND"):
     return aliases[normalized]
 
 
+def parse_int_env(name, default, minimum=1):
+    """Parse an integer env var, falling back to ``default`` when invalid."""
+    try:
+        return max(minimum, int(os.getenv(name, str(default))))
+    except (TypeError, ValueError):
+        return default
+
+
 def parse_csv_env(name, default=""):
     """
     Parse a comma-separated environment variable into a clean list.
@@ -194,6 +487,62 @@ def parse_speedtest_server_list(raw_value, variable_name, allow_count_prefix=Fal
     return unique_ids
 
 
+def parse_probe_target_schedules(raw_value, variable_name):
+    """
+    Parse per-target probe schedule overrides.
+
+    Entries are comma-separated ``host=interval`` or ``host=interval/count``
+    pairs, for example ``192.168.1.1=5/1,fast.com=60``. Returns
+    ``{host: (interval_seconds, ping_count_or_None)}``.
+    """
+    schedules = {}
+    for item in str(raw_value or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        host, separator, spec = item.partition("=")
+        interval_text, _slash, count_text = spec.strip().partition("/")
+        host = host.strip()
+        if (
+            not separator
+            or not host
+            or not interval_text.strip().isdigit()
+            or (count_text and not count_text.strip().isdigit())
+        ):
+            raise ValueError(
+                f"{variable_name} entries must look like host=interval or "
+                f"host=interval/count, got {item!r}"
+            )
+        interval = int(interval_text)
+        count = int(count_text) if count_text else None
+        if interval < 1 or (count is not None and count < 1):
+            raise ValueError(f"{variable_name} values must be positive: {item!r}")
+        schedules[host] = (interval, count)
+    return schedules
+
+
+def parse_retention_days(raw_value, variable_name, allowed_keys):
+    """
+    Parse per-table retention, e.g. ``measurements=14,rollups_1m=30``.
+
+    Returns ``{key: days}``; 0 days keeps the rows forever.
+    """
+    retention = {}
+    for item in str(raw_value or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        key, separator, days = item.partition("=")
+        key = key.strip().lower()
+        if not separator or key not in allowed_keys or not days.strip().isdigit():
+            raise ValueError(
+                f"{variable_name} entries must look like table=days with table "
+                f"one of {', '.join(allowed_keys)}, got {item!r}"
+            )
+        retention[key] = int(days)
+    return retention
+
+
 # -------------------------
 # Config from environment
 # -------------------------
@@ -220,16 +569,115 @@ if DB_ENGINE not in ("sqlite", "postgres"):
 
 USING_POSTGRES = DB_ENGINE == "postgres"
 
-PROBE_INTERVAL = int(os.getenv("PROBE_INTERVAL", "30"))
+# SQLite tuning applied to every connection (the database runs in WAL mode).
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL").strip().upper()
+if SQLITE_SYNCHRONOUS not in ("OFF", "NORMAL", "FULL", "EXTRA"):
+    SQLITE_SYNCHRONOUS = "NORMAL"
+SQLITE_MMAP_SIZE_MB = parse_int_env("SQLITE_MMAP_SIZE_MB", 256, minimum=0)
+
+# Postgres connection pool. Connections are opened lazily up to DB_POOL_SIZE;
+# callers wait up to DB_POOL_TIMEOUT seconds for a free one. Connections that
+# sat idle longer than DB_POOL_HEALTHCHECK_SECONDS are pinged before reuse.
+DB_POOL_SIZE = parse_int_env("DB_POOL_SIZE", 5)
+DB_POOL_TIMEOUT = parse_int_env("DB_POOL_TIMEOUT", 30)
+DB_POOL_HEALTHCHECK_SECONDS = parse_int_env(
+    "DB_POOL_HEALTHCHECK_SECONDS", 30, minimum=0
+)
+
+# Postgres time-series tables are range-partitioned on ts by calendar month
+# (UTC) or by week, with POSTGRES_PARTITIONS_AHEAD future partitions created in
+# advance.
+POSTGRES_PARTITION_INTERVAL = (
+    os.getenv("POSTGRES_PARTITION_INTERVAL", "month").strip().lower()
+)
+if POSTGRES_PARTITION_INTERVAL not in ("month", "week"):
+    POSTGRES_PARTITION_INTERVAL = "month"
+POSTGRES_PARTITIONS_AHEAD = parse_int_env("POSTGRES_PARTITIONS_AHEAD", 2)
+
+# Retention: days to keep per table (0 or unset = forever). rollups_* apply
+# to both measurement_rollups and dns_rollups of that tier. Pruning runs every
+# RETENTION_INTERVAL seconds in chunks of RETENTION_CHUNK_ROWS rows.
+RETENTION_KEYS = (
+    "measurements",
+    "dns_measurements",
+    "dns_queries",
+    "ping_samples",
+    "speedtests",
+    "rollups_1m",
+    "rollups_1h",
+    "rollups_1d",
+)
+RETENTION_DAYS = parse_retention_days(
+    os.getenv("RETENTION_DAYS", ""), "RETENTION_DAYS", RETENTION_KEYS
+)
+# Hourly and daily rollups are rebuilt from raw rows, so raw aggregates must
+# outlive the current day.
+for _key in ("measurements", "dns_measurements"):
+    if 0 < RETENTION_DAYS.get(_key, 0) < 2:
+        RETENTION_DAYS[_key] = 2
+RETENTION_INTERVAL = parse_int_env("RETENTION_INTERVAL", 3600)
+RETENTION_CHUNK_ROWS = parse_int_env("RETENTION_CHUNK_ROWS", 5000)
+
+# Hot window: the newest HOT_WINDOW_CYCLES probe cycles and the latest
+# speedtest are kept in memory as they are written, so the recent/latest
+# endpoints skip the database when the request fits. 0 disables it.
+HOT_WINDOW_CYCLES = parse_int_env("HOT_WINDOW_CYCLES", 2880, minimum=0)
+
+PROBE_INTERVAL = parse_int_env("PROBE_INTERVAL", 30)
 PING_COUNT = int(os.getenv("PING_COUNT", "4"))
+
+# Maximum number of ping targets probed at the same time. Each ping blocks for
+# roughly PING_COUNT seconds, so running them side by side keeps the whole ping
+# phase close to a single target's duration. Set to 1 for sequential pings.
+PING_CONCURRENCY = parse_int_env("PING_CONCURRENCY", 16)
+
 APP_TIMEZONE = os.getenv("APP_TIMEZONE", "UTC")
 
+# Ping engine selector:
+# - auto/native: send ICMP echoes in-process from one socket (unprivileged
+#   datagram ICMP socket when net.ipv4.ping_group_range allows it, raw socket
+#   with CAP_NET_RAW otherwise) and fall back to ping subprocesses when neither
+#   socket can be opened.
+# - subprocess: always fork /bin/ping per target.
+PING_ENGINE = os.getenv("PING_ENGINE", "auto").strip().lower()
+if PING_ENGINE not in ("auto", "native", "subprocess"):
+    PING_ENGINE = "auto"
+
 # Ping targets used by the regular ICMP checks.
 SITES = parse_csv_env("SITES", "fast.com,google.com,youtube.com")
 
+# DNS phase concurrency and deadline. Every (server, domain) pair is measured
+# on its own worker; lookups still running when DNS_PHASE_TIMEOUT expires are
+# dropped so one dead resolver cannot stall the probe cycle.
+DNS_CONCURRENCY = parse_int_env("DNS_CONCURRENCY", 16)
+
+try:
+    DNS_PHASE_TIMEOUT = max(1.0, float(os.getenv("DNS_PHASE_TIMEOUT", "10")))
+except (TypeError, ValueError):
+    DNS_PHASE_TIMEOUT = 10.0
+
 # Optional router IP on the LAN.
 ROUTER_IP = os.getenv("ROUTER_IP", "").strip()
 
+# Per-class probe schedules. Each class can run on its own interval and packet
+# count; everything defaults to PROBE_INTERVAL / PING_COUNT. Targets that share
+# PROBE_INTERVAL are probed inside the main probe cycle, the others on their
+# own fixed-rate schedules. The aggregate score is still written every
+# PROBE_INTERVAL from the latest result of every target.
+GATEWAY_PROBE_INTERVAL = parse_int_env("GATEWAY_PROBE_INTERVAL", PROBE_INTERVAL)
+GATEWAY_PING_COUNT = parse_int_env("GATEWAY_PING_COUNT", PING_COUNT)
+ROUTER_PROBE_INTERVAL = parse_int_env("ROUTER_PROBE_INTERVAL", PROBE_INTERVAL)
+ROUTER_PING_COUNT = parse_int_env("ROUTER_PING_COUNT", PING_COUNT)
+SITES_PROBE_INTERVAL = parse_int_env("SITES_PROBE_INTERVAL", PROBE_INTERVAL)
+SITES_PING_COUNT = parse_int_env("SITES_PING_COUNT", PING_COUNT)
+DNS_PROBE_INTERVAL = parse_int_env("DNS_PROBE_INTERVAL", PROBE_INTERVAL)
+
+# Optional per-target overrides, e.g. PROBE_TARGET_SCHEDULES=8.8.8.8=10/2
+PROBE_TARGET_SCHEDULES = parse_probe_target_schedules(
+    os.getenv("PROBE_TARGET_SCHEDULES", ""),
+    "PROBE_TARGET_SCHEDULES",
+)
+
 # DNS lookup targets.
 #
 # Backward compatibility:
@@ -345,6 +793,12 @@ try:
 except (TypeError, ValueError):
     SPEEDTEST_OOKLA_TIMEOUT = 180
 
+# Speedtest client config and server lists are reused for this many seconds,
+# then refreshed in the background. 0 fetches them for every run.
+SPEEDTEST_SERVER_CACHE_SECONDS = parse_int_env(
+    "SPEEDTEST_SERVER_CACHE_SECONDS", 3600, minimum=0
+)
+
 # Optional preferred speedtest server.
 # Empty / unset means automatic server selection.
 SPEEDTEST_SERVER = os.getenv("SPEEDTEST_SERVER", "").strip()
@@ -376,12 +830,87 @@ try:
 except (TypeError, ValueError):
     LIVE_LOG_POLL_SECONDS = 2
 
+# Server-Sent Events stream (/api/events). Every open stream holds one web
+# worker thread, so LIVE_EVENTS_MAX_CLIENTS should stay below GUNICORN_THREADS;
+# browsers over the limit fall back to polling. Idle streams get a keepalive
+# comment every LIVE_EVENTS_KEEPALIVE_SECONDS so proxies leave them open.
+LIVE_EVENTS_MAX_CLIENTS = parse_int_env("LIVE_EVENTS_MAX_CLIENTS", 4, minimum=0)
+LIVE_EVENTS_KEEPALIVE_SECONDS = parse_int_env("LIVE_EVENTS_KEEPALIVE_SECONDS", 15)
+
+# Compress API responses and static assets for clients that accept it:
+# brotli when the optional brotli package is installed, gzip otherwise.
+HTTP_COMPRESSION = parse_bool_env("HTTP_COMPRESSION", True)
+
+# Which processes run the probe loop. auto: the first process to lock
+# PROBE_LOCK_PATH probes and the others (more Gunicorn workers) follow the
+# database, taking over if it exits. prober: wait for the lock, then probe
+# (a dedicated `python app.py` process). web: never probe.
+PROBE_ROLE = os.getenv("PROBE_ROLE", "auto").strip().lower()
+if PROBE_ROLE not in ("auto", "prober", "web"):
+    PROBE_ROLE = "auto"
+PROBE_LOCK_PATH = os.getenv("PROBE_LOCK_PATH", "").strip() or os.path.join(
+    os.path.dirname(DB_PATH) or ".", "netprobe-prober.lock"
+)
+# How often a process that is not probing reads new rows from the database.
+PROBE_FOLLOW_INTERVAL = parse_int_env("PROBE_FOLLOW_INTERVAL", 2)
+
 logger.info(
-    "Netprobe 2.0 starting with PROBE_INTERVAL=%ss, PING_COUNT=%s",
+    "Netprobe 2.0 starting with PROBE_INTERVAL=%ss, PING_COUNT=%s, PING_CONCURRENCY=%s",
     PROBE_INTERVAL,
     PING_COUNT,
+    PING_CONCURRENCY,
 )
 logger.info("Database backend: %s (DB_PATH=%s)", DB_ENGINE, DB_PATH)
+if not USING_POSTGRES:
+    logger.info(
+        "SQLite tuning: journal_mode=WAL synchronous=%s mmap=%sMB",
+        SQLITE_SYNCHRONOUS,
+        SQLITE_MMAP_SIZE_MB,
+    )
+logger.info(
+    "Retention: %s (every %ss, %s rows per chunk)",
+    ", ".join(f"{key}={days}d" for key, days in RETENTION_DAYS.items() if days)
+    or "keep everything",
+    RETENTION_INTERVAL,
+    RETENTION_CHUNK_ROWS,
+)
+logger.info("Hot window cache: %s probe cycles", HOT_WINDOW_CYCLES)
+logger.info(
+    "Probe role: %s (lock %s, pid %s)", PROBE_ROLE, PROBE_LOCK_PATH, os.getpid()
+)
+if USING_POSTGRES:
+    logger.info(
+        "Postgres partitions: per %s, %s ahead",
+        POSTGRES_PARTITION_INTERVAL,
+        POSTGRES_PARTITIONS_AHEAD,
+    )
+    logger.info(
+        "Postgres pool: size=%s timeout=%ss healthcheck=%ss",
+        DB_POOL_SIZE,
+        DB_POOL_TIMEOUT,
+        DB_POOL_HEALTHCHECK_SECONDS,
+    )
+logger.info("Ping engine: %s", PING_ENGINE)
+logger.info(
+    "Probe schedules: gateway=%ss/%s router=%ss/%s sites=%ss/%s dns=%ss overrides=%s",
+    GATEWAY_PROBE_INTERVAL,
+    GATEWAY_PING_COUNT,
+    ROUTER_PROBE_INTERVAL,
+    ROUTER_PING_COUNT,
+    SITES_PROBE_INTERVAL,
+    SITES_PING_COUNT,
+    DNS_PROBE_INTERVAL,
+    ", ".join(
+        f"{host}={interval}s/{count or 'default'}"
+        for host, (interval, count) in PROBE_TARGET_SCHEDULES.items()
+    )
+    or "none",
+)
+logger.info(
+    "DNS phase: concurrency=%s deadline=%ss",
+    DNS_CONCURRENCY,
+    DNS_PHASE_TIMEOUT,
+)
 logger.info(
     "Targets: gateway(auto), router=%s, sites=%s, dns_servers=%s, dns_test_sites=%s",
     ROUTER_IP or "(none)",
@@ -429,7 +958,20 @@ logger.info(
     "HTTPS (secure)" if SPEEDTEST_SECURE else "HTTP (non-secure)",
     " (not used by Ookla backend)" if SPEEDTEST_BACKEND == "ookla" else "",
 )
-logger.info("Live log poll interval: %ss", LIVE_LOG_POLL_SECONDS)
+logger.info(
+    "Live log viewer: poll every %ss, %s buffered lines",
+    LIVE_LOG_POLL_SECONDS,
+    LOG_BUFFER_MAX_LINES,
+)
+logger.info(
+    "HTTP compression: %s",
+    ("brotli, gzip" if brotli else "gzip") if HTTP_COMPRESSION else "off",
+)
+logger.info(
+    "Live event streams: max_clients=%s keepalive=%ss",
+    LIVE_EVENTS_MAX_CLIENTS,
+    LIVE_EVENTS_KEEPALIVE_SECONDS,
+)
 
 
 # -------------------------
@@ -449,19 +991,28 @@ class _WrappedPostgresCursor:
         query = query.replace("?", "%s")
         return self._inner.execute(query, params)
 
+    def executemany(self, query, seq_of_params):
+        query = query.replace("?", "%s")
+        return self._inner.executemany(query, seq_of_params)
+
     def fetchone(self):
         return self._inner.fetchone()
 
     def fetchall(self):
         return self._inner.fetchall()
 
+    @property
+    def rowcount(self):
+        return self._inner.rowcount
+
     def __iter__(self):
         return iter(self._inner)
 
 
 class _WrappedPostgresConnection:
-    def __init__(self, inner):
+    def __init__(self, inner, pool=None):
         self._inner = inner
+        self._pool = pool
 
     def cursor(self):
         return _WrappedPostgresCursor(self._inner.cursor())
@@ -469,67 +1020,289 @@ class _WrappedPostgresConnection:
     def commit(self):
         return self._inner.commit()
 
+    def rollback(self):
+        return self._inner.rollback()
+
     def close(self):
-        return self._inner.close()
+        # Pooled connections go back to the pool instead of being closed.
+        inner, self._inner = self._inner, None
+        if inner is None:
+            return None
+        if self._pool is not None:
+            return self._pool.release(inner)
+        return inner.close()
 
 
-def get_db_connection():
+class _PostgresPool:
     """
-    Return a DB-API-compatible connection to SQLite or Postgres.
+    Small thread-safe pool of psycopg2 connections.
+
+    Connections are opened on demand up to `size`, reused in LIFO order and
+    checked before reuse: closed connections are dropped and idle ones are
+    pinged with SELECT 1, reconnecting when the server has gone away.
     """
-    if USING_POSTGRES:
-        if psycopg2 is None:
-            raise RuntimeError(
-                "psycopg2 is required for Postgres backend (DB_ENGINE=postgres)"
-            )
-        conn = psycopg2.connect(
+
+    def __init__(self, size, timeout, healthcheck_seconds):
+        self._slots = threading.BoundedSemaphore(size)
+        self._timeout = timeout
+        self._healthcheck_seconds = healthcheck_seconds
+        self._idle = []  # (connection, last_used_monotonic)
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        return psycopg2.connect(
             host=os.getenv("POSTGRES_HOST", "postgres"),
             port=int(os.getenv("POSTGRES_PORT", "5432")),
             dbname=os.getenv("POSTGRES_DB", "netprobe"),
             user=os.getenv("POSTGRES_USER", "netprobe"),
             password=os.getenv("POSTGRES_PASSWORD", "netprobe"),
         )
-        return _WrappedPostgresConnection(conn)
+
+    def _healthy(self, conn, idle_for):
+        if conn.closed:
+            return False
+        if idle_for < self._healthcheck_seconds:
+            return True
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT 1")
+            cur.fetchone()
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def acquire(self):
+        if not self._slots.acquire(timeout=self._timeout):
+            raise RuntimeError(
+                f"Timed out after {self._timeout}s waiting for a database connection"
+            )
+        try:
+            while True:
+                with self._lock:
+                    if not self._idle:
+                        break
+                    conn, last_used = self._idle.pop()
+                if self._healthy(conn, time.monotonic() - last_used):
+                    return conn
+                logger.warning("Discarding stale Postgres connection; reconnecting")
+                self._discard(conn)
+            return self._connect()
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, conn):
+        try:
+            if conn.closed:
+                return
+            try:
+                # Never hand out a connection with an open transaction.
+                conn.rollback()
+            except psycopg2.Error:
+                self._discard(conn)
+                return
+            with self._lock:
+                self._idle.append((conn, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    @staticmethod
+    def _discard(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+class _WrappedSqliteConnection:
+    """
+    Per-thread SQLite connection that survives close().
+
+    close() only rolls back an unfinished transaction so the next helper on
+    the same thread starts clean, and the file is not reopened per call.
+    """
+
+    def __init__(self, inner):
+        self._inner = inner
+
+    def cursor(self):
+        return self._inner.cursor()
+
+    def commit(self):
+        return self._inner.commit()
+
+    def rollback(self):
+        return self._inner.rollback()
+
+    def close(self):
+        if self._inner.in_transaction:
+            self._inner.rollback()
+
+
+_POSTGRES_POOL = None
+_POSTGRES_POOL_LOCK = threading.Lock()
+_SQLITE_LOCAL = threading.local()
+
+
+def get_postgres_pool():
+    global _POSTGRES_POOL
+    with _POSTGRES_POOL_LOCK:
+        if _POSTGRES_POOL is None:
+            _POSTGRES_POOL = _PostgresPool(
+                DB_POOL_SIZE, DB_POOL_TIMEOUT, DB_POOL_HEALTHCHECK_SECONDS
+            )
+        return _POSTGRES_POOL
+
+
+def get_sqlite_connection():
+    conn = getattr(_SQLITE_LOCAL, "conn", None)
+    if conn is not None:
+        try:
+            conn.cursor().execute("SELECT 1")
+            return conn
+        except sqlite3.Error:
+            logger.warning("Reopening broken SQLite connection")
+            _SQLITE_LOCAL.conn = None
 
     os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-    return sqlite3.connect(DB_PATH)
+    inner = sqlite3.connect(DB_PATH)
+    # WAL lets dashboard reads run alongside the probe writer; with WAL,
+    # synchronous=NORMAL only risks the last commits on power loss, not
+    # corruption. journal_mode is persistent, the others are per connection.
+    inner.execute("PRAGMA journal_mode=WAL")
+    inner.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    inner.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE_MB * 1024 * 1024}")
+    conn = _WrappedSqliteConnection(inner)
+    _SQLITE_LOCAL.conn = conn
+    return conn
+
+
+def get_db_connection():
+    """
+    Return a DB-API-compatible connection to SQLite or Postgres.
+
+    Postgres connections come from a shared pool and SQLite connections are
+    reused per thread; in both cases close() hands the connection back.
+    """
+    if USING_POSTGRES:
+        if psycopg2 is None:
+            raise RuntimeError(
+                "psycopg2 is required for Postgres backend (DB_ENGINE=postgres)"
+            )
+        pool = get_postgres_pool()
+        return _WrappedPostgresConnection(pool.acquire(), pool)
+
+    return get_sqlite_connection()
+
+
+# Aggregate columns of measurements, in fetch_recent column order.
+MEASUREMENT_METRICS = (
+    "avg_latency_ms",
+    "avg_jitter_ms",
+    "avg_loss_pct",
+    "avg_dns_latency_ms",
+    "score",
+)
+
+
+# Rollup tiers: name and bucket size in seconds, finest first. Buckets are
+# aligned to multiples of the size (UTC for the daily tier).
+ROLLUP_TIERS = (("1m", 60), ("1h", 3600), ("1d", 86400))
 
 
 def ensure_db():
     conn = get_db_connection()
     cur = conn.cursor()
+    create_tables(cur)
+    conn.commit()
+    conn.close()
+
 
+def create_tables(cur):
+    """Create any missing table; time-series tables are partitioned on Postgres."""
     if USING_POSTGRES:
         id_col = "id SERIAL PRIMARY KEY"
+        # Partitioned tables need the partition key in their primary key.
+        series_id_col = "id SERIAL"
+        series_key = ",\n            PRIMARY KEY (id, ts)"
+        series_suffix = " PARTITION BY RANGE (ts)"
     else:
         id_col = "id INTEGER PRIMARY KEY AUTOINCREMENT"
+        series_id_col = id_col
+        series_key = ""
+        series_suffix = ""
 
     # Aggregate probe metrics.
     cur.execute(
         f"""
         CREATE TABLE IF NOT EXISTS measurements (
-            {id_col},
+            {series_id_col},
             ts INTEGER NOT NULL,
             avg_latency_ms REAL,
             avg_jitter_ms REAL,
             avg_loss_pct REAL,
             avg_dns_latency_ms REAL,
-            score REAL
-        );
+            score REAL{series_key}
+        ){series_suffix};
         """
     )
 
     # Detailed DNS per-server values, one row per (timestamp, server_ip).
-    # Each row stores the average latency for that DNS server across all
-    # configured DNS test domains during that probe cycle.
+    # Each row stores the average answer time for that DNS server across all
+    # configured DNS test domains during that probe cycle, plus how many
+    # queries were sent, the NOERROR success rate and the p95 answer time.
     cur.execute(
         f"""
         CREATE TABLE IF NOT EXISTS dns_measurements (
-            {id_col},
+            {series_id_col},
             ts INTEGER NOT NULL,
             server_ip TEXT NOT NULL,
-            latency_ms REAL
-        );
+            latency_ms REAL,
+            queries INTEGER,
+            success_pct REAL,
+            p95_ms REAL{series_key}
+        ){series_suffix};
+        """
+    )
+
+    # Individual DNS query outcomes. status is the response RCODE text or
+    # TIMEOUT / ERROR; latency_ms is NULL when no answer arrived.
+    cur.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS dns_queries (
+            {series_id_col},
+            ts INTEGER NOT NULL,
+            server_ip TEXT NOT NULL,
+            domain TEXT NOT NULL,
+            status TEXT NOT NULL,
+            latency_ms REAL{series_key}
+        ){series_suffix};
+        """
+    )
+
+    # Per-host ping samples, one row per (timestamp, host). The raw RTTs are
+    # kept as a compact comma-separated list of milliseconds in send order so
+    # charts and scores can recompute distributions without re-probing.
+    cur.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS ping_samples (
+            {series_id_col},
+            ts INTEGER NOT NULL,
+            host TEXT NOT NULL,
+            sent INTEGER,
+            received INTEGER,
+            loss_pct REAL,
+            latency_ms REAL,
+            jitter_ms REAL,
+            stddev_ms REAL,
+            min_ms REAL,
+            max_ms REAL,
+            p50_ms REAL,
+            p95_ms REAL,
+            p99_ms REAL,
+            rtts TEXT{series_key}
+        ){series_suffix};
         """
     )
 
@@ -552,221 +1325,1676 @@ def ensure_db():
         """
     )
 
-    conn.commit()
-    conn.close()
-
+    # Speedtest job queue. The prober runs queued jobs oldest first; request,
+    # progress and result hold JSON so any web worker can report on a job.
+    cur.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS speedtest_jobs (
+            {id_col},
+            created_ts INTEGER NOT NULL,
+            started_ts INTEGER,
+            finished_ts INTEGER,
+            source TEXT NOT NULL,
+            state TEXT NOT NULL,
+            phase TEXT,
+            request TEXT,
+            progress TEXT,
+            result TEXT,
+            error TEXT
+        );
+        """
+    )
 
-def ensure_speedtests_schema():
-    """
-    Small schema migration for older installs.
+    # Rollups of measurements and dns_measurements, one row per tier and
+    # bucket (and DNS server): sample count plus avg/min/max/p95 per metric.
+    # The bare metric column holds the average.
+    metric_columns = ",\n            ".join(
+        f"{m} REAL, {m}_min REAL, {m}_max REAL, {m}_p95 REAL"
+        for m in MEASUREMENT_METRICS
+    )
+    cur.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS measurement_rollups (
+            tier TEXT NOT NULL,
+            bucket_ts INTEGER NOT NULL,
+            samples INTEGER NOT NULL,
+            {metric_columns},
+            PRIMARY KEY (tier, bucket_ts)
+        );
+        """
+    )
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS dns_rollups (
+            tier TEXT NOT NULL,
+            bucket_ts INTEGER NOT NULL,
+            server_ip TEXT NOT NULL,
+            samples INTEGER NOT NULL,
+            latency_ms REAL,
+            latency_ms_min REAL,
+            latency_ms_max REAL,
+            latency_ms_p95 REAL,
+            success_pct REAL,
+            p95_ms REAL,
+            PRIMARY KEY (tier, bucket_ts, server_ip)
+        );
+        """
+    )
 
-    Existing SQLite/Postgres deployments may already have the speedtests table
-    without newer server-selection/backend fields. We add them in place if missing.
-    """
-    conn = get_db_connection()
-    cur = conn.cursor()
 
-    try:
-        if USING_POSTGRES:
+# Postgres partitioning. The raw time-series tables are declared
+# PARTITION BY RANGE (ts) and get one partition per month or week, named
+# <table>_p<YYYYMMDD> after the period start. There is no default partition:
+# ensure_upcoming_partitions runs before every write and keeps
+# POSTGRES_PARTITIONS_AHEAD periods ready, so retention can drop whole
+# partitions and range reads only touch the partitions they cover.
+PARTITIONED_TABLES = ("measurements", "dns_measurements", "dns_queries", "ping_samples")
+PARTITION_BOUND_RE = re.compile(r"FROM \('?(-?\d+)'?\) TO \('?(-?\d+)'?\)")
+
+# Periods before this start have partitions; guarded by PARTITIONS_LOCK.
+PARTITIONS_READY_UNTIL = 0
+PARTITIONS_LOCK = threading.Lock()
+
+
+def partition_period(ts):
+    """Return (start_ts, end_ts) of the partition period containing ``ts``."""
+    if POSTGRES_PARTITION_INTERVAL == "week":
+        week = 7 * 86400
+        # Weeks start on Monday; 1970-01-05 was the first Monday after epoch.
+        start = ts - (ts - 4 * 86400) % week
+        return start, start + week
+    day = datetime.fromtimestamp(ts, timezone.utc)
+    start = datetime(day.year, day.month, 1, tzinfo=timezone.utc)
+    if day.month == 12:
+        end = datetime(day.year + 1, 1, 1, tzinfo=timezone.utc)
+    else:
+        end = datetime(day.year, day.month + 1, 1, tzinfo=timezone.utc)
+    return int(start.timestamp()), int(end.timestamp())
+
+
+def create_partitions(cur, first_ts, last_ts):
+    """Create the partitions covering [first_ts, last_ts] for every table."""
+    start, end = partition_period(first_ts)
+    periods = []
+    while start <= last_ts:
+        periods.append((start, end))
+        start, end = partition_period(end)
+    for table in PARTITIONED_TABLES:
+        for start, end in periods:
+            suffix = datetime.fromtimestamp(start, timezone.utc).strftime("%Y%m%d")
             cur.execute(
-                """
-                SELECT column_name
-                FROM information_schema.columns
-                WHERE table_name = 'speedtests'
+                f"""
+                CREATE TABLE IF NOT EXISTS {table}_p{suffix}
+                PARTITION OF {table} FOR VALUES FROM ({start}) TO ({end})
                 """
             )
-        else:
-            cur.execute("PRAGMA table_info(speedtests)")
+    return periods
 
-        rows = cur.fetchall() or []
-        if USING_POSTGRES:
-            existing = {r[0] for r in rows}
-        else:
-            existing = {r[1] for r in rows}
 
-        if "server_id" not in existing:
-            cur.execute("ALTER TABLE speedtests ADD COLUMN server_id TEXT")
-        if "requested_server_id" not in existing:
-            cur.execute(
-                "ALTER TABLE speedtests ADD COLUMN requested_server_id TEXT"
-            )
-        if "backend" not in existing:
-            cur.execute("ALTER TABLE speedtests ADD COLUMN backend TEXT")
+def ensure_upcoming_partitions(ts):
+    """Make sure partitions exist for ts and the next POSTGRES_PARTITIONS_AHEAD periods."""
+    global PARTITIONS_READY_UNTIL
+    if not USING_POSTGRES or ts < PARTITIONS_READY_UNTIL:
+        return
+    with PARTITIONS_LOCK:
+        if ts < PARTITIONS_READY_UNTIL:
+            return
+        last_start = ts
+        for _ in range(POSTGRES_PARTITIONS_AHEAD):
+            last_start = partition_period(last_start)[1]
+        conn = get_db_connection()
+        try:
+            periods = create_partitions(conn.cursor(), ts, last_start)
+            conn.commit()
+        finally:
+            conn.close()
+        # Extend again once the newest prepared period is reached.
+        PARTITIONS_READY_UNTIL = periods[-1][0]
 
-        conn.commit()
-    finally:
-        conn.close()
+
+def list_partitions(cur, table):
+    """Return [(name, start_ts, end_ts)] of ``table``'s range partitions."""
+    cur.execute(
+        """
+        SELECT child.relname, pg_get_expr(child.relpartbound, child.oid)
+        FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.relname = ?
+        """,
+        (table,),
+    )
+    partitions = []
+    for name, bound in cur.fetchall():
+        match = PARTITION_BOUND_RE.search(bound or "")
+        if match:
+            partitions.append((name, int(match.group(1)), int(match.group(2))))
+    return sorted(partitions, key=lambda item: item[1])
 
 
-def insert_measurement(ts, avg_latency, avg_jitter, avg_loss, avg_dns, score):
-    conn = get_db_connection()
-    cur = conn.cursor()
+def is_partitioned(cur, table):
+    """Return True when ``table`` is a partitioned Postgres table."""
     cur.execute(
         """
-        INSERT INTO measurements
-        (ts, avg_latency_ms, avg_jitter_ms, avg_loss_pct,
-         avg_dns_latency_ms, score)
-        VALUES (?, ?, ?, ?, ?, ?)
+        SELECT 1
+        FROM pg_partitioned_table
+        JOIN pg_class ON pg_class.oid = pg_partitioned_table.partrelid
+        WHERE pg_class.relname = ?
         """,
-        (ts, avg_latency, avg_jitter, avg_loss, avg_dns, score),
+        (table,),
     )
-    conn.commit()
-    conn.close()
+    return cur.fetchone() is not None
 
 
-def insert_dns_measurements(ts, dns_map):
-    """dns_map: {server_ip: latency_ms} for this probe timestamp."""
-    if not dns_map:
-        return
-    conn = get_db_connection()
-    cur = conn.cursor()
-    for ip, lat in dns_map.items():
+def get_table_columns(cur, table):
+    """Return the set of column names of ``table``."""
+    if USING_POSTGRES:
         cur.execute(
             """
-            INSERT INTO dns_measurements (ts, server_ip, latency_ms)
-            VALUES (?, ?, ?)
+            SELECT column_name
+            FROM information_schema.columns
+            WHERE table_name = ?
             """,
-            (ts, ip, float(lat)),
+            (table,),
         )
-    conn.commit()
-    conn.close()
+    else:
+        cur.execute(f"PRAGMA table_info({table})")
 
+    rows = cur.fetchall() or []
+    if USING_POSTGRES:
+        return {r[0] for r in rows}
+    return {r[1] for r in rows}
 
-def fetch_recent(limit=2880):
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT ts, avg_latency_ms, avg_jitter_ms,
-               avg_loss_pct, avg_dns_latency_ms, score
-        FROM measurements
-        ORDER BY ts DESC
-        LIMIT ?
-        """,
-        (limit,),
-    )
-    rows = cur.fetchall()
-    conn.close()
-    rows.reverse()
-    return rows
 
+# Versioned schema migrations. ensure_db creates the baseline tables for fresh
+# installs; each migration then runs once, in order, in its own transaction and
+# is recorded in schema_version. Steps stay idempotent so databases created
+# before schema_version existed can replay them safely.
 
-def fetch_dns_for_timestamps(ts_list):
-    """
-    Return mapping: ts -> {server_ip: latency_ms} for the provided timestamps.
-    """
-    if not ts_list:
-        return {}
 
-    conn = get_db_connection()
-    cur = conn.cursor()
-    placeholders = ",".join("?" for _ in ts_list)
-    cur.execute(
+def migrate_speedtests_columns(cur):
+    """Add the server-selection/backend fields to older speedtests tables."""
+    existing = get_table_columns(cur, "speedtests")
+
+    if "server_id" not in existing:
+        cur.execute("ALTER TABLE speedtests ADD COLUMN server_id TEXT")
+    if "requested_server_id" not in existing:
+        cur.execute("ALTER TABLE speedtests ADD COLUMN requested_server_id TEXT")
+    if "backend" not in existing:
+        cur.execute("ALTER TABLE speedtests ADD COLUMN backend TEXT")
+
+
+def migrate_dns_columns(cur):
+    """Add the DNS failure-accounting columns to older dns_measurements tables."""
+    existing = get_table_columns(cur, "dns_measurements")
+
+    if "queries" not in existing:
+        cur.execute("ALTER TABLE dns_measurements ADD COLUMN queries INTEGER")
+    if "success_pct" not in existing:
+        cur.execute("ALTER TABLE dns_measurements ADD COLUMN success_pct REAL")
+    if "p95_ms" not in existing:
+        cur.execute("ALTER TABLE dns_measurements ADD COLUMN p95_ms REAL")
+
+
+def migrate_time_indexes(cur):
+    """
+    Index the timestamp columns every dashboard query filters or sorts on.
+
+    The (host, ts) and (server_ip, ts) indexes serve the per-target history
+    endpoints; plain (ts) serves the unfiltered "latest N" queries.
+    """
+    for name, table, columns in (
+        ("idx_measurements_ts", "measurements", "ts"),
+        ("idx_dns_measurements_ts_server", "dns_measurements", "ts, server_ip"),
+        ("idx_dns_queries_ts", "dns_queries", "ts"),
+        ("idx_dns_queries_server_ts", "dns_queries", "server_ip, ts"),
+        ("idx_ping_samples_ts", "ping_samples", "ts"),
+        ("idx_ping_samples_host_ts", "ping_samples", "host, ts"),
+        ("idx_speedtests_ts", "speedtests", "ts"),
+    ):
+        cur.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})")
+
+
+def migrate_backfill_rollups(cur):
+    """Build the rollup tiers for history written before they existed."""
+    for table in ("measurements", "dns_measurements"):
+        cur.execute(f"SELECT MIN(ts), MAX(ts) FROM {table}")
+        first_ts, last_ts = cur.fetchone() or (None, None)
+        if first_ts is None:
+            continue
+        is_measurements = table == "measurements"
+        # One day per pass keeps memory flat on long histories.
+        day = ROLLUP_TIERS[-1][1]
+        for start_ts in range(first_ts - first_ts % day, last_ts + 1, day):
+            refresh_rollups(
+                cur,
+                start_ts,
+                start_ts + day - 1,
+                measurements=is_measurements,
+                dns=not is_measurements,
+            )
+
+
+def migrate_sqlite_incremental_vacuum(cur):
+    """
+    Left in place so existing schema_version rows keep their numbering.
+
+    The switch to auto_vacuum=INCREMENTAL needs a full VACUUM, which on a
+    large database could outlast the worker boot timeout. The retention
+    thread runs it instead; see enable_sqlite_incremental_vacuum.
+    """
+
+
+def migrate_postgres_partitions(cur):
+    """
+    Convert plain Postgres time-series tables to partitioned ones.
+
+    Each old table is renamed, the partitioned table and partitions covering
+    its rows are created, the rows copied over with their ids, the id
+    sequence moved past them and the old table dropped. Runs in the migration
+    transaction, so a failure leaves the old tables in place.
+    """
+    if not USING_POSTGRES:
+        return
+    converted = False
+    for table in PARTITIONED_TABLES:
+        if is_partitioned(cur, table):
+            continue
+        logger.info("Converting %s to a partitioned table", table)
+        cur.execute(f"ALTER TABLE {table} RENAME TO {table}_unpartitioned")
+        # Free the index names so migrate_time_indexes can reuse them.
+        cur.execute(
+            """
+            SELECT indexname FROM pg_indexes
+            WHERE tablename = ? AND indexname LIKE ?
+            """,
+            (f"{table}_unpartitioned", "idx_%"),
+        )
+        for (index_name,) in cur.fetchall():
+            cur.execute(f"DROP INDEX {index_name}")
+        converted = True
+
+    if not converted:
+        return
+    create_tables(cur)
+    for table in PARTITIONED_TABLES:
+        if not is_partitioned(cur, table):
+            continue
+        cur.execute(f"SELECT MIN(ts), MAX(ts) FROM {table}_unpartitioned")
+        first_ts, last_ts = cur.fetchone()
+        if first_ts is not None:
+            create_partitions(cur, first_ts, last_ts)
+            columns = ", ".join(sorted(get_table_columns(cur, table)))
+            cur.execute(
+                f"""
+                INSERT INTO {table} ({columns})
+                SELECT {columns} FROM {table}_unpartitioned
+                """
+            )
+            cur.execute(
+                f"""
+                SELECT setval(pg_get_serial_sequence('{table}', 'id'), MAX(id))
+                FROM {table}
+                """
+            )
+        cur.execute(f"DROP TABLE {table}_unpartitioned")
+    migrate_time_indexes(cur)
+
+
+SCHEMA_MIGRATIONS = [
+    (1, "speedtests server/backend columns", migrate_speedtests_columns),
+    (2, "dns_measurements failure accounting", migrate_dns_columns),
+    (3, "timestamp indexes", migrate_time_indexes),
+    (4, "rollup backfill", migrate_backfill_rollups),
+    (5, "sqlite incremental vacuum", migrate_sqlite_incremental_vacuum),
+    (6, "postgres time partitions", migrate_postgres_partitions),
+]
+
+
+def migrate_db():
+    """Create the baseline schema and apply pending SCHEMA_MIGRATIONS."""
+    ensure_db()
+
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                applied_ts INTEGER NOT NULL,
+                description TEXT
+            );
+            """
+        )
+        cur.execute("SELECT MAX(version) FROM schema_version")
+        row = cur.fetchone()
+        current = row[0] if row and row[0] is not None else 0
+        conn.commit()
+
+        for version, description, step in SCHEMA_MIGRATIONS:
+            if version <= current:
+                continue
+            logger.info("Applying schema migration %s: %s", version, description)
+            step(cur)
+            cur.execute(
+                """
+                INSERT INTO schema_version (version, applied_ts, description)
+                VALUES (?, ?, ?)
+                """,
+                (version, int(time.time()), description),
+            )
+            conn.commit()
+            current = version
+    finally:
+        conn.close()
+
+    ensure_upcoming_partitions(int(time.time()))
+    return current
+
+
+# Rollup maintenance. Each write recomputes, from the raw rows, the 1m and 1h
+# buckets that contain the new cycle. That keeps p95 exact and the
+# maintenance portable across SQLite and Postgres. Reading a whole day of raw
+# rows on every write would be too slow, so the open day's 1d bucket is
+# re-aggregated from its 1h buckets instead: samples, averages, minimums and
+# maximums are exact, p95 is the worst hourly p95. The first write of a new
+# day rebuilds the previous write's day from the raw rows, which makes the
+# closed day exact.
+
+# Day of the last write, per source table.
+LAST_ROLLUP_DAY = {}
+
+
+def summarize_rollup_values(values):
+    """Return (avg, min, max, p95) of the non-NULL ``values``."""
+    present = sorted(v for v in values if v is not None)
+    if not present:
+        return None, None, None, None
+    return (
+        statistics.fmean(present),
+        present[0],
+        present[-1],
+        percentile(present, 95),
+    )
+
+
+def rollup_measurements(cur, tier, size, raw_rows, start_ts, end_ts):
+    """
+    Rebuild ``tier`` buckets of measurement_rollups in [start_ts, end_ts].
+
+    raw_rows are (ts, *MEASUREMENT_METRICS) measurements covering the range.
+    """
+    buckets = {}
+    for row in raw_rows:
+        if start_ts <= row[0] <= end_ts:
+            buckets.setdefault(row[0] - row[0] % size, []).append(row[1:])
+
+    rows = []
+    for bucket_ts, samples in buckets.items():
+        values = [tier, bucket_ts, len(samples)]
+        for i in range(len(MEASUREMENT_METRICS)):
+            values.extend(summarize_rollup_values([sample[i] for sample in samples]))
+        rows.append(tuple(values))
+
+    cur.execute(
+        "DELETE FROM measurement_rollups WHERE tier = ? AND bucket_ts BETWEEN ? AND ?",
+        (tier, start_ts, end_ts),
+    )
+    if rows:
+        columns = ", ".join(
+            f"{m}, {m}_min, {m}_max, {m}_p95" for m in MEASUREMENT_METRICS
+        )
+        placeholders = ", ".join("?" for _ in rows[0])
+        cur.executemany(
+            f"""
+            INSERT INTO measurement_rollups (tier, bucket_ts, samples, {columns})
+            VALUES ({placeholders})
+            """,
+            rows,
+        )
+
+
+def rollup_dns(cur, tier, size, raw_rows, start_ts, end_ts):
+    """
+    Rebuild ``tier`` buckets of dns_rollups in [start_ts, end_ts].
+
+    raw_rows are (ts, server_ip, latency_ms, success_pct, p95_ms) rows.
+    """
+    buckets = {}
+    for ts, ip, latency_ms, success_pct, p95_ms in raw_rows:
+        if start_ts <= ts <= end_ts:
+            buckets.setdefault((ts - ts % size, ip), []).append(
+                (latency_ms, success_pct, p95_ms)
+            )
+
+    rows = []
+    for (bucket_ts, ip), samples in buckets.items():
+        success = [s[1] for s in samples if s[1] is not None]
+        p95s = [s[2] for s in samples if s[2] is not None]
+        rows.append(
+            (
+                tier,
+                bucket_ts,
+                ip,
+                len(samples),
+                *summarize_rollup_values([s[0] for s in samples]),
+                statistics.fmean(success) if success else None,
+                max(p95s) if p95s else None,
+            )
+        )
+
+    cur.execute(
+        "DELETE FROM dns_rollups WHERE tier = ? AND bucket_ts BETWEEN ? AND ?",
+        (tier, start_ts, end_ts),
+    )
+    if rows:
+        cur.executemany(
+            """
+            INSERT INTO dns_rollups
+            (tier, bucket_ts, server_ip, samples, latency_ms, latency_ms_min,
+             latency_ms_max, latency_ms_p95, success_pct, p95_ms)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            rows,
+        )
+
+
+def rollup_measurements_from_hours(cur, day_ts):
+    """Rebuild the 1d measurement_rollups bucket at day_ts from its 1h buckets."""
+    tier, size = ROLLUP_TIERS[-1]
+    columns = ", ".join(
+        f"{m}, {m}_min, {m}_max, {m}_p95" for m in MEASUREMENT_METRICS
+    )
+    aggregates = ", ".join(
+        f"SUM({m} * samples)"
+        f" / NULLIF(SUM(CASE WHEN {m} IS NULL THEN 0 ELSE samples END), 0), "
+        f"MIN({m}_min), MAX({m}_max), MAX({m}_p95)"
+        for m in MEASUREMENT_METRICS
+    )
+    cur.execute(
+        "DELETE FROM measurement_rollups WHERE tier = ? AND bucket_ts = ?",
+        (tier, day_ts),
+    )
+    cur.execute(
         f"""
-        SELECT ts, server_ip, latency_ms
-        FROM dns_measurements
-        WHERE ts IN ({placeholders})
+        INSERT INTO measurement_rollups (tier, bucket_ts, samples, {columns})
+        SELECT ?, ?, SUM(samples), {aggregates}
+        FROM measurement_rollups
+        WHERE tier = ? AND bucket_ts BETWEEN ? AND ?
+        HAVING COUNT(*) > 0
         """,
-        ts_list,
+        (tier, day_ts, ROLLUP_TIERS[-2][0], day_ts, day_ts + size - 1),
     )
-    rows = cur.fetchall()
-    conn.close()
 
-    out = {}
-    for ts, ip, lat in rows:
-        out.setdefault(ts, {})[ip] = lat
-    return out
 
+def rollup_dns_from_hours(cur, day_ts):
+    """Rebuild the 1d dns_rollups buckets at day_ts from their 1h buckets."""
+    tier, size = ROLLUP_TIERS[-1]
+    cur.execute(
+        "DELETE FROM dns_rollups WHERE tier = ? AND bucket_ts = ?",
+        (tier, day_ts),
+    )
+    cur.execute(
+        """
+        INSERT INTO dns_rollups
+        (tier, bucket_ts, server_ip, samples, latency_ms, latency_ms_min,
+         latency_ms_max, latency_ms_p95, success_pct, p95_ms)
+        SELECT ?, ?, server_ip, SUM(samples),
+               SUM(latency_ms * samples) / NULLIF(
+                   SUM(CASE WHEN latency_ms IS NULL THEN 0 ELSE samples END), 0
+               ),
+               MIN(latency_ms_min), MAX(latency_ms_max), MAX(latency_ms_p95),
+               SUM(success_pct * samples) / NULLIF(
+                   SUM(CASE WHEN success_pct IS NULL THEN 0 ELSE samples END), 0
+               ),
+               MAX(p95_ms)
+        FROM dns_rollups
+        WHERE tier = ? AND bucket_ts BETWEEN ? AND ?
+        GROUP BY server_ip
+        """,
+        (tier, day_ts, ROLLUP_TIERS[-2][0], day_ts, day_ts + size - 1),
+    )
+
+
+def refresh_rollups(
+    cur, start_ts, end_ts, measurements=True, dns=True, tiers=ROLLUP_TIERS
+):
+    """
+    Recompute the ``tiers`` rollup buckets overlapping [start_ts, end_ts].
+
+    The raw rows of the enclosing coarsest buckets are read once and shared
+    by all tiers.
+    """
+    coarsest = tiers[-1][1]
+    low = start_ts - start_ts % coarsest
+    high = end_ts - end_ts % coarsest + coarsest - 1
+    sources = []
+    if measurements:
+        cur.execute(
+            f"""
+            SELECT ts, {", ".join(MEASUREMENT_METRICS)}
+            FROM measurements
+            WHERE ts BETWEEN ? AND ?
+            """,
+            (low, high),
+        )
+        sources.append((rollup_measurements, cur.fetchall()))
+    if dns:
+        cur.execute(
+            """
+            SELECT ts, server_ip, latency_ms, success_pct, p95_ms
+            FROM dns_measurements
+            WHERE ts BETWEEN ? AND ?
+            """,
+            (low, high),
+        )
+        sources.append((rollup_dns, cur.fetchall()))
+
+    for rollup, raw_rows in sources:
+        for tier, size in tiers:
+            rollup(
+                cur,
+                tier,
+                size,
+                raw_rows,
+                start_ts - start_ts % size,
+                end_ts - end_ts % size + size - 1,
+            )
+
+
+def select_rollup_tier(bucket):
+    """Coarsest (tier, size) whose buckets nest exactly in ``bucket``, or None."""
+    for tier, size in reversed(ROLLUP_TIERS):
+        if bucket >= size and bucket % size == 0:
+            return tier, size
+    return None
+
+
+def align_bucket_to_rollups(bucket):
+    """Round ``bucket`` to the nearest multiple of the coarsest tier it spans."""
+    for _tier, size in reversed(ROLLUP_TIERS):
+        if bucket >= size:
+            return max(1, round(bucket / size)) * size
+    return bucket
+
+
+def insert_probe_cycle(
+    ts, measurement=None, ping_results=(), dns_summary=None, dns_queries=()
+):
+    """
+    Persist everything one probe cycle produced in a single transaction.
+
+    measurement: (avg_latency, avg_jitter, avg_loss, avg_dns, score) or None
+    ping_results: per-host results from run_ping_many
+    dns_summary: {server_ip: summarize_dns_queries item}
+    dns_queries: individual outcomes from run_dns_phase
+
+    The rollup buckets containing ts are refreshed in the same transaction.
+    Readers never see a half-written cycle and each cycle costs one commit.
+    """
+    ping_rows = []
+    for result in ping_results:
+        # Hosts without replies store NULL statistics instead of the penalty
+        # values used for scoring.
+        has_rtts = bool(result.get("rtts"))
+        ping_rows.append(
+            (
+                ts,
+                result["host"],
+                result.get("sent"),
+                result.get("received"),
+                result["loss"],
+                result["latency"] if has_rtts else None,
+                result["jitter"] if has_rtts else None,
+                result.get("stddev"),
+                result.get("min"),
+                result.get("max"),
+                result.get("p50"),
+                result.get("p95"),
+                result.get("p99"),
+                encode_rtts(result.get("rtts") or []),
+            )
+        )
+    dns_rows = [
+        (
+            ts,
+            ip,
+            item["latency_ms"],
+            item["queries"],
+            item["success_pct"],
+            item["p95_ms"],
+        )
+        for ip, item in (dns_summary or {}).items()
+    ]
+    query_rows = [
+        (
+            ts,
+            outcome["server"],
+            outcome["domain"],
+            outcome["status"],
+            outcome["latency_ms"],
+        )
+        for outcome in dns_queries
+    ]
+    if measurement is None and not (ping_rows or dns_rows or query_rows):
+        return
+
+    ensure_upcoming_partitions(ts)
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        if measurement is not None:
+            cur.execute(
+                """
+                INSERT INTO measurements
+                (ts, avg_latency_ms, avg_jitter_ms, avg_loss_pct,
+                 avg_dns_latency_ms, score)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (ts, *measurement),
+            )
+        if ping_rows:
+            cur.executemany(
+                """
+                INSERT INTO ping_samples
+                (ts, host, sent, received, loss_pct, latency_ms, jitter_ms,
+                 stddev_ms, min_ms, max_ms, p50_ms, p95_ms, p99_ms, rtts)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                ping_rows,
+            )
+        if dns_rows:
+            cur.executemany(
+                """
+                INSERT INTO dns_measurements
+                (ts, server_ip, latency_ms, queries, success_pct, p95_ms)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                dns_rows,
+            )
+        if query_rows:
+            cur.executemany(
+                """
+                INSERT INTO dns_queries (ts, server_ip, domain, status, latency_ms)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                query_rows,
+            )
+        daily = ROLLUP_TIERS[-1][1]
+        day_ts = ts - ts % daily
+        for source, written, from_hours in (
+            ("measurements", measurement is not None, rollup_measurements_from_hours),
+            ("dns", bool(dns_rows), rollup_dns_from_hours),
+        ):
+            if not written:
+                continue
+            refresh_rollups(
+                cur,
+                ts,
+                ts,
+                measurements=source == "measurements",
+                dns=source == "dns",
+                tiers=ROLLUP_TIERS[:-1],
+            )
+            # After a restart the previous write is unknown; assume it was an
+            # hour ago so a day that closed while we were down is rebuilt.
+            previous_ts = LAST_ROLLUP_DAY.get(source, ts - 3600)
+            previous_day_ts = previous_ts - previous_ts % daily
+            if previous_day_ts < day_ts:
+                refresh_rollups(
+                    cur,
+                    previous_day_ts,
+                    previous_day_ts,
+                    measurements=source == "measurements",
+                    dns=source == "dns",
+                    tiers=ROLLUP_TIERS[-1:],
+                )
+            from_hours(cur, day_ts)
+            LAST_ROLLUP_DAY[source] = day_ts
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def fetch_dns_queries(limit=500, server_ip=None):
+    """Return the newest DNS query outcomes (oldest first), optionally per server."""
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        where = "WHERE server_ip = ?" if server_ip else ""
+        params = (server_ip, limit) if server_ip else (limit,)
+        cur.execute(
+            f"""
+            SELECT ts, server_ip, domain, status, latency_ms
+            FROM dns_queries
+            {where}
+            ORDER BY ts DESC, id DESC
+            LIMIT ?
+            """,
+            params,
+        )
+        rows = cur.fetchall()
+    finally:
+        conn.close()
+    rows.reverse()
+    return rows
+
+
+def encode_rtts(rtts):
+    """Encode per-packet RTTs as a compact comma-separated string."""
+    return ",".join(f"{rtt:.3f}" for rtt in rtts)
+
+
+def decode_rtts(value):
+    if not value:
+        return []
+    return [float(item) for item in value.split(",")]
+
+
+def fetch_ping_samples(limit=2880, host=None):
+    """Return the newest ping_samples rows (oldest first), optionally per host."""
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        where = "WHERE host = ?" if host else ""
+        params = (host, limit) if host else (limit,)
+        cur.execute(
+            f"""
+            SELECT ts, host, sent, received, loss_pct, latency_ms, jitter_ms,
+                   stddev_ms, min_ms, max_ms, p50_ms, p95_ms, p99_ms, rtts
+            FROM ping_samples
+            {where}
+            ORDER BY ts DESC, id DESC
+            LIMIT ?
+            """,
+            params,
+        )
+        rows = cur.fetchall()
+    finally:
+        conn.close()
+    rows.reverse()
+    return rows
+
+
+def fetch_recent(limit=2880, since=None):
+    """Newest ``limit`` measurements, oldest first; only ts > since if given."""
+    where = "WHERE ts > ?" if since is not None else ""
+    params = (since, limit) if since is not None else (limit,)
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(
+            f"""
+            SELECT ts, avg_latency_ms, avg_jitter_ms,
+                   avg_loss_pct, avg_dns_latency_ms, score
+            FROM measurements
+            {where}
+            ORDER BY ts DESC
+            LIMIT ?
+            """,
+            params,
+        )
+        rows = cur.fetchall()
+    finally:
+        conn.close()
+    rows.reverse()
+    return rows
+
+
+def fetch_dns_for_range(start_ts, end_ts):
+    """
+    Return mapping: ts -> {server_ip: detail} for start_ts <= ts <= end_ts.
+
+    Each detail dict holds ``latency_ms``, ``success_pct`` and ``p95_ms``.
+    One range predicate on the ts index replaces a per-timestamp IN list.
+    """
+    if start_ts is None or end_ts is None:
+        return {}
+
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            SELECT ts, server_ip, latency_ms, success_pct, p95_ms
+            FROM dns_measurements
+            WHERE ts BETWEEN ? AND ?
+            """,
+            (start_ts, end_ts),
+        )
+        rows = cur.fetchall()
+    finally:
+        conn.close()
+
+    out = {}
+    for ts, ip, lat, success_pct, p95_ms in rows:
+        out.setdefault(ts, {})[ip] = {
+            "latency_ms": lat,
+            "success_pct": success_pct,
+            "p95_ms": p95_ms,
+        }
+    return out
+
+
+def fetch_recent_window(limit):
+    """
+    Return (first_ts, last_ts) of the newest ``limit`` measurements.
+
+    When fewer raw rows exist (retention pruned them, or the install is new)
+    the window is stretched to ``limit`` probe intervals so downsampled views
+    can reach back into the rollups.
+    """
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            SELECT MIN(ts), MAX(ts), COUNT(*)
+            FROM (SELECT ts FROM measurements ORDER BY ts DESC LIMIT ?) AS recent
+            """,
+            (limit,),
+        )
+        row = cur.fetchone()
+    finally:
+        conn.close()
+    if not row or row[1] is None:
+        return None, None
+    first_ts, last_ts, count = row
+    if count < limit:
+        first_ts = min(first_ts, last_ts - (limit - 1) * PROBE_INTERVAL)
+    return first_ts, last_ts
+
+
+def fetch_measurement_buckets(start_ts, end_ts, bucket):
+    """
+    Downsample measurements in [start_ts, end_ts] into ``bucket``-second bins.
+
+    Bins are aligned to multiples of ``bucket`` so they stay put between
+    refreshes. Each row is (bucket_ts, samples, avg, min, max for every
+    MEASUREMENT_METRICS column). Reads the coarsest rollup tier that nests in
+    ``bucket`` and falls back to the raw rows otherwise.
+    """
+    tier = select_rollup_tier(bucket)
+    if tier is not None:
+        return fetch_rollup_measurement_buckets(start_ts, end_ts, bucket, *tier)
+    return fetch_raw_measurement_buckets(start_ts, end_ts, bucket)
+
+
+def fetch_raw_measurement_buckets(start_ts, end_ts, bucket):
+    columns = ", ".join(
+        f"AVG({m}), MIN({m}), MAX({m})" for m in MEASUREMENT_METRICS
+    )
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(
+            f"""
+            SELECT ts / ? AS bucket, COUNT(*), {columns}
+            FROM measurements
+            WHERE ts BETWEEN ? AND ?
+            GROUP BY bucket
+            ORDER BY bucket
+            """,
+            (bucket, start_ts, end_ts),
+        )
+        rows = cur.fetchall()
+    finally:
+        conn.close()
+    return [(row[0] * bucket, *row[1:]) for row in rows]
+
+
+def fetch_rollup_measurement_buckets(start_ts, end_ts, bucket, tier, size):
+    # Averages are re-weighted by each rollup bucket's sample count.
+    columns = ", ".join(
+        f"SUM({m} * samples)"
+        f" / NULLIF(SUM(CASE WHEN {m} IS NULL THEN 0 ELSE samples END), 0), "
+        f"MIN({m}_min), MAX({m}_max)"
+        for m in MEASUREMENT_METRICS
+    )
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(
+            f"""
+            SELECT bucket_ts / ? AS bucket, SUM(samples), {columns}
+            FROM measurement_rollups
+            WHERE tier = ? AND bucket_ts BETWEEN ? AND ?
+            GROUP BY bucket
+            ORDER BY bucket
+            """,
+            (bucket, tier, start_ts - start_ts % size, end_ts),
+        )
+        rows = cur.fetchall()
+    finally:
+        conn.close()
+    return [(row[0] * bucket, *row[1:]) for row in rows]
+
+
+def fetch_dns_buckets(start_ts, end_ts, bucket):
+    """
+    Bucketed counterpart of fetch_dns_for_range: bucket_ts -> {server_ip: detail}.
+
+    latency_ms and success_pct are bucket averages, p95_ms the worst p95.
+    Uses the same rollup tier selection as fetch_measurement_buckets.
+    """
+    tier = select_rollup_tier(bucket)
+    if tier is not None:
+        tier_name, size = tier
+        query = """
+            SELECT bucket_ts / ? AS bucket, server_ip,
+                   SUM(latency_ms * samples) / NULLIF(
+                       SUM(CASE WHEN latency_ms IS NULL THEN 0 ELSE samples END), 0
+                   ),
+                   SUM(success_pct * samples) / NULLIF(
+                       SUM(CASE WHEN success_pct IS NULL THEN 0 ELSE samples END), 0
+                   ),
+                   MAX(p95_ms)
+            FROM dns_rollups
+            WHERE tier = ? AND bucket_ts BETWEEN ? AND ?
+            GROUP BY bucket, server_ip
+        """
+        params = (bucket, tier_name, start_ts - start_ts % size, end_ts)
+    else:
+        query = """
+            SELECT ts / ? AS bucket, server_ip,
+                   AVG(latency_ms), AVG(success_pct), MAX(p95_ms)
+            FROM dns_measurements
+            WHERE ts BETWEEN ? AND ?
+            GROUP BY bucket, server_ip
+        """
+        params = (bucket, start_ts, end_ts)
+
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(query, params)
+        rows = cur.fetchall()
+    finally:
+        conn.close()
+
+    out = {}
+    for bucket_index, ip, lat, success_pct, p95_ms in rows:
+        out.setdefault(bucket_index * bucket, {})[ip] = {
+            "latency_ms": lat,
+            "success_pct": success_pct,
+            "p95_ms": p95_ms,
+        }
+    return out
+
+
+def fetch_latest():
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            SELECT ts, avg_latency_ms, avg_jitter_ms,
+                   avg_loss_pct, avg_dns_latency_ms, score
+            FROM measurements
+            ORDER BY ts DESC
+            LIMIT 1
+            """
+        )
+        row = cur.fetchone()
+    finally:
+        conn.close()
+    return row
+
+
+def fetch_latest_ts(tables):
+    """Newest ts of each table in ``tables``, in order (None when empty)."""
+    columns = ", ".join(f"(SELECT MAX(ts) FROM {table})" for table in tables)
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(f"SELECT {columns}")
+        row = cur.fetchone()
+    finally:
+        conn.close()
+    return tuple(row)
+
+
+def insert_speedtest(
+    ts,
+    ping_ms,
+    download_mbps,
+    upload_mbps,
+    server,
+    requested_server_id=None,
+    backend=None,
+):
+    """Store one speedtest and return the row as fetch_speedtests reads it."""
+    row = (
+        ts,
+        ping_ms,
+        download_mbps,
+        upload_mbps,
+        str(server.get("id")) if server and server.get("id") is not None else None,
+        server.get("name") if server else None,
+        server.get("host") if server else None,
+        server.get("country") if server else None,
+        str(requested_server_id) if requested_server_id else None,
+        backend,
+    )
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            INSERT INTO speedtests
+            (ts, ping_ms, download_mbps, upload_mbps,
+             server_id, server_name, server_host, server_country,
+             requested_server_id, backend)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            row,
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    return row
+
+
+def fetch_speedtests(limit=100, since=None):
+    """Newest ``limit`` speedtests, oldest first; only ts > since if given."""
+    where = "WHERE ts > ?" if since is not None else ""
+    params = (since, limit) if since is not None else (limit,)
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(
+            f"""
+            SELECT ts, ping_ms, download_mbps, upload_mbps,
+                   server_id, server_name, server_host, server_country,
+                   requested_server_id, backend
+            FROM speedtests
+            {where}
+            ORDER BY ts DESC
+            LIMIT ?
+            """,
+            params,
+        )
+        rows = cur.fetchall()
+    finally:
+        conn.close()
+    rows.reverse()
+    return rows
+
+
+def fetch_latest_speedtest():
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            SELECT ts, ping_ms, download_mbps, upload_mbps,
+                   server_id, server_name, server_host, server_country,
+                   requested_server_id, backend
+            FROM speedtests
+            ORDER BY ts DESC
+            LIMIT 1
+            """
+        )
+        row = cur.fetchone()
+    finally:
+        conn.close()
+    return row
+
+
+SPEEDTEST_JOB_COLUMNS = """
+    id, created_ts, started_ts, finished_ts, source, state, phase,
+    request, progress, result, error
+"""
+
+
+def insert_speedtest_job(source, request_args):
+    """Queue a speedtest job and return its id."""
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            INSERT INTO speedtest_jobs (created_ts, source, state, phase, request)
+            VALUES (?, ?, 'queued', 'queued', ?)
+            RETURNING id
+            """,
+            (int(time.time()), source, json.dumps(request_args)),
+        )
+        job_id = cur.fetchone()[0]
+        conn.commit()
+    finally:
+        conn.close()
+    return job_id
+
+
+def fetch_speedtest_job(job_id):
+    """One job row, plus how many unfinished jobs are ahead of it."""
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(
+            f"SELECT {SPEEDTEST_JOB_COLUMNS} FROM speedtest_jobs WHERE id = ?",
+            (job_id,),
+        )
+        row = cur.fetchone()
+        ahead = 0
+        if row:
+            cur.execute(
+                """
+                SELECT COUNT(*) FROM speedtest_jobs
+                WHERE id < ? AND state IN ('queued', 'running')
+                """,
+                (job_id,),
+            )
+            ahead = cur.fetchone()[0]
+    finally:
+        conn.close()
+    return row, ahead
+
+
+def fetch_speedtest_jobs(limit=20):
+    """Newest ``limit`` jobs, newest first."""
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(
+            f"""
+            SELECT {SPEEDTEST_JOB_COLUMNS} FROM speedtest_jobs
+            ORDER BY id DESC
+            LIMIT ?
+            """,
+            (limit,),
+        )
+        rows = cur.fetchall()
+    finally:
+        conn.close()
+    return rows
+
+
+def fetch_unfinished_speedtest_job(source):
+    """Id of a queued or running job from ``source``, or None."""
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            SELECT id FROM speedtest_jobs
+            WHERE source = ? AND state IN ('queued', 'running')
+            ORDER BY id
+            LIMIT 1
+            """,
+            (source,),
+        )
+        row = cur.fetchone()
+    finally:
+        conn.close()
+    return row[0] if row else None
+
+
+def claim_speedtest_job():
+    """Mark the oldest queued job running and return its row, or None."""
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(
+            f"""
+            SELECT {SPEEDTEST_JOB_COLUMNS} FROM speedtest_jobs
+            WHERE state = 'queued'
+            ORDER BY id
+            LIMIT 1
+            """
+        )
+        row = cur.fetchone()
+        if row:
+            cur.execute(
+                """
+                UPDATE speedtest_jobs
+                SET state = 'running', phase = 'starting', started_ts = ?
+                WHERE id = ?
+                """,
+                (int(time.time()), row[0]),
+            )
+            cur.execute(
+                f"SELECT {SPEEDTEST_JOB_COLUMNS} FROM speedtest_jobs WHERE id = ?",
+                (row[0],),
+            )
+            row = cur.fetchone()
+        conn.commit()
+    finally:
+        conn.close()
+    return row
+
+
+def update_speedtest_job(job_id, **fields):
+    """
+    Set columns of one job. ``progress`` and ``result`` are stored as JSON;
+    a final ``state`` also stamps finished_ts.
+    """
+    if fields.get("state") in ("done", "failed"):
+        fields["finished_ts"] = int(time.time())
+    for key in ("progress", "result"):
+        if key in fields:
+            fields[key] = json.dumps(fields[key])
+    assignments = ", ".join(f"{column} = ?" for column in fields)
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(
+            f"UPDATE speedtest_jobs SET {assignments} WHERE id = ?",
+            tuple(fields.values()) + (job_id,),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def tidy_speedtest_jobs(keep):
+    """
+    Fail jobs a previous prober left running and drop all but the newest
+    ``keep`` finished jobs.
+    """
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            UPDATE speedtest_jobs
+            SET state = 'failed', error = ?, finished_ts = ?
+            WHERE state = 'running'
+            """,
+            ("The prober stopped before this Speedtest finished", int(time.time())),
+        )
+        cur.execute(
+            """
+            DELETE FROM speedtest_jobs
+            WHERE state IN ('done', 'failed')
+              AND id <= (
+                  SELECT id FROM speedtest_jobs
+                  WHERE state IN ('done', 'failed')
+                  ORDER BY id DESC
+                  LIMIT 1 OFFSET ?
+              )
+            """,
+            (keep,),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+# -------------------------
+# Retention
+# -------------------------
+#
+# Old rows are deleted in RETENTION_CHUNK_ROWS-sized transactions with a short
+# pause in between, so the probe writer never waits behind one long delete.
+# On Postgres, expired partitions of the raw tables are dropped outright.
+# SQLite then returns the freed pages with incremental_vacuum; Postgres leaves
+# space reuse in partially pruned tables to autovacuum.
+
+# (retention key, table, timestamp column, rollup tier or None)
+RETENTION_TARGETS = (
+    ("measurements", "measurements", "ts", None),
+    ("dns_measurements", "dns_measurements", "ts", None),
+    ("dns_queries", "dns_queries", "ts", None),
+    ("ping_samples", "ping_samples", "ts", None),
+    ("speedtests", "speedtests", "ts", None),
+    ("rollups_1m", "measurement_rollups", "bucket_ts", "1m"),
+    ("rollups_1m", "dns_rollups", "bucket_ts", "1m"),
+    ("rollups_1h", "measurement_rollups", "bucket_ts", "1h"),
+    ("rollups_1h", "dns_rollups", "bucket_ts", "1h"),
+    ("rollups_1d", "measurement_rollups", "bucket_ts", "1d"),
+    ("rollups_1d", "dns_rollups", "bucket_ts", "1d"),
+)
+RETENTION_CHUNK_PAUSE = 0.05
+SQLITE_VACUUM_CHUNK_PAGES = 2048
+
+RETENTION_STATS = {}
+RETENTION_STATS_LOCK = threading.Lock()
+
+
+def get_retention_stats():
+    with RETENTION_STATS_LOCK:
+        return dict(RETENTION_STATS)
+
+
+def drop_expired_partitions(table, cutoff):
+    """Drop Postgres partitions of ``table`` that end before ``cutoff``."""
+    dropped = 0
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        for name, _start, end in list_partitions(cur, table):
+            if end > cutoff:
+                break
+            cur.execute(f"SELECT COUNT(*) FROM {name}")
+            dropped += cur.fetchone()[0]
+            cur.execute(f"DROP TABLE {name}")
+            conn.commit()
+            logger.info("Dropped expired partition %s", name)
+    finally:
+        conn.close()
+    return dropped
+
+
+def prune_table(table, ts_column, cutoff, tier=None):
+    """Delete rows of ``table`` older than ``cutoff`` in chunks; return count."""
+    if tier is None:
+        key_column, scope, scope_params = "id", "", ()
+    else:
+        key_column, scope, scope_params = ts_column, "tier = ? AND ", (tier,)
 
-def fetch_latest():
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT ts, avg_latency_ms, avg_jitter_ms,
-               avg_loss_pct, avg_dns_latency_ms, score
-        FROM measurements
-        ORDER BY ts DESC
-        LIMIT 1
-        """
+    deleted = 0
+    if USING_POSTGRES and table in PARTITIONED_TABLES:
+        # Whole expired partitions go at once; the chunked delete below only
+        # trims the partition that straddles the cutoff.
+        deleted += drop_expired_partitions(table, cutoff)
+    while True:
+        conn = get_db_connection()
+        try:
+            cur = conn.cursor()
+            cur.execute(
+                f"""
+                DELETE FROM {table}
+                WHERE {scope}{key_column} IN (
+                    SELECT {key_column} FROM {table}
+                    WHERE {scope}{ts_column} < ?
+                    ORDER BY {ts_column}
+                    LIMIT ?
+                )
+                """,
+                scope_params + scope_params + (cutoff, RETENTION_CHUNK_ROWS),
+            )
+            count = max(cur.rowcount, 0)
+            conn.commit()
+        finally:
+            conn.close()
+        deleted += count
+        if count < RETENTION_CHUNK_ROWS:
+            return deleted
+        time.sleep(RETENTION_CHUNK_PAUSE)
+
+
+def database_size_bytes():
+    """On-disk size of the database (SQLite file plus WAL, or Postgres DB)."""
+    if USING_POSTGRES:
+        conn = get_db_connection()
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT pg_database_size(current_database())")
+            return cur.fetchone()[0]
+        finally:
+            conn.close()
+    return sum(
+        os.path.getsize(path)
+        for path in (DB_PATH, f"{DB_PATH}-wal")
+        if os.path.exists(path)
     )
-    row = cur.fetchone()
-    conn.close()
-    return row
 
 
-def insert_speedtest(
-    ts,
-    ping_ms,
-    download_mbps,
-    upload_mbps,
-    server,
-    requested_server_id=None,
-    backend=None,
-):
+def reclaim_sqlite_space():
+    """Release free SQLite pages back to the filesystem in small steps."""
+    if USING_POSTGRES:
+        return
+    previous = None
+    while True:
+        conn = get_db_connection()
+        try:
+            cur = conn.cursor()
+            cur.execute("PRAGMA freelist_count")
+            free_pages = cur.fetchone()[0]
+            # Stop when nothing is left or the database is not in incremental
+            # auto_vacuum mode and the pragma frees nothing.
+            if free_pages == 0 or free_pages == previous:
+                break
+            # executescript steps the pragma to completion; a plain execute
+            # frees only one page per call.
+            cur.executescript(
+                f"PRAGMA incremental_vacuum({SQLITE_VACUUM_CHUNK_PAGES});"
+            )
+        finally:
+            conn.close()
+        previous = free_pages
+        time.sleep(RETENTION_CHUNK_PAUSE)
+
     conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        INSERT INTO speedtests
-        (ts, ping_ms, download_mbps, upload_mbps,
-         server_id, server_name, server_host, server_country,
-         requested_server_id, backend)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """,
-        (
-            ts,
-            ping_ms,
-            download_mbps,
-            upload_mbps,
-            str(server.get("id")) if server and server.get("id") is not None else None,
-            server.get("name") if server else None,
-            server.get("host") if server else None,
-            server.get("country") if server else None,
-            str(requested_server_id) if requested_server_id else None,
-            backend,
-        ),
-    )
-    conn.commit()
-    conn.close()
+    try:
+        cur = conn.cursor()
+        cur.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        cur.fetchall()
+    finally:
+        conn.close()
+
 
+def enable_sqlite_incremental_vacuum():
+    """
+    Switch SQLite to auto_vacuum=INCREMENTAL so retention can give pages back.
 
-def fetch_speedtests(limit=100):
+    The mode only takes effect after a full VACUUM. It rewrites the whole
+    file and probe writes wait until it finishes, so it runs once, here in
+    the retention thread, rather than while a worker boots.
+    """
+    if USING_POSTGRES:
+        return
     conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT ts, ping_ms, download_mbps, upload_mbps,
-               server_id, server_name, server_host, server_country,
-               requested_server_id, backend
-        FROM speedtests
-        ORDER BY ts DESC
-        LIMIT ?
-        """,
-        (limit,),
-    )
-    rows = cur.fetchall()
-    conn.close()
-    rows.reverse()
-    return rows
+    try:
+        cur = conn.cursor()
+        cur.execute("PRAGMA auto_vacuum")
+        row = cur.fetchone()
+        if row and row[0] == 2:
+            return
+        logger.warning(
+            "Running a one-time VACUUM of the %.1f MB SQLite database to enable "
+            "incremental auto_vacuum; this may take a while and probe writes "
+            "wait until it finishes",
+            database_size_bytes() / 1e6,
+        )
+        started = time.monotonic()
+        cur.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        cur.execute("VACUUM")
+        logger.info("SQLite VACUUM finished in %.1fs", time.monotonic() - started)
+    finally:
+        conn.close()
 
 
-def fetch_latest_speedtest():
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT ts, ping_ms, download_mbps, upload_mbps,
-               server_id, server_name, server_host, server_country,
-               requested_server_id, backend
-        FROM speedtests
-        ORDER BY ts DESC
-        LIMIT 1
-        """
-    )
-    row = cur.fetchone()
-    conn.close()
-    return row
+def retention_cutoffs(ts):
+    """Oldest ts each RETENTION_KEYS entry keeps at ``ts``, for enabled ones."""
+    return {key: ts - days * 86400 for key, days in RETENTION_DAYS.items() if days}
+
+
+def run_retention_cycle(ts):
+    """Apply RETENTION_DAYS, reclaim space and record what was removed."""
+    started = time.monotonic()
+    size_before = database_size_bytes()
+    enable_sqlite_incremental_vacuum()
+    rows_deleted = {}
+    for key, table, ts_column, tier in RETENTION_TARGETS:
+        days = RETENTION_DAYS.get(key, 0)
+        if not days:
+            continue
+        count = prune_table(table, ts_column, ts - days * 86400, tier)
+        if count:
+            name = f"{table}:{tier}" if tier else table
+            rows_deleted[name] = count
+    trim_hot_window(retention_cutoffs(ts))
+    if rows_deleted:
+        reclaim_sqlite_space()
+    bytes_reclaimed = max(0, size_before - database_size_bytes())
+
+    with RETENTION_STATS_LOCK:
+        RETENTION_STATS.update(
+            last_run=ts,
+            last_duration_s=round(time.monotonic() - started, 3),
+            last_rows_deleted=rows_deleted,
+            last_bytes_reclaimed=bytes_reclaimed,
+            total_rows_deleted=RETENTION_STATS.get("total_rows_deleted", 0)
+            + sum(rows_deleted.values()),
+            total_bytes_reclaimed=RETENTION_STATS.get("total_bytes_reclaimed", 0)
+            + bytes_reclaimed,
+        )
+    if rows_deleted:
+        logger.info(
+            "Retention removed %s rows (%s), reclaimed %.1f MB",
+            sum(rows_deleted.values()),
+            ", ".join(f"{name}={count}" for name, count in rows_deleted.items()),
+            bytes_reclaimed / (1024 * 1024),
+        )
+
+
+# -------------------------
+# Hot window cache
+# -------------------------
+#
+# The probe loop writes every row the dashboard reads, so the newest cycles
+# are kept here as ready-made /api/score/recent items when they are stored.
+# The cache is loaded from the database at startup and from then on holds
+# exactly the newest rows; while it holds fewer than HOT_WINDOW_CYCLES it
+# holds the whole table. Anything it cannot answer goes to the database.
+HOT_WINDOW = deque(maxlen=HOT_WINDOW_CYCLES)
+HOT_WINDOW_LOCK = threading.Lock()
+HOT_WINDOW_READY = False
+# DNS summary from the DNS schedule waiting for the main cycle of the same ts.
+HOT_WINDOW_PENDING_DNS = {}
+HOT_SPEEDTEST_ITEM = None
+
+
+def load_hot_window():
+    """Fill the hot window from the database; called once at startup."""
+    global HOT_WINDOW_READY, HOT_SPEEDTEST_ITEM
+    if not HOT_WINDOW_CYCLES:
+        return
+    items = recent_items(fetch_recent(HOT_WINDOW_CYCLES))
+    speedtest_row = fetch_latest_speedtest()
+    with HOT_WINDOW_LOCK:
+        HOT_WINDOW.clear()
+        HOT_WINDOW.extend(items)
+        HOT_SPEEDTEST_ITEM = speedtest_result_item(speedtest_row) if speedtest_row else None
+        HOT_WINDOW_READY = True
+
+
+def remember_probe_item(item):
+    """Append a stored cycle's /api/score/recent item to the hot window."""
+    with HOT_WINDOW_LOCK:
+        if not HOT_WINDOW_READY:
+            return
+        dns_summary = HOT_WINDOW_PENDING_DNS.pop(item["ts"], None)
+        if dns_summary:
+            item = dict(item)
+            attach_dns_detail(item, dns_summary)
+        HOT_WINDOW.append(item)
+
+
+def remember_dns_summary(ts, dns_summary):
+    """
+    Attach a summary stored by the DNS schedule to the cached cycle at ts.
+
+    The API joins DNS detail to cycles by timestamp, so a DNS tick that
+    coincides with a main tick shows up on that cycle whichever finishes
+    first. Cached items are replaced, never mutated, because request
+    threads may be serializing them.
+    """
+    with HOT_WINDOW_LOCK:
+        if not HOT_WINDOW_READY:
+            return
+        if HOT_WINDOW and HOT_WINDOW[-1]["ts"] == ts:
+            item = dict(HOT_WINDOW[-1])
+            attach_dns_detail(item, dns_summary)
+            HOT_WINDOW[-1] = item
+        else:
+            HOT_WINDOW_PENDING_DNS.clear()
+            HOT_WINDOW_PENDING_DNS[ts] = dns_summary
+
+
+def remember_speedtest_item(item):
+    global HOT_SPEEDTEST_ITEM
+    with HOT_WINDOW_LOCK:
+        if HOT_WINDOW_READY:
+            HOT_SPEEDTEST_ITEM = item
+
+
+def refresh_hot_window(items):
+    """
+    Merge fetch_recent items another process stored into the hot window.
+
+    ``items`` are oldest first and may start with the newest cached cycle
+    again: a DNS schedule on its own interval can store that cycle's detail
+    after the cycle itself, so a re-read item replaces the cached one.
+    """
+    with HOT_WINDOW_LOCK:
+        if not HOT_WINDOW_READY:
+            return
+        for item in items:
+            if not HOT_WINDOW or item["ts"] > HOT_WINDOW[-1]["ts"]:
+                HOT_WINDOW.append(item)
+            elif item["ts"] == HOT_WINDOW[-1]["ts"]:
+                HOT_WINDOW[-1] = item
+
+
+def hot_window_covers(limit, since=None):
+    """Whether the cache holds every row of a request; call with the lock held."""
+    if not HOT_WINDOW_READY:
+        return False
+    if len(HOT_WINDOW) < HOT_WINDOW.maxlen:
+        return True
+    if since is None:
+        return limit <= len(HOT_WINDOW)
+    return since >= HOT_WINDOW[0]["ts"]
+
+
+def hot_window_items(limit, since=None):
+    """
+    Newest ``limit`` cached items (only ts > since if given), oldest first.
+
+    Returns None when the cache cannot be sure it holds every matching row.
+    """
+    with HOT_WINDOW_LOCK:
+        if not hot_window_covers(limit, since):
+            return None
+        items = []
+        for item in reversed(HOT_WINDOW):
+            if len(items) >= limit or (since is not None and item["ts"] <= since):
+                break
+            items.append(item)
+    items.reverse()
+    return items
+
+
+def latest_measurement_item():
+    items = hot_window_items(1)
+    if items is not None:
+        return items[0] if items else None
+    row = fetch_latest()
+    return measurement_item(row) if row else None
+
+
+def latest_speedtest_item():
+    with HOT_WINDOW_LOCK:
+        if HOT_WINDOW_READY:
+            return HOT_SPEEDTEST_ITEM
+    row = fetch_latest_speedtest()
+    return speedtest_result_item(row) if row else None
+
+
+def trim_hot_window(cutoffs):
+    """Drop what retention just deleted; ``cutoffs`` maps RETENTION_KEYS to ts."""
+    global HOT_SPEEDTEST_ITEM
+    dns_keys = ("dns_per_server", "dns_success_pct_per_server", "dns_p95_per_server")
+    with HOT_WINDOW_LOCK:
+        cutoff = cutoffs.get("measurements")
+        while cutoff and HOT_WINDOW and HOT_WINDOW[0]["ts"] < cutoff:
+            HOT_WINDOW.popleft()
+        cutoff = cutoffs.get("dns_measurements")
+        for index, item in enumerate(HOT_WINDOW):
+            if not cutoff or item["ts"] >= cutoff:
+                break
+            if "dns_per_server" in item:
+                HOT_WINDOW[index] = {
+                    key: value for key, value in item.items() if key not in dns_keys
+                }
+        cutoff = cutoffs.get("speedtests")
+        if cutoff and HOT_SPEEDTEST_ITEM and HOT_SPEEDTEST_ITEM["ts"] < cutoff:
+            HOT_SPEEDTEST_ITEM = None
 
 
 # -------------------------
@@ -791,9 +3019,121 @@ def get_default_gateway():
         return None
 
 
+def percentile(sorted_values, pct):
+    """Return the linearly interpolated ``pct`` percentile of sorted values."""
+    if not sorted_values:
+        return None
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    rank = (len(sorted_values) - 1) * pct / 100.0
+    lower = int(rank)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    fraction = rank - lower
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * fraction
+
+
+def summarize_rtts(rtts):
+    """
+    Return latency statistics for a list of per-packet RTTs in send order.
+
+    Jitter is the mean absolute difference between consecutive RTTs (the
+    RFC 3550 interarrival jitter without its 1/16 smoothing), so a single
+    outlier no longer defines the whole value the way max-min did.
+    """
+    ordered = sorted(rtts)
+    if len(rtts) > 1:
+        jitter = statistics.mean(
+            abs(current - previous) for previous, current in zip(rtts, rtts[1:])
+        )
+        stddev = statistics.pstdev(rtts)
+    else:
+        jitter = 0.0
+        stddev = 0.0
+    return {
+        "latency": statistics.mean(rtts),
+        "jitter": jitter,
+        "stddev": stddev,
+        "min": ordered[0],
+        "max": ordered[-1],
+        "p50": percentile(ordered, 50),
+        "p95": percentile(ordered, 95),
+        "p99": percentile(ordered, 99),
+    }
+
+
+def build_ping_result(host, sent, received, rtts):
+    """
+    Build the per-host ping result dict shared by both ping engines.
+
+    ``latency``, ``jitter`` and ``loss`` feed the aggregate score. The raw
+    ``rtts`` and their distribution are kept for the ping_samples table. A
+    host with no replies gets the usual penalty latency/jitter values.
+    """
+    sent = max(int(sent), 0)
+    received = max(min(int(received), sent), 0)
+    loss = 100.0 * (sent - received) / sent if sent else 100.0
+
+    result = {
+        "host": host,
+        "sent": sent,
+        "received": received,
+        "loss": loss,
+        "rtts": list(rtts),
+    }
+    if rtts:
+        result.update(summarize_rtts(rtts))
+    else:
+        result.update(
+            latency=THRESHOLD_LATENCY * 2,
+            jitter=THRESHOLD_JITTER * 2,
+            stddev=None,
+            min=None,
+            max=None,
+            p50=None,
+            p95=None,
+            p99=None,
+        )
+
+    logger.info(
+        "ping %s -> loss=%.1f%% avg=%.1fms jitter=%.1fms",
+        host,
+        result["loss"],
+        result["latency"],
+        result["jitter"],
+        extra={"host": host},
+    )
+    return result
+
+
+def failed_ping_result(host, count):
+    """Return the penalty result used when a ping could not run at all."""
+    return {
+        "host": host,
+        "sent": count,
+        "received": 0,
+        "loss": 100.0,
+        "rtts": [],
+        "latency": THRESHOLD_LATENCY * 2,
+        "jitter": THRESHOLD_JITTER * 2,
+        "stddev": None,
+        "min": None,
+        "max": None,
+        "p50": None,
+        "p95": None,
+        "p99": None,
+    }
+
+
+PING_TRANSMIT_RE = re.compile(r"(\d+) packets transmitted, (\d+) (?:packets )?received")
+PING_REPLY_TIME_RE = re.compile(r"\btime[=<]\s*([\d.]+)\s*ms")
+
+
 def run_ping(host, count):
     """
-    Run ping and return latency (avg ms), jitter (max-min), and loss (%).
+    Run ping and return latency, jitter, loss and the per-packet RTTs.
+
+    The per-reply ``time=`` lines supply the individual RTTs; the summary line
+    supplies the transmitted/received counts.
     """
     out = ""
     err = ""
@@ -801,7 +3141,7 @@ def run_ping(host, count):
 
     try:
         proc = subprocess.run(
-            ["ping", "-q", "-c", str(count), host],
+            ["ping", "-c", str(count), host],
             capture_output=True,
             text=True,
             timeout=timeout,
@@ -816,45 +3156,23 @@ def run_ping(host, count):
                 host,
                 proc.returncode,
                 err.strip(),
+                extra={"host": host},
             )
 
         if not out.strip():
             raise RuntimeError("no ping stdout")
 
-        lines = out.splitlines()
-        loss_line = next((line for line in lines if "packet loss" in line), None)
-        if not loss_line:
+        summary = PING_TRANSMIT_RE.search(out)
+        if not summary:
             raise RuntimeError("no packet loss line in ping output")
 
-        loss_str = loss_line.split("%")[0].split()[-1]
-        loss = float(loss_str)
-
-        rtt_line = next(
-            (
-                line
-                for line in lines
-                if "min/avg/max" in line or "min/mean/max" in line
-            ),
-            None,
-        )
-
-        if rtt_line:
-            stats_part = rtt_line.split("=")[1].split()[0]
-            rtt_stats = stats_part.split("/")
-            rtt_min, rtt_avg, rtt_max = map(float, rtt_stats[:3])
-            jitter = rtt_max - rtt_min
-        else:
-            rtt_avg = THRESHOLD_LATENCY * 2
-            jitter = THRESHOLD_JITTER * 2
-
-        logger.info(
-            "ping %s -> loss=%.1f%% avg=%.1fms jitter=%.1fms",
+        rtts = [float(match) for match in PING_REPLY_TIME_RE.findall(out)]
+        return build_ping_result(
             host,
-            loss,
-            rtt_avg,
-            jitter,
+            int(summary.group(1)),
+            int(summary.group(2)),
+            rtts,
         )
-        return {"host": host, "latency": rtt_avg, "jitter": jitter, "loss": loss}
 
     except Exception as exc:
         logger.error(
@@ -863,50 +3181,492 @@ def run_ping(host, count):
             exc,
             out,
             err,
+            extra={"host": host},
         )
-        return {
-            "host": host,
-            "latency": THRESHOLD_LATENCY * 2,
-            "jitter": THRESHOLD_JITTER * 2,
-            "loss": 100.0,
-        }
+        return failed_ping_result(host, count)
+
+
+# -------------------------
+# Native ICMP echo engine
+# -------------------------
+#
+# Sends every target's echo requests from a single ICMP socket and times the
+# replies in-process, so a probe cycle costs no fork/exec and no text parsing.
+# Results use the same dict shape as run_ping, including the per-packet RTTs.
+
+ICMP_ECHO_REPLY = 0
+ICMP_ECHO_REQUEST = 8
+# 56 payload bytes, matching the iputils ping default packet size.
+ICMP_PAYLOAD = b"netprobe" * 7
+# Spacing between echo rounds, matching the ping default of one per second.
+ICMP_SEND_INTERVAL = 1.0
+# How long to wait for late replies after the final round has been sent.
+ICMP_REPLY_TIMEOUT = 2.0
+
+_icmp_sequence = itertools.count(1)
+_icmp_sequence_lock = threading.Lock()
+_icmp_socket_kind = None
+
+
+def next_icmp_sequence():
+    with _icmp_sequence_lock:
+        return next(_icmp_sequence) & 0xFFFF
+
+
+def icmp_checksum(data):
+    """Return the RFC 1071 internet checksum for ``data``."""
+    if len(data) % 2:
+        data += b"\x00"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+def build_icmp_echo_request(ident, seq):
+    header = struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, 0, ident, seq)
+    checksum = icmp_checksum(header + ICMP_PAYLOAD)
+    return (
+        struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, checksum, ident, seq)
+        + ICMP_PAYLOAD
+    )
+
+
+def parse_icmp_echo_reply(packet, raw):
+    """
+    Return ``(ident, seq)`` for an ICMP echo reply, or None for anything else.
+
+    Raw sockets deliver the IP header in front of the ICMP message; datagram
+    ICMP sockets deliver the ICMP message only.
+    """
+    if raw:
+        if len(packet) < 20:
+            return None
+        packet = packet[(packet[0] & 0x0F) * 4 :]
+    if len(packet) < 8:
+        return None
+    icmp_type, _code, _checksum, ident, seq = struct.unpack("!BBHHH", packet[:8])
+    if icmp_type != ICMP_ECHO_REPLY:
+        return None
+    return ident, seq
+
+
+def open_icmp_socket():
+    """
+    Open an IPv4 ICMP socket and return ``(sock, kind)``.
+
+    Unprivileged datagram ICMP sockets are preferred; raw sockets need
+    CAP_NET_RAW. Returns ``(None, None)`` when neither can be opened.
+    """
+    for kind, sock_type in (("dgram", socket.SOCK_DGRAM), ("raw", socket.SOCK_RAW)):
+        try:
+            sock = socket.socket(socket.AF_INET, sock_type, socket.IPPROTO_ICMP)
+        except OSError:
+            continue
+        sock.setblocking(False)
+        return sock, kind
+    return None, None
+
+
+def resolve_icmp_target(host):
+    """Return the first IPv4 address for ``host``, or None."""
+    try:
+        infos = socket.getaddrinfo(host, None, socket.AF_INET, socket.SOCK_RAW)
+    except (OSError, UnicodeError):
+        return None
+    return infos[0][4][0] if infos else None
+
+
+def expand_ping_counts(hosts, count):
+    """Return one packet count per host from an int or a per-host list."""
+    if isinstance(count, int):
+        return [count] * len(hosts)
+    counts = list(count)
+    if len(counts) != len(hosts):
+        raise ValueError("ping count list must match the host list")
+    return counts
+
+
+def run_icmp_probe(hosts, count):
+    """
+    Ping every host from one ICMP socket and return results in the order given.
+
+    ``count`` is the number of echoes per host, either one int or a list with
+    one count per host. Echo rounds are sent ICMP_SEND_INTERVAL apart, one
+    request per remaining target per round, so the whole phase takes about as
+    long as a single ``ping -c max(count)``. Hosts without an IPv4 address are
+    handed to the ping subprocess path. Returns None when no ICMP socket can
+    be opened.
+    """
+    global _icmp_socket_kind
+
+    hosts = list(hosts)
+    counts = expand_ping_counts(hosts, count)
+    rounds = max(counts, default=0)
+    sock, kind = open_icmp_socket()
+    if sock is None:
+        if _icmp_socket_kind != "unavailable":
+            logger.warning(
+                "No ICMP socket available (needs net.ipv4.ping_group_range or "
+                "CAP_NET_RAW); falling back to ping subprocesses"
+            )
+            _icmp_socket_kind = "unavailable"
+        return None
+
+    if kind != _icmp_socket_kind:
+        logger.info("Native ICMP engine using %s socket", kind)
+        _icmp_socket_kind = kind
+
+    raw = kind == "raw"
+    ident = os.getpid() & 0xFFFF
+    results = [None] * len(hosts)
+    targets = []
+    fallback_indexes = []
+    for index, host in enumerate(hosts):
+        address = resolve_icmp_target(host)
+        if address:
+            targets.append((index, address))
+        else:
+            fallback_indexes.append(index)
+
+    sent = [0] * len(hosts)
+    rtts = [[] for _ in hosts]
+    pending = {}
+
+    def drain(until, stop_when_idle):
+        while True:
+            remaining = until - time.monotonic()
+            if remaining <= 0 or (stop_when_idle and not pending):
+                return
+            readable, _, _ = select.select([sock], [], [], remaining)
+            if not readable:
+                continue
+            while True:
+                try:
+                    packet, (source, _port) = sock.recvfrom(2048)
+                except BlockingIOError:
+                    break
+                received_at = time.perf_counter()
+                reply = parse_icmp_echo_reply(packet, raw)
+                if reply is None:
+                    continue
+                reply_ident, seq = reply
+                # Datagram sockets rewrite the identifier to the local port and
+                # only deliver our own replies; raw sockets see every reply.
+                if raw and reply_ident != ident:
+                    continue
+                match = pending.get(seq)
+                if match is None or match[1] != source:
+                    continue
+                del pending[seq]
+                index, _address, sent_at, round_number = match
+                rtts[index].append((round_number, (received_at - sent_at) * 1000.0))
+
+    try:
+        for round_number in range(rounds):
+            round_started = time.monotonic()
+            for index, address in targets:
+                if round_number >= counts[index]:
+                    continue
+                seq = next_icmp_sequence()
+                sent[index] += 1
+                try:
+                    sock.sendto(build_icmp_echo_request(ident, seq), (address, 0))
+                except OSError as exc:
+                    logger.warning(
+                        "ICMP echo to %s failed: %s",
+                        hosts[index],
+                        exc,
+                        extra={"host": hosts[index]},
+                    )
+                    continue
+                pending[seq] = (index, address, time.perf_counter(), round_number)
+
+            if round_number < rounds - 1:
+                drain(round_started + ICMP_SEND_INTERVAL, stop_when_idle=False)
+            else:
+                drain(time.monotonic() + ICMP_REPLY_TIMEOUT, stop_when_idle=True)
+    finally:
+        sock.close()
+
+    for index, _address in targets:
+        # Replies can arrive out of order; jitter needs them in send order.
+        ordered_rtts = [rtt for _round, rtt in sorted(rtts[index])]
+        results[index] = build_ping_result(
+            hosts[index],
+            sent[index],
+            len(ordered_rtts),
+            ordered_rtts,
+        )
+
+    if fallback_indexes:
+        fallback_results = run_ping_pool(
+            [hosts[i] for i in fallback_indexes],
+            [counts[i] for i in fallback_indexes],
+        )
+        for index, result in zip(fallback_indexes, fallback_results):
+            results[index] = result
+
+    return results
+
+
+def run_ping_pool(hosts, count):
+    """
+    Ping several hosts with concurrent ping subprocesses.
+
+    Each target goes through ``run_ping`` so the per-host result dicts and log
+    lines are unchanged. ``count`` is one int or a per-host list. At most
+    PING_CONCURRENCY pings run at once.
+    """
+    hosts = list(hosts)
+    if not hosts:
+        return []
+    counts = expand_ping_counts(hosts, count)
+
+    workers = min(PING_CONCURRENCY, len(hosts))
+    if workers <= 1:
+        return [run_ping(host, host_count) for host, host_count in zip(hosts, counts)]
+
+    with ThreadPoolExecutor(
+        max_workers=workers,
+        thread_name_prefix="netprobe-ping",
+    ) as executor:
+        return list(executor.map(run_ping, hosts, counts))
+
+
+def run_ping_many(hosts, count):
+    """
+    Ping several hosts and return results in the order given.
+
+    ``count`` is one packet count for every host or a list with one per host.
+    The native ICMP engine is used unless PING_ENGINE=subprocess or no ICMP
+    socket can be opened, in which case the ping subprocess pool is used.
+    """
+    hosts = list(hosts)
+    if not hosts:
+        return []
+
+    if PING_ENGINE != "subprocess":
+        try:
+            results = run_icmp_probe(hosts, count)
+        except OSError as exc:
+            logger.warning(
+                "Native ICMP probe failed (%s); falling back to ping subprocesses",
+                exc,
+            )
+            results = None
+        if results is not None:
+            return results
+
+    return run_ping_pool(hosts, count)
+
+
+# -------------------------
+# DNS query plumbing
+# -------------------------
+#
+# Lookups reuse a cached destination per DNS server and a pool of pre-bound UDP
+# sockets per address family, and the query is encoded before the clock
+# starts. The reported latency then covers only the wire round trip, not
+# resolver construction or socket setup.
+
+DNS_PORT = 53
+DNS_QUERY_LIFETIME = 3.0
+
+_dns_destinations = {}
+_dns_destinations_lock = threading.Lock()
+_dns_socket_pool = {}
+_dns_socket_pool_lock = threading.Lock()
+
+
+def get_dns_destination(server):
+    """Return the cached ``(address_family, destination)`` for a DNS server."""
+    with _dns_destinations_lock:
+        cached = _dns_destinations.get(server)
+        if cached is None:
+            family = dns.inet.af_for_address(server)
+            cached = (
+                family,
+                dns.inet.low_level_address_tuple((server, DNS_PORT), family),
+            )
+            _dns_destinations[server] = cached
+        return cached
+
+
+def acquire_dns_socket(family):
+    """Take a pre-bound, non-blocking UDP socket from the pool or open one."""
+    with _dns_socket_pool_lock:
+        pool = _dns_socket_pool.setdefault(family, [])
+        if pool:
+            return pool.pop()
+
+    sock = socket.socket(family, socket.SOCK_DGRAM)
+    sock.setblocking(False)
+    sock.bind(("::", 0) if family == socket.AF_INET6 else ("0.0.0.0", 0))
+    return sock
+
+
+def release_dns_socket(family, sock, reusable):
+    """
+    Return a socket to the pool, or close it.
+
+    Sockets from failed or timed-out lookups are closed so a late answer can
+    never be read by the next query. The pool never holds more than
+    DNS_CONCURRENCY sockets per family.
+    """
+    if reusable:
+        with _dns_socket_pool_lock:
+            pool = _dns_socket_pool.setdefault(family, [])
+            if len(pool) < DNS_CONCURRENCY:
+                pool.append(sock)
+                return
+    sock.close()
+
+
+def run_dns_queries(domain, server, count, deadline=None):
+    """
+    Query ``server`` for ``domain`` ``count`` times and return each outcome.
+
+    Every outcome is ``{"server", "domain", "status", "latency_ms"}``. The
+    status is the response RCODE text (NOERROR, NXDOMAIN, SERVFAIL, ...), or
+    TIMEOUT / ERROR when no usable answer arrived; ``latency_ms`` is only set
+    for answered queries so a timeout is never averaged in as a latency.
+
+    ``deadline`` is an optional ``time.monotonic()`` value; lookups are capped
+    so they never run past it, and no new lookup starts once it has passed.
+    """
+    family, destination = get_dns_destination(server)
+    outcomes = []
+
+    for _ in range(count):
+        lifetime = DNS_QUERY_LIFETIME
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            lifetime = min(lifetime, remaining)
+
+        query = dns.message.make_query(domain, dns.rdatatype.A)
+        wire = query.to_wire()
+        sock = acquire_dns_socket(family)
+        status = "ERROR"
+        latency_ms = None
+
+        start = time.perf_counter()
+        try:
+            expiration = time.time() + lifetime
+            dns.query.send_udp(sock, wire, destination, expiration)
+            response, _received_time = dns.query.receive_udp(
+                sock,
+                destination,
+                expiration,
+                ignore_unexpected=True,
+                ignore_errors=True,
+                query=query,
+            )
+            latency_ms = (time.perf_counter() - start) * 1000.0
+            status = dns.rcode.to_text(response.rcode())
+        except dns.exception.Timeout:
+            status = "TIMEOUT"
+        except Exception as exc:
+            logger.debug(
+                "DNS query %s @%s failed: %s",
+                domain,
+                server,
+                exc,
+                extra={"server": server, "domain": domain},
+            )
+        release_dns_socket(family, sock, latency_ms is not None)
+
+        outcomes.append(
+            {
+                "server": server,
+                "domain": domain,
+                "status": status,
+                "latency_ms": latency_ms,
+            }
+        )
+
+    return outcomes
 
 
-def measure_dns_latency(domain, server, count):
-    resolver = dns.resolver.Resolver(configure=False)
-    resolver.nameservers = [server]
-    times = []
+def run_dns_phase(servers, domains, count):
+    """
+    Query every DNS server for every domain concurrently.
+
+    Returns the flat list of query outcomes from ``run_dns_queries``. At most
+    DNS_CONCURRENCY lookups run at once and the whole phase is bounded by
+    DNS_PHASE_TIMEOUT; pairs that have not finished by then are left out.
+    """
+    tasks = [(server, domain) for server in servers for domain in domains]
+    if not tasks:
+        return []
+
+    deadline = time.monotonic() + DNS_PHASE_TIMEOUT
+    executor = ThreadPoolExecutor(
+        max_workers=min(DNS_CONCURRENCY, len(tasks)),
+        thread_name_prefix="netprobe-dns",
+    )
+    try:
+        futures = {
+            executor.submit(run_dns_queries, domain, server, count, deadline): (
+                server,
+                domain,
+            )
+            for server, domain in tasks
+        }
+        # Lookups cap their own lifetime at the deadline; the short grace lets
+        # those capped lookups report instead of being counted as skipped.
+        done, not_done = wait(futures, timeout=DNS_PHASE_TIMEOUT + 1.0)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
 
-    for _ in range(count):
-        start = time.perf_counter()
-        try:
-            resolver.resolve(domain, "A", lifetime=3)
-        except Exception:
-            pass
-        elapsed = (time.perf_counter() - start) * 1000.0
-        times.append(elapsed)
+    if not_done:
+        logger.warning(
+            "DNS phase deadline of %ss reached; skipped %s of %s lookups (%s)",
+            DNS_PHASE_TIMEOUT,
+            len(not_done),
+            len(tasks),
+            ", ".join(sorted({futures[future][0] for future in not_done})),
+        )
 
-    if not times:
-        return None
-    return sum(times) / len(times)
+    outcomes = []
+    for future in futures:
+        if future in done:
+            outcomes.extend(future.result())
+    return outcomes
 
 
-def measure_dns_latency_multi(domains, server, count):
+def summarize_dns_queries(servers, outcomes):
     """
-    Measure a DNS server against multiple domains and return a single average.
+    Summarize query outcomes per DNS server, in the order of ``servers``.
 
-    This keeps the existing DB/UI model simple: one value per DNS server per
-    probe timestamp, while allowing multiple DNS target domains to contribute.
+    Each summary holds the mean answer time (``latency_ms``, None when nothing
+    was answered), the number of queries, the NOERROR success rate and the p95
+    answer time. Servers without any outcomes are left out.
     """
-    times = []
-    for domain in domains:
-        latency = measure_dns_latency(domain, server, count)
-        if latency is not None:
-            times.append(latency)
-
-    if not times:
-        return None
-    return sum(times) / len(times)
+    per_server = {}
+    for outcome in outcomes:
+        per_server.setdefault(outcome["server"], []).append(outcome)
+
+    summary = {}
+    for server in servers:
+        server_outcomes = per_server.get(server)
+        if not server_outcomes:
+            continue
+        answered = sorted(
+            outcome["latency_ms"]
+            for outcome in server_outcomes
+            if outcome["latency_ms"] is not None
+        )
+        succeeded = sum(1 for outcome in server_outcomes if outcome["status"] == "NOERROR")
+        summary[server] = {
+            "latency_ms": statistics.mean(answered) if answered else None,
+            "queries": len(server_outcomes),
+            "success_pct": 100.0 * succeeded / len(server_outcomes),
+            "p95_ms": percentile(answered, 95),
+        }
+    return summary
 
 
 def compute_score(avg_loss, avg_latency, avg_jitter, avg_dns):
@@ -1008,6 +3768,132 @@ class SpeedtestRunError(RuntimeError):
     """A Speedtest failure rewritten into a useful message for the UI/API."""
 
 
+# Speedtest config and server lists, keyed by (backend, protocol, kind) and
+# stored as {"value", "fetched"} (monotonic seconds). An entry older than
+# SPEEDTEST_SERVER_CACHE_SECONDS is still served while one background thread
+# fetches it again; a failed test drops the entries of its backend/protocol.
+SPEEDTEST_CACHE = {}
+SPEEDTEST_CACHE_REFRESHING = set()
+SPEEDTEST_CACHE_LOCK = threading.Lock()
+
+
+def store_speedtest_value(key, value):
+    with SPEEDTEST_CACHE_LOCK:
+        SPEEDTEST_CACHE[key] = {"value": value, "fetched": time.monotonic()}
+
+
+def refresh_speedtest_value(key, fetch):
+    try:
+        store_speedtest_value(key, fetch())
+        logger.info("Refreshed cached speedtest %s", "/".join(key))
+    except Exception as exc:
+        logger.warning("Failed to refresh cached speedtest %s: %s", "/".join(key), exc)
+    finally:
+        with SPEEDTEST_CACHE_LOCK:
+            SPEEDTEST_CACHE_REFRESHING.discard(key)
+
+
+def cached_speedtest_value(key, fetch):
+    """Return ``fetch()`` through the cache; only a miss waits for it."""
+    if not SPEEDTEST_SERVER_CACHE_SECONDS:
+        return fetch()
+    with SPEEDTEST_CACHE_LOCK:
+        entry = SPEEDTEST_CACHE.get(key)
+        refresh = (
+            entry is not None
+            and time.monotonic() - entry["fetched"] >= SPEEDTEST_SERVER_CACHE_SECONDS
+            and key not in SPEEDTEST_CACHE_REFRESHING
+        )
+        if refresh:
+            SPEEDTEST_CACHE_REFRESHING.add(key)
+    if entry is None:
+        value = fetch()
+        store_speedtest_value(key, value)
+        return value
+    if refresh:
+        threading.Thread(
+            target=refresh_speedtest_value, args=(key, fetch), daemon=True
+        ).start()
+    return entry["value"]
+
+
+def speedtest_cache_age(key):
+    """Seconds since ``key`` was fetched, or None when it is not cached."""
+    with SPEEDTEST_CACHE_LOCK:
+        entry = SPEEDTEST_CACHE.get(key)
+    return round(time.monotonic() - entry["fetched"], 1) if entry else None
+
+
+def invalidate_speedtest_cache(backend, protocol):
+    with SPEEDTEST_CACHE_LOCK:
+        for key in [key for key in SPEEDTEST_CACHE if key[:2] == (backend, protocol)]:
+            del SPEEDTEST_CACHE[key]
+    logger.info("Dropped cached speedtest %s/%s data after a failed run", backend, protocol)
+
+
+def speedtest_protocol(backend, secure):
+    if backend == "ookla":
+        return "native"
+    return "https" if secure else "http"
+
+
+class CachedConfigSpeedtest(speedtest.Speedtest):
+    """speedtest.Speedtest that reuses a config instead of downloading one."""
+
+    def __init__(self, config, **kwargs):
+        self._cached_config = config
+        super().__init__(**kwargs)
+
+    def get_config(self):
+        self.config.update(copy.deepcopy(self._cached_config))
+        client = self.config["client"]
+        self.lat_lon = (float(client["lat"]), float(client["lon"]))
+        return self.config
+
+
+def python_speedtest_config(secure):
+    return cached_speedtest_value(
+        ("python", speedtest_protocol("python", secure), "config"),
+        lambda: speedtest.Speedtest(secure=secure).config,
+    )
+
+
+def fetch_python_speedtest_servers(secure):
+    """Every server speedtest-cli lists, unfiltered, as attribute dicts."""
+    st = CachedConfigSpeedtest(python_speedtest_config(secure), secure=secure)
+    return [server for servers in st.get_servers().values() for server in servers]
+
+
+def python_speedtest_servers(secure):
+    return cached_speedtest_value(
+        ("python", speedtest_protocol("python", secure), "servers"),
+        lambda: fetch_python_speedtest_servers(secure),
+    )
+
+
+def select_python_servers(st, servers, server_ids, excluded_ids):
+    """
+    Fill ``st.servers`` from a cached list the way
+    ``get_servers(servers=..., exclude=...)`` would from a fresh download.
+    """
+    wanted = {int(server_id) for server_id in server_ids}
+    excluded = {int(server_id) for server_id in excluded_ids}
+    st.servers.clear()
+    for server in servers:
+        server_id = int(server["id"])
+        if wanted and server_id not in wanted or server_id in excluded:
+            continue
+        try:
+            d = speedtest.distance(
+                st.lat_lon, (float(server["lat"]), float(server["lon"]))
+            )
+        except (KeyError, TypeError, ValueError):
+            continue
+        st.servers.setdefault(d, []).append(dict(server, d=d))
+    if (wanted or excluded) and not st.servers:
+        raise speedtest.NoMatchedServers()
+
+
 def format_python_speedtest_error(exc, selection, secure):
     """Return a useful error even when speedtest-cli raises an empty exception."""
     exception_name = type(exc).__name__
@@ -1125,6 +4011,60 @@ def run_ookla_process(extra_args, timeout=None):
     return stdout
 
 
+def stream_ookla_process(extra_args, on_line, timeout=None):
+    """
+    Run the Ookla CLI with progress output, passing each output line to
+    ``on_line`` as it arrives; returns all output once the CLI exits.
+    """
+    require_ookla_ready()
+    limit = timeout or SPEEDTEST_OOKLA_TIMEOUT
+    command = [
+        SPEEDTEST_OOKLA_PATH,
+        "--accept-license",
+        "--accept-gdpr",
+        "--progress=yes",
+    ] + list(extra_args)
+
+    logger.info("Ookla CLI command: %s", " ".join(command))
+    try:
+        proc = subprocess.Popen(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+        )
+    except OSError as exc:
+        raise SpeedtestRunError(f"Unable to execute Ookla Speedtest: {exc}") from exc
+
+    timer = threading.Timer(limit, proc.kill)
+    timer.start()
+    lines = []
+    try:
+        for line in proc.stdout:
+            lines.append(line)
+            on_line(line)
+        returncode = proc.wait()
+    finally:
+        timed_out = not timer.is_alive()
+        timer.cancel()
+        proc.stdout.close()
+
+    if timed_out:
+        raise SpeedtestRunError(
+            f"Official Ookla Speedtest timed out after {limit} seconds"
+        )
+    output = "".join(lines).strip()
+    if returncode != 0:
+        detail = output.splitlines()[-1] if output else f"exit code {returncode}"
+        try:
+            # jsonl output reports errors as {"type": "log", "message": ...}.
+            detail = json.loads(detail).get("message") or detail
+        except (json.JSONDecodeError, AttributeError):
+            pass
+        raise SpeedtestRunError(f"Official Ookla Speedtest failed: {detail}")
+    return output
+
+
 def parse_ookla_server_listing(output):
     """Parse IDs from Ookla ``--servers`` JSON or human-readable output."""
     servers = []
@@ -1191,6 +4131,10 @@ def parse_ookla_server_listing(output):
 
 
 def list_ookla_servers():
+    return cached_speedtest_value(("ookla", "native", "servers"), fetch_ookla_servers)
+
+
+def fetch_ookla_servers():
     # Current releases generally accept --format=json with --servers. Fall back
     # to the traditional table because older builds may reject that combination.
     try:
@@ -1257,16 +4201,57 @@ def normalize_ookla_result(payload):
     }
 
 
-def execute_ookla_test(server_id=None):
-    args = ["--format=json"]
+def report_ookla_progress(event, progress):
+    """Pass one Ookla jsonl progress event on as ``progress(phase, **values)``."""
+    kind = event.get("type")
+    if kind == "testStart":
+        server = event.get("server") or {}
+        progress(
+            "ping",
+            pct=0.0,
+            server={
+                "id": str(server["id"]) if server.get("id") is not None else None,
+                "name": server.get("name"),
+                "country": server.get("country"),
+            },
+        )
+    elif kind in ("ping", "download", "upload"):
+        data = event.get(kind) or {}
+        values = {"pct": round(100.0 * float(data.get("progress") or 0), 1)}
+        if kind == "ping" and data.get("latency") is not None:
+            values["ping_ms"] = data["latency"]
+        elif data.get("bandwidth"):
+            values[f"{kind}_mbps"] = float(data["bandwidth"]) * 8 / 1_000_000
+        progress(kind, **values)
+
+
+def execute_ookla_test(server_id=None, progress=None):
+    """
+    Run one Ookla test. The CLI prints one JSON event per line (jsonl);
+    progress events go to ``progress`` and the final "result" event is
+    the same object --format=json prints.
+    """
+    args = ["--format=jsonl"]
     if server_id:
         args.append(f"--server-id={server_id}")
-    output = run_ookla_process(args)
-    try:
-        payload = extract_json_object(output)
-    except (ValueError, json.JSONDecodeError) as exc:
-        raise SpeedtestRunError(f"Unable to parse Ookla Speedtest JSON: {exc}") from exc
-    return normalize_ookla_result(payload)
+    events = []
+
+    def on_line(line):
+        try:
+            event = json.loads(line)
+        except json.JSONDecodeError:
+            return
+        if not isinstance(event, dict):
+            return
+        events.append(event)
+        if progress is not None:
+            report_ookla_progress(event, progress)
+
+    stream_ookla_process(args, on_line)
+    for event in reversed(events):
+        if event.get("type") in ("result", None) and "download" in event:
+            return normalize_ookla_result(event)
+    raise SpeedtestRunError("Official Ookla Speedtest returned no result event")
 
 
 def build_ookla_candidate_order(selection):
@@ -1296,21 +4281,51 @@ def build_ookla_candidate_order(selection):
     return []
 
 
-def run_python_speedtest(selection, secure_mode):
-    try:
-        st = speedtest.Speedtest(secure=secure_mode)
-        server_filter = [int(server_id) for server_id in selection["server_ids"]]
-        exclude_filter = [int(server_id) for server_id in selection["excluded_ids"]]
-
-        if server_filter or exclude_filter:
-            st.get_servers(
-                servers=server_filter or None,
-                exclude=exclude_filter or None,
-            )
+def speedtest_cli_callback(progress, phase):
+    """
+    speedtest-cli transfer callback reporting the share of finished requests.
+
+    speedtest-cli only hands its callbacks request counts, so throughput for
+    this backend is reported once each phase has finished.
+    """
+    finished = []
+
+    def callback(index, count, start=False, end=False):
+        if end:
+            finished.append(index)
+            progress(phase, pct=round(100.0 * len(finished) / count, 1))
+
+    return callback
 
-        st.get_best_server()
-        down_bps = st.download()
-        up_bps = st.upload()
+
+def run_python_speedtest(selection, secure_mode, progress=None):
+    progress = progress or (lambda phase, **values: None)
+    try:
+        st = CachedConfigSpeedtest(
+            python_speedtest_config(secure_mode), secure=secure_mode
+        )
+        select_python_servers(
+            st,
+            python_speedtest_servers(secure_mode),
+            selection["server_ids"],
+            selection["excluded_ids"],
+        )
+        best = st.get_best_server()
+        progress(
+            "ping",
+            pct=100.0,
+            ping_ms=st.results.ping,
+            server={
+                "id": str(best.get("id")) if best.get("id") is not None else None,
+                "name": best.get("sponsor") or best.get("name"),
+                "country": best.get("country"),
+            },
+        )
+        progress("download", pct=0.0)
+        down_bps = st.download(callback=speedtest_cli_callback(progress, "download"))
+        progress("upload", pct=0.0, download_mbps=down_bps / (1024 * 1024))
+        up_bps = st.upload(callback=speedtest_cli_callback(progress, "upload"))
+        progress("upload", pct=100.0, upload_mbps=up_bps / (1024 * 1024))
         res = st.results.dict()
     except Exception as exc:
         raise SpeedtestRunError(
@@ -1332,7 +4347,7 @@ def run_python_speedtest(selection, secure_mode):
     }
 
 
-def run_ookla_speedtest(selection):
+def run_ookla_speedtest(selection, progress=None):
     candidate_ids = build_ookla_candidate_order(selection)
 
     if selection["mode"] == "auto" and selection["excluded_ids"] and not candidate_ids:
@@ -1342,14 +4357,14 @@ def run_ookla_speedtest(selection):
 
     # Unfiltered automatic mode lets the official CLI choose directly.
     if selection["mode"] == "auto" and not selection["excluded_ids"]:
-        result = execute_ookla_test()
+        result = execute_ookla_test(progress=progress)
         result.update(protocol="ookla", secure=None)
         return result
 
     failures = []
     for server_id in candidate_ids:
         try:
-            result = execute_ookla_test(server_id)
+            result = execute_ookla_test(server_id, progress)
             result.update(protocol="ookla", secure=None)
             return result
         except SpeedtestRunError as exc:
@@ -1377,8 +4392,15 @@ def run_speedtest_internal(
     secure=None,
     force_auto=False,
     backend=None,
+    progress=None,
 ):
-    """Run a speedtest with the configured or one-off selected backend."""
+    """
+    Run a speedtest with the configured or one-off selected backend.
+
+    ``progress(phase, **values)`` is called as the test moves through the
+    selecting, ping, download, upload and saving phases.
+    """
+    progress = progress or (lambda phase, **values: None)
     selected_backend = resolve_speedtest_backend(backend)
     secure_override = parse_optional_bool(secure, "secure")
     secure_mode = SPEEDTEST_SECURE if secure_override is None else secure_override
@@ -1394,10 +4416,14 @@ def run_speedtest_internal(
     excluded_server_ids = selection["excluded_ids"]
     requested_server_value = ",".join(requested_server_ids) or None
 
+    busy_message = "A Speedtest is already running. Wait for it to finish and try again."
     if not speedtest_run_lock.acquire(blocking=False):
-        raise SpeedtestRunError(
-            "A Speedtest is already running. Wait for it to finish and try again."
-        )
+        raise SpeedtestRunError(busy_message)
+    # Manual runs come from web workers, scheduled ones from the prober.
+    speedtest_lock_fd = try_file_lock(SPEEDTEST_LOCK_PATH)
+    if speedtest_lock_fd is None:
+        speedtest_run_lock.release()
+        raise SpeedtestRunError(busy_message)
 
     try:
         logger.info("Starting speedtest run...")
@@ -1413,139 +4439,606 @@ def run_speedtest_internal(
             selection["forced_auto"],
         )
 
-        if selected_backend == "python":
-            normalized = run_python_speedtest(selection, secure_mode)
-        else:
-            normalized = run_ookla_speedtest(selection)
+        progress("selecting")
+        try:
+            if selected_backend == "python":
+                normalized = run_python_speedtest(selection, secure_mode, progress)
+            else:
+                normalized = run_ookla_speedtest(selection, progress)
+        except Exception:
+            # The cached config or server list may be what went wrong.
+            invalidate_speedtest_cache(
+                selected_backend, speedtest_protocol(selected_backend, secure_mode)
+            )
+            raise
+        progress("saving")
+
+        ping_ms = normalized["ping_ms"]
+        download_mbps = normalized["download_mbps"]
+        upload_mbps = normalized["upload_mbps"]
+        server = normalized["server"]
+        ts = int(time.time())
+
+        row = insert_speedtest(
+            ts,
+            ping_ms,
+            download_mbps,
+            upload_mbps,
+            server,
+            requested_server_id=requested_server_value,
+            backend=selected_backend,
+        )
+        item = speedtest_result_item(row)
+        remember_speedtest_item(item)
+        publish_event("speedtest", item)
+
+        logger.info(
+            "Speedtest: backend=%s ping=%sms down=%.2fMbps up=%.2fMbps server=%s protocol=%s selection_mode=%s requested_server_ids=%s excluded_server_ids=%s forced_auto=%s",
+            selected_backend,
+            ping_ms,
+            download_mbps,
+            upload_mbps,
+            server.get("name"),
+            normalized["protocol"],
+            selection_mode,
+            requested_server_value or "auto",
+            ",".join(excluded_server_ids) or "none",
+            selection["forced_auto"],
+        )
+
+        return {
+            "timestamp": ts,
+            "ping_ms": ping_ms,
+            "download_mbps": download_mbps,
+            "upload_mbps": upload_mbps,
+            "server": server,
+            "requested_server_id": requested_server_value,
+            "requested_server_ids": requested_server_ids,
+            "selection_mode": selection_mode,
+            "excluded_server_ids": excluded_server_ids,
+            "backend": selected_backend,
+            "protocol": normalized["protocol"],
+            "secure": normalized["secure"],
+            "forced_auto": selection["forced_auto"],
+            "jitter_ms": normalized.get("jitter_ms"),
+            "packet_loss_pct": normalized.get("packet_loss_pct"),
+            "isp": normalized.get("isp"),
+            "result_url": normalized.get("result_url"),
+        }
+    finally:
+        release_file_lock(speedtest_lock_fd)
+        speedtest_run_lock.release()
+
+
+def run_speedtest_if_due():
+    global last_speedtest_ts
+    if not SPEEDTEST_ENABLED:
+        return
+
+    now = time.time()
+    with last_speedtest_lock:
+        if now - last_speedtest_ts < SPEEDTEST_INTERVAL:
+            return
+        last_speedtest_ts = now
+
+    if fetch_unfinished_speedtest_job("scheduled") is None:
+        enqueue_speedtest_job("scheduled")
+
+
+# -------------------------
+# Speedtest jobs
+# -------------------------
+#
+# Manual and scheduled speedtests are queued in speedtest_jobs and run one
+# at a time, oldest first, by a worker thread in the prober process. Web
+# workers only insert jobs and read their rows, so a request never waits
+# for a test and any worker can report a job's phase and progress.
+SPEEDTEST_JOB_POLL_SECONDS = 1
+# Seconds between progress writes within one phase.
+SPEEDTEST_JOB_PROGRESS_SECONDS = 0.5
+# Finished jobs kept for /api/speedtest/jobs.
+SPEEDTEST_JOB_HISTORY = 50
+# A "wait" request allows each job up to SPEEDTEST_OOKLA_TIMEOUT, plus this
+# much for selection and saving, before it answers 504 with the job.
+SPEEDTEST_JOB_WAIT_SLACK_SECONDS = 60
+SPEEDTEST_JOB_WAKE = threading.Event()
+
+
+def enqueue_speedtest_job(source, request_args=None):
+    job_id = insert_speedtest_job(source, request_args or {})
+    SPEEDTEST_JOB_WAKE.set()
+    logger.info("Queued %s speedtest job %s", source, job_id)
+    return job_id
+
+
+def speedtest_job_item(row, ahead=0):
+    """API dict for a speedtest_jobs row."""
+    item = {
+        "id": row[0],
+        "created_ts": row[1],
+        "started_ts": row[2],
+        "finished_ts": row[3],
+        "source": row[4],
+        "state": row[5],
+        "phase": row[6],
+        "request": json.loads(row[7]) if row[7] else {},
+        "progress": json.loads(row[8]) if row[8] else {},
+        "result": json.loads(row[9]) if row[9] else None,
+        "error": row[10],
+    }
+    if row[5] == "queued":
+        item["ahead"] = ahead
+    return item
+
+
+def speedtest_job_reporter(job_id):
+    """Progress callback that stores a job's phase and latest values."""
+    lock = threading.Lock()
+    state = {"phase": None, "written": 0.0, "values": {}}
+
+    def report(phase, **values):
+        with lock:
+            if phase != state["phase"]:
+                # Percent complete is per phase.
+                state["values"].pop("pct", None)
+            state["values"].update(values)
+            now = time.monotonic()
+            if (
+                phase == state["phase"]
+                and now - state["written"] < SPEEDTEST_JOB_PROGRESS_SECONDS
+            ):
+                return
+            state.update(phase=phase, written=now)
+            progress = dict(state["values"])
+        try:
+            update_speedtest_job(job_id, phase=phase, progress=progress)
+        except Exception as exc:
+            logger.warning("Failed to store speedtest job %s progress: %s", job_id, exc)
+
+    return report
+
+
+def run_speedtest_job(row):
+    job = speedtest_job_item(row)
+    logger.info("Running %s speedtest job %s", job["source"], job["id"])
+    try:
+        result = run_speedtest_internal(
+            requested_server_id=job["request"].get("server_id"),
+            secure=job["request"].get("secure"),
+            force_auto=job["request"].get("force_auto", False),
+            backend=job["request"].get("backend"),
+            progress=speedtest_job_reporter(job["id"]),
+        )
+    except Exception as exc:
+        error_message = str(exc).strip() or type(exc).__name__
+        logger.exception("Speedtest job %s failed: %s", job["id"], error_message)
+        update_speedtest_job(job["id"], state="failed", error=error_message)
+        return
+    update_speedtest_job(job["id"], state="done", phase="done", result=result)
+
+
+def run_speedtest_jobs():
+    """Worker loop: run queued speedtest jobs one at a time (prober only)."""
+    # Tidy on start (a previous prober may have died mid-test) and after
+    # each job, not on every idle poll.
+    tidy = True
+    while True:
+        try:
+            if tidy:
+                tidy_speedtest_jobs(SPEEDTEST_JOB_HISTORY)
+                tidy = False
+            row = claim_speedtest_job()
+            if row:
+                tidy = True
+                run_speedtest_job(row)
+                continue
+        except Exception as exc:
+            logger.error("Speedtest job worker error: %s", exc)
+        SPEEDTEST_JOB_WAKE.wait(SPEEDTEST_JOB_POLL_SECONDS)
+        SPEEDTEST_JOB_WAKE.clear()
+
+
+# Scheduler bookkeeping, keyed by schedule name. Exposed by /api/probe/status.
+SCHEDULER_STATS = {}
+SCHEDULER_STATS_LOCK = threading.Lock()
+
+
+def get_scheduler_stats():
+    with SCHEDULER_STATS_LOCK:
+        return {name: dict(stats) for name, stats in SCHEDULER_STATS.items()}
+
+
+def run_fixed_rate(name, interval, cycle):
+    """
+    Call ``cycle(ts)`` forever on fixed ticks of the monotonic clock.
+
+    Ticks are aligned to wall-clock multiples of ``interval`` and ``ts`` is
+    the tick's scheduled epoch second, so schedules whose intervals divide
+    each other share timestamps. The cycle's own run time does not push later
+    ticks back. When a cycle runs past its next tick the missed ticks are
+    skipped and counted as an overrun instead of running cycles back to back.
+    """
+    with SCHEDULER_STATS_LOCK:
+        stats = SCHEDULER_STATS.setdefault(
+            name,
+            {
+                "interval_s": interval,
+                "cycles": 0,
+                "overruns": 0,
+                "skipped_ticks": 0,
+                "last_duration_s": None,
+                "max_duration_s": None,
+                "last_lag_s": None,
+                "last_started": None,
+            },
+        )
+
+    now_wall = time.time()
+    tick_wall = math.ceil(now_wall / interval) * interval
+    next_tick = time.monotonic() + (tick_wall - now_wall)
+    while True:
+        time.sleep(max(0.0, next_tick - time.monotonic()))
+
+        started = time.monotonic()
+        lag = started - next_tick
+        try:
+            cycle(int(tick_wall))
+        except Exception as exc:
+            logger.exception("%s cycle failed: %s", name, exc)
+        finished = time.monotonic()
+        duration = finished - started
+
+        next_tick += interval
+        tick_wall += interval
+        missed = 0
+        if finished > next_tick:
+            missed = int((finished - next_tick) // interval) + 1
+            next_tick += missed * interval
+            tick_wall += missed * interval
+            logger.warning(
+                "%s cycle took %.1fs (interval %ss); skipping %s tick(s)",
+                name,
+                duration,
+                interval,
+                missed,
+            )
+
+        with SCHEDULER_STATS_LOCK:
+            stats["cycles"] += 1
+            stats["last_duration_s"] = duration
+            stats["max_duration_s"] = max(stats["max_duration_s"] or 0.0, duration)
+            stats["last_lag_s"] = lag
+            stats["last_started"] = int(tick_wall - (missed + 1) * interval)
+            if missed:
+                stats["overruns"] += 1
+                stats["skipped_ticks"] += missed
+
+
+# Latest result per ping target and the latest DNS summary, shared between
+# the probe schedules so the aggregate score can include targets probed on
+# other intervals.
+LATEST_PING_RESULTS = {}
+LATEST_DNS_SUMMARY = {}
+LATEST_RESULTS_LOCK = threading.Lock()
+
+# Effective ping schedule, filled in by probe_loop once the gateway is known.
+PING_SCHEDULE = []
+
+
+def build_ping_schedule(gw):
+    """
+    Return the ping targets as ``{"host", "kind", "interval", "count"}`` dicts.
+
+    Class defaults come from the GATEWAY_/ROUTER_/SITES_ settings and
+    PROBE_TARGET_SCHEDULES overrides them per host.
+    """
+    schedule = []
+    if gw:
+        schedule.append(
+            {
+                "host": gw,
+                "kind": "gateway",
+                "interval": GATEWAY_PROBE_INTERVAL,
+                "count": GATEWAY_PING_COUNT,
+            }
+        )
+    if ROUTER_IP:
+        schedule.append(
+            {
+                "host": ROUTER_IP,
+                "kind": "router",
+                "interval": ROUTER_PROBE_INTERVAL,
+                "count": ROUTER_PING_COUNT,
+            }
+        )
+    for site in SITES:
+        schedule.append(
+            {
+                "host": site,
+                "kind": "site",
+                "interval": SITES_PROBE_INTERVAL,
+                "count": SITES_PING_COUNT,
+            }
+        )
+
+    for entry in schedule:
+        override = PROBE_TARGET_SCHEDULES.get(entry["host"])
+        if override:
+            entry["interval"] = override[0]
+            if override[1] is not None:
+                entry["count"] = override[1]
+    return schedule
+
+
+def probe_ping_targets(targets):
+    """Ping ``targets`` and cache their results for the aggregate score."""
+    if not targets:
+        return []
+    ping_results = run_ping_many(
+        [target["host"] for target in targets],
+        [target["count"] for target in targets],
+    )
+    with LATEST_RESULTS_LOCK:
+        for result in ping_results:
+            LATEST_PING_RESULTS[result["host"]] = result
+    return ping_results
+
+
+def probe_dns_servers():
+    """Query every DNS server and cache the per-server summary."""
+    dns_queries = run_dns_phase(DNS_SERVERS, DNS_TEST_SITES, count=3)
+    dns_per_server = summarize_dns_queries(DNS_SERVERS, dns_queries)
+    with LATEST_RESULTS_LOCK:
+        LATEST_DNS_SUMMARY.clear()
+        LATEST_DNS_SUMMARY.update(dns_per_server)
+    return dns_per_server, dns_queries
+
+
+def run_ping_cycle(ts, targets):
+    """Ping cycle for targets on their own schedule: probe, cache, store."""
+    ping_results = probe_ping_targets(targets)
+    insert_probe_cycle(ts, ping_results=ping_results)
+    return ping_results
+
+
+def run_dns_cycle(ts):
+    """DNS cycle on its own schedule: probe, cache, store."""
+    dns_per_server, dns_queries = probe_dns_servers()
+    insert_probe_cycle(ts, dns_summary=dns_per_server, dns_queries=dns_queries)
+    if dns_per_server:
+        remember_dns_summary(ts, dns_per_server)
+    return dns_per_server
+
+
+def run_probe_cycle(ts, ping_targets, include_dns):
+    """
+    Run one main probe cycle and write the aggregate measurement.
+
+    ``ping_targets`` (the targets on PROBE_INTERVAL) and, when
+    ``include_dns`` is set, the DNS servers are probed now; targets on other
+    schedules contribute their latest cached result. The cycle's rows and
+    the aggregate measurement are written in one transaction.
+    """
+    # ---------- Ping probes ----------
+    cycle_ping_results = probe_ping_targets(ping_targets)
+
+    # ---------- DNS probes ----------
+    cycle_dns_summary, cycle_dns_queries = None, ()
+    if include_dns:
+        cycle_dns_summary, cycle_dns_queries = probe_dns_servers()
+
+    with LATEST_RESULTS_LOCK:
+        ping_results = [
+            LATEST_PING_RESULTS[target["host"]]
+            for target in PING_SCHEDULE
+            if target["host"] in LATEST_PING_RESULTS
+        ]
+        dns_per_server = dict(LATEST_DNS_SUMMARY)
+
+    latencies = [r["latency"] for r in ping_results]
+    jitters = [r["jitter"] for r in ping_results]
+    losses = [r["loss"] for r in ping_results]
+
+    avg_latency = statistics.mean(latencies) if latencies else 0.0
+    avg_jitter = statistics.mean(jitters) if jitters else 0.0
+    avg_loss = statistics.mean(losses) if losses else 0.0
+
+    # A server that answered nothing scores like an unreachable ping
+    # target instead of silently dropping out of the average.
+    dns_times = [
+        item["latency_ms"]
+        if item["latency_ms"] is not None
+        else THRESHOLD_DNS_LATENCY * 2
+        for item in dns_per_server.values()
+    ]
+
+    avg_dns = statistics.mean(dns_times) if dns_times else 0.0
+
+    # ---------- Score + persistence ----------
+    score = compute_score(avg_loss, avg_latency, avg_jitter, avg_dns)
+    insert_probe_cycle(
+        ts,
+        measurement=(avg_latency, avg_jitter, avg_loss, avg_dns, score),
+        ping_results=cycle_ping_results,
+        dns_summary=cycle_dns_summary,
+        dns_queries=cycle_dns_queries,
+    )
+
+    item = measurement_item((ts, avg_latency, avg_jitter, avg_loss, avg_dns, score))
+    if cycle_dns_summary:
+        attach_dns_detail(item, cycle_dns_summary)
+    remember_probe_item(item)
+    publish_event("probe", item)
+
+    logger.info(
+        "Probe ts=%s score=%.2f loss=%.2f%% latency=%.1fms jitter=%.1fms dns=%.1fms",
+        ts,
+        score,
+        avg_loss,
+        avg_latency,
+        avg_jitter,
+        avg_dns,
+    )
+
+    if SPEEDTEST_ENABLED:
+        threading.Thread(target=run_speedtest_if_due, daemon=True).start()
 
-        ping_ms = normalized["ping_ms"]
-        download_mbps = normalized["download_mbps"]
-        upload_mbps = normalized["upload_mbps"]
-        server = normalized["server"]
-        ts = int(time.time())
 
-        insert_speedtest(
-            ts,
-            ping_ms,
-            download_mbps,
-            upload_mbps,
-            server,
-            requested_server_id=requested_server_value,
-            backend=selected_backend,
-        )
+def start_schedule_thread(name, interval, cycle):
+    thread = threading.Thread(
+        target=run_fixed_rate,
+        args=(name, interval, cycle),
+        name=f"netprobe-{name}",
+        daemon=True,
+    )
+    thread.start()
+    return thread
 
+
+def probe_loop():
+    gw = get_default_gateway()
+    PING_SCHEDULE[:] = build_ping_schedule(gw)
+
+    # Targets on other intervals get one fixed-rate schedule per interval.
+    main_targets = []
+    other_targets = {}
+    for target in PING_SCHEDULE:
+        if target["interval"] == PROBE_INTERVAL:
+            main_targets.append(target)
+        else:
+            other_targets.setdefault(target["interval"], []).append(target)
+
+    for interval, targets in sorted(other_targets.items()):
         logger.info(
-            "Speedtest: backend=%s ping=%sms down=%.2fMbps up=%.2fMbps server=%s protocol=%s selection_mode=%s requested_server_ids=%s excluded_server_ids=%s forced_auto=%s",
-            selected_backend,
-            ping_ms,
-            download_mbps,
-            upload_mbps,
-            server.get("name"),
-            normalized["protocol"],
-            selection_mode,
-            requested_server_value or "auto",
-            ",".join(excluded_server_ids) or "none",
-            selection["forced_auto"],
+            "Ping schedule every %ss: %s",
+            interval,
+            ", ".join(target["host"] for target in targets),
+        )
+        start_schedule_thread(
+            f"ping-{interval}s",
+            interval,
+            lambda ts, targets=targets: run_ping_cycle(ts, targets),
         )
 
-        return {
-            "timestamp": ts,
-            "ping_ms": ping_ms,
-            "download_mbps": download_mbps,
-            "upload_mbps": upload_mbps,
-            "server": server,
-            "requested_server_id": requested_server_value,
-            "requested_server_ids": requested_server_ids,
-            "selection_mode": selection_mode,
-            "excluded_server_ids": excluded_server_ids,
-            "backend": selected_backend,
-            "protocol": normalized["protocol"],
-            "secure": normalized["secure"],
-            "forced_auto": selection["forced_auto"],
-            "jitter_ms": normalized.get("jitter_ms"),
-            "packet_loss_pct": normalized.get("packet_loss_pct"),
-            "isp": normalized.get("isp"),
-            "result_url": normalized.get("result_url"),
-        }
-    finally:
-        speedtest_run_lock.release()
+    dns_in_main = DNS_PROBE_INTERVAL == PROBE_INTERVAL
+    if DNS_SERVERS and not dns_in_main:
+        start_schedule_thread("dns", DNS_PROBE_INTERVAL, run_dns_cycle)
 
+    if any(RETENTION_DAYS.values()):
+        start_schedule_thread("retention", RETENTION_INTERVAL, run_retention_cycle)
 
-def run_speedtest_if_due():
-    global last_speedtest_ts
-    if not SPEEDTEST_ENABLED:
-        return
+    run_fixed_rate(
+        "probe",
+        PROBE_INTERVAL,
+        lambda ts: run_probe_cycle(ts, main_targets, dns_in_main),
+    )
 
-    now = time.time()
-    with last_speedtest_lock:
-        if now - last_speedtest_ts < SPEEDTEST_INTERVAL:
-            return
-        last_speedtest_ts = now
 
+# -------------------------
+# Prober election
+# -------------------------
+#
+# Exactly one process runs probe_loop. Every process starts an election
+# thread; the one holding an exclusive flock on PROBE_LOCK_PATH probes, and
+# the rest follow the database: they read what the prober stored into their
+# own hot window and publish it to their own /api/events subscribers. The
+# kernel drops the lock when its holder exits, so an "auto" follower takes
+# over on its next sync after the prober dies.
+MIGRATION_LOCK_PATH = f"{PROBE_LOCK_PATH}.migrate"
+SPEEDTEST_LOCK_PATH = f"{PROBE_LOCK_PATH}.speedtest"
+# A follower that finds more new cycles than this reloads its hot window.
+PROBE_FOLLOW_BATCH = 1000
+
+PROBER_ACTIVE = False
+
+
+def try_file_lock(path, blocking=False):
+    """Take an exclusive flock on ``path``; return the fd, or None if held."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
     try:
-        run_speedtest_internal()
-    except Exception as exc:
-        logger.exception("Periodic speedtest failed: %s", exc)
-
-
-def probe_loop():
-    gw = get_default_gateway()
+        fcntl.flock(fd, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(fd)
+        return None
+    return fd
 
-    while True:
-        ts = int(time.time())
 
-        # ---------- Ping probes ----------
-        ping_targets = []
-        if gw:
-            ping_targets.append(gw)
-        if ROUTER_IP:
-            ping_targets.append(ROUTER_IP)
-        ping_targets.extend(SITES)
-
-        ping_results = [run_ping(host, PING_COUNT) for host in ping_targets]
-
-        latencies = [r["latency"] for r in ping_results]
-        jitters = [r["jitter"] for r in ping_results]
-        losses = [r["loss"] for r in ping_results]
-
-        avg_latency = statistics.mean(latencies) if latencies else 0.0
-        avg_jitter = statistics.mean(jitters) if jitters else 0.0
-        avg_loss = statistics.mean(losses) if losses else 0.0
-
-        # ---------- DNS probes ----------
-        dns_times = []
-        dns_per_server = {}
-        for server_ip in DNS_SERVERS:
-            measured = measure_dns_latency_multi(
-                DNS_TEST_SITES,
-                server_ip,
-                count=3,
-            )
-            if measured is not None:
-                dns_times.append(measured)
-                dns_per_server[server_ip] = measured
+def release_file_lock(fd):
+    # Closing the descriptor releases the flock.
+    os.close(fd)
 
-        avg_dns = statistics.mean(dns_times) if dns_times else 0.0
 
-        # ---------- Score + persistence ----------
-        score = compute_score(avg_loss, avg_latency, avg_jitter, avg_dns)
-        insert_measurement(ts, avg_latency, avg_jitter, avg_loss, avg_dns, score)
-        insert_dns_measurements(ts, dns_per_server)
+def follower_state():
+    """Newest probe and speedtest ts this process has already seen."""
+    measurement = latest_measurement_item()
+    speedtest_item = latest_speedtest_item()
+    return {
+        "probe_ts": measurement["ts"] if measurement else None,
+        "speedtest_ts": speedtest_item["ts"] if speedtest_item else None,
+    }
 
-        logger.info(
-            "Probe ts=%s score=%.2f loss=%.2f%% latency=%.1fms jitter=%.1fms dns=%.1fms",
-            ts,
-            score,
-            avg_loss,
-            avg_latency,
-            avg_jitter,
-            avg_dns,
-        )
 
-        if SPEEDTEST_ENABLED:
-            threading.Thread(target=run_speedtest_if_due, daemon=True).start()
+def follow_prober(state):
+    """Cache and publish the rows the prober stored since ``state``."""
+    since = state["probe_ts"]
+    rows = fetch_recent(PROBE_FOLLOW_BATCH, since=since - 1 if since else None)
+    items = recent_items(rows)
+    if len(rows) == PROBE_FOLLOW_BATCH:
+        load_hot_window()
+    else:
+        refresh_hot_window(items)
+    for item in items:
+        if since is None or item["ts"] > since:
+            publish_event("probe", item)
+    if items:
+        state["probe_ts"] = items[-1]["ts"]
 
-        time.sleep(PROBE_INTERVAL)
+    row = fetch_latest_speedtest()
+    if row:
+        item = speedtest_result_item(row)
+        if state["speedtest_ts"] is None or item["ts"] > state["speedtest_ts"]:
+            remember_speedtest_item(item)
+            publish_event("speedtest", item)
+            state["speedtest_ts"] = item["ts"]
+
+    trim_hot_window(retention_cutoffs(int(time.time())))
+
+
+def run_prober_election():
+    """Follow the prober until this process holds the lock, then probe."""
+    global PROBER_ACTIVE
+    if PROBE_ROLE == "prober":
+        logger.info("Waiting for the prober lock %s", PROBE_LOCK_PATH)
+        lock_fd = try_file_lock(PROBE_LOCK_PATH, blocking=True)
+        # Another prober may have stored rows since startup.
+        load_hot_window()
+    elif PROBE_ROLE == "auto":
+        lock_fd = try_file_lock(PROBE_LOCK_PATH)
+    else:
+        lock_fd = None
+
+    if lock_fd is None:
+        logger.info("Another process runs the probe loop; following the database")
+        state = follower_state()
+        while lock_fd is None:
+            time.sleep(PROBE_FOLLOW_INTERVAL)
+            if PROBE_ROLE == "auto":
+                lock_fd = try_file_lock(PROBE_LOCK_PATH)
+            try:
+                # After a takeover this picks up what the old prober stored.
+                follow_prober(state)
+            except Exception as exc:
+                logger.error("Failed to read the prober's results: %s", exc)
+
+    logger.info("This process (pid %s) runs the probe loop", os.getpid())
+    PROBER_ACTIVE = True
+    threading.Thread(
+        target=run_speedtest_jobs, name="netprobe-speedtest-jobs", daemon=True
+    ).start()
+    probe_loop()
 
 
 # -------------------------
@@ -1554,6 +5047,169 @@ def probe_loop():
 
 app = Flask(__name__)
 
+# Static URLs carry a content hash (?v=), so a versioned asset can be cached
+# for a year; a new build changes the URL.
+STATIC_MAX_AGE = 365 * 86400
+COMPRESSION_MIN_BYTES = 1024
+COMPRESSIBLE_MIMETYPES = (
+    "application/json",
+    "application/javascript",
+    "text/javascript",
+    "text/css",
+    "text/html",
+    "text/plain",
+)
+# (path, mtime, encoding) -> bytes. Static files are compressed once, at the
+# highest level, on their first request.
+STATIC_CACHE = {}
+# (path, mtime) -> ?v= content hash, computed once per file version.
+STATIC_VERSIONS = {}
+STATIC_CACHE_LOCK = threading.Lock()
+
+
+def static_file_path(filename):
+    return safe_join(app.static_folder, filename)
+
+
+def static_file_bytes(filename, encoding):
+    """Contents of a static file, compressed with ``encoding`` (or None)."""
+    path = static_file_path(filename)
+    key = (path, os.stat(path).st_mtime_ns, encoding)
+    with STATIC_CACHE_LOCK:
+        if key in STATIC_CACHE:
+            return STATIC_CACHE[key]
+    with open(path, "rb") as handle:
+        data = handle.read()
+    if encoding == "br":
+        data = brotli.compress(data, quality=11)
+    elif encoding == "gzip":
+        data = gzip.compress(data, compresslevel=9)
+    with STATIC_CACHE_LOCK:
+        STATIC_CACHE[key] = data
+    return data
+
+
+def static_version(filename):
+    path = static_file_path(filename)
+    key = (path, os.stat(path).st_mtime_ns)
+    version = STATIC_VERSIONS.get(key)
+    if version is None:
+        version = hashlib.sha1(static_file_bytes(filename, None)).hexdigest()[:12]
+        with STATIC_CACHE_LOCK:
+            STATIC_VERSIONS[key] = version
+    return version
+
+
+def preferred_encoding():
+    """Best content coding the client accepts, or None."""
+    if not HTTP_COMPRESSION:
+        return None
+    accepted = request.accept_encodings
+    if brotli is not None and accepted["br"]:
+        return "br"
+    if accepted["gzip"]:
+        return "gzip"
+    return None
+
+
+def compress_bytes(data, encoding):
+    if encoding == "br":
+        return brotli.compress(data, quality=5)
+    return gzip.compress(data, compresslevel=6)
+
+
+@app.url_defaults
+def add_static_version(endpoint, values):
+    if endpoint == "static" and "filename" in values:
+        values.setdefault("v", static_version(values["filename"]))
+
+
+@app.after_request
+def finish_response(response):
+    """Cache headers for static assets and compression for everything."""
+    if request.endpoint == "static" and response.status_code in (200, 304):
+        filename = request.view_args["filename"]
+        if request.args.get("v") == static_version(filename):
+            response.headers["Cache-Control"] = f"public, max-age={STATIC_MAX_AGE}, immutable"
+        else:
+            response.headers["Cache-Control"] = "no-cache"
+
+    response.vary.add("Accept-Encoding")
+    encoding = preferred_encoding()
+    if (
+        encoding is None
+        or response.status_code != 200
+        or response.is_streamed and not response.direct_passthrough
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+    ):
+        return response
+
+    if request.endpoint == "static":
+        if response.content_length and response.content_length < COMPRESSION_MIN_BYTES:
+            return response
+        data = static_file_bytes(request.view_args["filename"], encoding)
+        # Drop the file wrapper send_file opened and serve the cached bytes.
+        response.response.close()
+        response.direct_passthrough = False
+        response.set_data(data)
+    else:
+        data = response.get_data()
+        if len(data) < COMPRESSION_MIN_BYTES:
+            return response
+        response.set_data(compress_bytes(data, encoding))
+    response.headers["Content-Encoding"] = encoding
+    # Validators are shared by every encoding of a representation.
+    if response.get_etag()[0]:
+        response.set_etag(response.get_etag()[0], weak=True)
+    return response
+
+
+def conditional_on(*tables, validator=None):
+    """
+    Answer 304 Not Modified while nothing newer was written to ``tables``.
+
+    The ETag and Last-Modified validators come from the newest ts of each
+    table, so an unchanged poll costs one indexed MAX(ts) per table instead
+    of the query, serialization and transfer of the full payload.
+
+    ``validator`` may return (etag, last_modified) from memory for requests
+    that never reach the database; it returns None to fall back to MAX(ts).
+    """
+
+    def decorate(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            validators = validator() if validator else None
+            if validators is None:
+                latest = fetch_latest_ts(tables)
+                etag = "-".join(str(ts or 0) for ts in latest)
+                last_modified = max((ts for ts in latest if ts), default=None)
+            else:
+                etag, last_modified = validators
+            if request.if_none_match:
+                unchanged = request.if_none_match.contains_weak(etag)
+            else:
+                since = request.if_modified_since
+                unchanged = bool(
+                    since and last_modified and since.timestamp() >= last_modified
+                )
+            if unchanged:
+                response = Response(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag, weak=True)
+            if last_modified:
+                response.last_modified = last_modified
+            response.headers["Cache-Control"] = "no-cache"
+            return response
+
+        return wrapper
+
+    return decorate
+
 
 @app.route("/")
 def index():
@@ -1568,53 +5224,253 @@ def index():
     )
 
 
-@app.route("/api/score/recent")
-def api_recent():
+def attach_dns_detail(item, detail):
+    """Add the per-server DNS maps of one cycle or bucket to an API item."""
+    item["dns_per_server"] = {
+        ip: values["latency_ms"] for ip, values in detail.items()
+    }
+    item["dns_success_pct_per_server"] = {
+        ip: values["success_pct"] for ip, values in detail.items()
+    }
+    item["dns_p95_per_server"] = {
+        ip: values["p95_ms"] for ip, values in detail.items()
+    }
+
+
+def measurement_item(row):
+    """API item for a fetch_recent/fetch_latest row."""
+    ts = row[0]
+    return {
+        "ts": ts,
+        "iso": datetime.fromtimestamp(ts, timezone.utc).isoformat(),
+        "avg_latency_ms": row[1],
+        "avg_jitter_ms": row[2],
+        "avg_loss_pct": row[3],
+        "avg_dns_latency_ms": row[4],
+        "score": row[5],
+    }
+
+
+def recent_items(rows):
+    """API items for fetch_recent rows, with the DNS detail of each cycle."""
+    if rows:
+        dns_detail_map = fetch_dns_for_range(rows[0][0], rows[-1][0])
+    else:
+        dns_detail_map = {}
+
+    data = []
+    for row in rows:
+        item = measurement_item(row)
+        if row[0] in dns_detail_map:
+            attach_dns_detail(item, dns_detail_map[row[0]])
+        data.append(item)
+    return data
+
+
+def parse_positive_int_arg(name):
+    """Return query argument ``name`` as a positive int, or None."""
     try:
-        limit = int(request.args.get("limit", "2880"))
+        value = int(request.args.get(name, ""))
     except ValueError:
-        limit = 2880
+        return None
+    return value if value > 0 else None
 
-    rows = fetch_recent(limit)
-    ts_list = [row[0] for row in rows]
-    dns_detail_map = fetch_dns_for_timestamps(ts_list)
 
+def downsampled_items(first_ts, last_ts, bucket):
+    """API items for the measurements between first_ts and last_ts, bucketed."""
+    dns_detail_map = fetch_dns_buckets(first_ts, last_ts, bucket)
     data = []
-    for row in rows:
+    for row in fetch_measurement_buckets(first_ts, last_ts, bucket):
         ts = row[0]
         item = {
             "ts": ts,
             "iso": datetime.fromtimestamp(ts, timezone.utc).isoformat(),
-            "avg_latency_ms": row[1],
-            "avg_jitter_ms": row[2],
-            "avg_loss_pct": row[3],
-            "avg_dns_latency_ms": row[4],
-            "score": row[5],
+            "samples": row[1],
         }
+        for i, metric in enumerate(MEASUREMENT_METRICS):
+            avg_value, min_value, max_value = row[2 + i * 3 : 5 + i * 3]
+            item[metric] = avg_value
+            item[f"{metric}_min"] = min_value
+            item[f"{metric}_max"] = max_value
         if ts in dns_detail_map:
-            item["dns_per_server"] = dns_detail_map[ts]
+            attach_dns_detail(item, dns_detail_map[ts])
         data.append(item)
+    return data
+
+
+def recent_request_args():
+    """(limit, points, bucket, since) of an /api/score/recent request."""
+    try:
+        limit = int(request.args.get("limit", "2880"))
+    except ValueError:
+        limit = 2880
+    return (
+        limit,
+        parse_positive_int_arg("points"),
+        parse_positive_int_arg("bucket"),
+        parse_positive_int_arg("since"),
+    )
+
+
+def recent_hot_validators():
+    """
+    Validators for an /api/score/recent request the hot window answers.
+
+    They name the newest cached cycle and whether it carries DNS detail yet,
+    since remember_dns_summary may attach that after the cycle was cached.
+    Downsampled requests and ones the cache cannot cover return None.
+    """
+    limit, points, bucket, since = recent_request_args()
+    if (points and limit > points) or bucket:
+        return None
+    with HOT_WINDOW_LOCK:
+        if not hot_window_covers(limit, since):
+            return None
+        newest = HOT_WINDOW[-1] if HOT_WINDOW else None
+    if newest is None:
+        return "hot-0", None
+    dns = "dns" if "dns_per_server" in newest else "nodns"
+    return f"hot-{newest['ts']}-{dns}", newest["ts"]
 
+
+@app.route("/api/score/recent")
+@conditional_on("measurements", "dns_measurements", validator=recent_hot_validators)
+def api_recent():
+    """
+    Return the newest ``limit`` probe cycles.
+
+    Query parameters:
+    - limit: number of probe cycles the window covers (default 2880)
+    - points: downsample the window to about this many buckets
+    - bucket: downsample into buckets of this many seconds (wins over points)
+    - since: only return cycles newer than this unix timestamp
+
+    Downsampled items carry the bucket average under the usual keys plus
+    ``<metric>_min`` / ``<metric>_max`` and ``samples``; ``latest`` then holds
+    the newest raw cycle for the gauges. With ``since`` a downsampled reply
+    starts at the bucket holding ``since``, which may have gained samples, so
+    clients replace their last point with it before appending the rest. Pass
+    back the ``bucket_s`` of the first reply so the bins keep lining up.
+    """
+    limit, points, bucket, since = recent_request_args()
+
+    if (points and limit > points) or bucket:
+        latest = None
+        if since and bucket:
+            latest = latest_measurement_item()
+            if latest is None:
+                return jsonify(data=[])
+            last_ts = latest["ts"]
+            first_ts = last_ts - (limit - 1) * PROBE_INTERVAL
+        else:
+            first_ts, last_ts = fetch_recent_window(limit)
+            if first_ts is None:
+                return jsonify(data=[])
+            if not bucket:
+                bucket = align_bucket_to_rollups(
+                    max(1, math.ceil((last_ts - first_ts + 1) / points))
+                )
+        if since:
+            first_ts = max(first_ts, since - since % bucket)
+        if bucket > 1:
+            return jsonify(
+                data=downsampled_items(first_ts, last_ts, bucket),
+                bucket_s=bucket,
+                latest=latest or latest_measurement_item(),
+            )
+
+    data = hot_window_items(limit, since)
+    if data is None:
+        data = recent_items(fetch_recent(limit, since))
     return jsonify(data=data)
 
 
 @app.route("/api/score/latest")
 def api_latest():
-    row = fetch_latest()
-    if not row:
-        return jsonify(data=None)
+    return jsonify(data=latest_measurement_item())
 
-    ts = row[0]
-    data = {
-        "ts": ts,
-        "iso": datetime.fromtimestamp(ts, timezone.utc).isoformat(),
-        "avg_latency_ms": row[1],
-        "avg_jitter_ms": row[2],
-        "avg_loss_pct": row[3],
-        "avg_dns_latency_ms": row[4],
-        "score": row[5],
-    }
-    return jsonify(data=data)
+
+@app.route("/api/ping/recent")
+@conditional_on("ping_samples")
+def api_ping_recent():
+    """
+    Return per-host ping samples with their RTT distribution.
+
+    Query parameters:
+    - limit: maximum number of rows to return
+    - host: only return samples for this ping target
+    """
+    try:
+        limit = int(request.args.get("limit", "2880"))
+    except ValueError:
+        limit = 2880
+    host = request.args.get("host", "").strip() or None
+
+    rows = fetch_ping_samples(limit, host=host)
+    samples = [
+        {
+            "ts": row[0],
+            "iso": datetime.fromtimestamp(row[0], timezone.utc).isoformat(),
+            "host": row[1],
+            "sent": row[2],
+            "received": row[3],
+            "loss_pct": row[4],
+            "latency_ms": row[5],
+            "jitter_ms": row[6],
+            "stddev_ms": row[7],
+            "min_ms": row[8],
+            "max_ms": row[9],
+            "p50_ms": row[10],
+            "p95_ms": row[11],
+            "p99_ms": row[12],
+            "rtts_ms": decode_rtts(row[13]),
+        }
+        for row in rows
+    ]
+    return jsonify(samples=samples)
+
+
+@app.route("/api/dns/queries")
+@conditional_on("dns_queries")
+def api_dns_queries():
+    """
+    Return individual DNS query outcomes.
+
+    Query parameters:
+    - limit: maximum number of queries to return
+    - server: only return queries sent to this DNS server IP
+    """
+    try:
+        limit = int(request.args.get("limit", "500"))
+    except ValueError:
+        limit = 500
+    server_ip = request.args.get("server", "").strip() or None
+
+    rows = fetch_dns_queries(limit, server_ip=server_ip)
+    queries = [
+        {
+            "ts": row[0],
+            "iso": datetime.fromtimestamp(row[0], timezone.utc).isoformat(),
+            "server_ip": row[1],
+            "domain": row[2],
+            "status": row[3],
+            "latency_ms": row[4],
+        }
+        for row in rows
+    ]
+    return jsonify(queries=queries)
+
+
+@app.route("/api/probe/status")
+def api_probe_status():
+    """Return scheduler timing, the per-target ping schedule and retention."""
+    return jsonify(
+        prober={"role": PROBE_ROLE, "active": PROBER_ACTIVE, "pid": os.getpid()},
+        schedules=get_scheduler_stats(),
+        ping_targets=list(PING_SCHEDULE),
+        dns_interval=DNS_PROBE_INTERVAL,
+        retention=dict(get_retention_stats(), days=RETENTION_DAYS),
+    )
 
 
 @app.route("/api/config")
@@ -1623,6 +5479,17 @@ def api_config():
     return jsonify(
         probe_interval=PROBE_INTERVAL,
         ping_count=PING_COUNT,
+        gateway_probe_interval=GATEWAY_PROBE_INTERVAL,
+        gateway_ping_count=GATEWAY_PING_COUNT,
+        router_probe_interval=ROUTER_PROBE_INTERVAL,
+        router_ping_count=ROUTER_PING_COUNT,
+        sites_probe_interval=SITES_PROBE_INTERVAL,
+        sites_ping_count=SITES_PING_COUNT,
+        dns_probe_interval=DNS_PROBE_INTERVAL,
+        probe_target_schedules={
+            host: {"interval": interval, "count": count}
+            for host, (interval, count) in PROBE_TARGET_SCHEDULES.items()
+        },
         app_timezone=APP_TIMEZONE,
         gateway_ip=gw,
         router_ip=ROUTER_IP or None,
@@ -1666,18 +5533,20 @@ def api_config():
             "csv" if SPEEDTEST_CSV else "single" if SPEEDTEST_SERVER else "auto"
         ),
         live_log_poll_seconds=LIVE_LOG_POLL_SECONDS,
+        live_events_max_clients=LIVE_EVENTS_MAX_CLIENTS,
         db_engine=DB_ENGINE,
     )
 
 
 @app.route("/api/speedtest/history")
+@conditional_on("speedtests")
 def api_speedtest_history():
     try:
         limit = int(request.args.get("limit", "100"))
     except ValueError:
         limit = 100
 
-    rows = fetch_speedtests(limit)
+    rows = fetch_speedtests(limit, parse_positive_int_arg("since"))
     tests = [
         {
             "ts": row[0],
@@ -1700,11 +5569,12 @@ def api_speedtest_history():
 
 @app.route("/api/speedtest/latest")
 def api_speedtest_latest():
-    row = fetch_latest_speedtest()
-    if not row:
-        return jsonify(result=None)
+    return jsonify(result=latest_speedtest_item())
 
-    data = {
+
+def speedtest_result_item(row):
+    """API item for a fetch_latest_speedtest row, with the server nested."""
+    return {
         "ts": row[0],
         "iso": datetime.fromtimestamp(row[0], timezone.utc).isoformat(),
         "ping_ms": row[1],
@@ -1720,29 +5590,173 @@ def api_speedtest_latest():
         "requested_server_ids": row[8].split(",") if row[8] else [],
         "backend": row[9] or "python",
     }
-    return jsonify(result=data)
+
+
+def speedtest_request_args(payload):
+    """Validated run_speedtest_internal options from a /api/speedtest/run body."""
+    request_args = {
+        "server_id": payload.get("server_id"),
+        "secure": payload.get("secure"),
+        "force_auto": payload.get("force_auto", False),
+        "backend": payload.get("backend"),
+    }
+    resolve_speedtest_backend(request_args["backend"])
+    parse_optional_bool(request_args["secure"], "secure")
+    force_auto = parse_optional_bool(request_args["force_auto"], "force_auto")
+    resolve_speedtest_selection(request_args["server_id"], force_auto=bool(force_auto))
+    return request_args
 
 
 @app.route("/api/speedtest/run", methods=["POST"])
 def api_speedtest_run():
+    """
+    Queue a manual speedtest and return its job with 202 Accepted.
+
+    With "wait": true in the body the request instead blocks until the job
+    finishes and returns {"success", "result"} as before jobs existed. It
+    gives up with 504 and the job once the job and those queued ahead of it
+    have each had SPEEDTEST_OOKLA_TIMEOUT plus some slack.
+    """
+    payload = request.get_json(silent=True) or {}
     try:
-        payload = request.get_json(silent=True) or {}
-        requested_server_id = payload.get("server_id")
-        secure = payload.get("secure")
-        force_auto = payload.get("force_auto", False)
-        backend = payload.get("backend")
-        result = run_speedtest_internal(
-            requested_server_id=requested_server_id,
-            secure=secure,
-            force_auto=force_auto,
-            backend=backend,
+        request_args = speedtest_request_args(payload)
+        wait = parse_optional_bool(payload.get("wait"), "wait")
+    except ValueError as exc:
+        return jsonify(success=False, error=str(exc)), 400
+
+    try:
+        job_id = enqueue_speedtest_job("manual", request_args)
+        row, ahead = fetch_speedtest_job(job_id)
+        deadline = time.monotonic() + (ahead + 1) * (
+            SPEEDTEST_OOKLA_TIMEOUT + SPEEDTEST_JOB_WAIT_SLACK_SECONDS
         )
-        return jsonify(success=True, result=result)
+        while wait and row[5] not in ("done", "failed"):
+            if time.monotonic() >= deadline:
+                break
+            time.sleep(SPEEDTEST_JOB_POLL_SECONDS)
+            row, ahead = fetch_speedtest_job(job_id)
     except Exception as exc:
         error_message = str(exc).strip() or type(exc).__name__
         logger.exception("Manual speedtest failed: %s", error_message)
         return jsonify(success=False, error=error_message), 500
 
+    job = speedtest_job_item(row, ahead)
+    if not wait:
+        return jsonify(success=True, job=job), 202
+    if job["state"] not in ("done", "failed"):
+        return jsonify(
+            success=False, error="Timed out waiting for the Speedtest job", job=job
+        ), 504
+    if job["state"] == "failed":
+        return jsonify(success=False, error=job["error"]), 500
+    return jsonify(success=True, result=job["result"])
+
+
+def python_server_items(secure):
+    """Cached speedtest-cli servers as API items, nearest first."""
+    client = python_speedtest_config(secure)["client"]
+    origin = (float(client["lat"]), float(client["lon"]))
+    items = []
+    for server in python_speedtest_servers(secure):
+        try:
+            distance_km = speedtest.distance(
+                origin, (float(server["lat"]), float(server["lon"]))
+            )
+        except (KeyError, TypeError, ValueError):
+            continue
+        items.append(
+            {
+                "id": str(server["id"]),
+                "name": server.get("sponsor"),
+                "location": server.get("name"),
+                "country": server.get("country"),
+                "host": server.get("host"),
+                "distance_km": round(distance_km, 1),
+            }
+        )
+    items.sort(key=lambda item: item["distance_km"])
+    return items
+
+
+def ookla_server_items():
+    """Cached Ookla CLI servers as API items, in the CLI's (nearest) order."""
+    return [
+        {
+            "id": server["id"],
+            "name": server.get("name"),
+            "location": server.get("location"),
+            "country": server.get("country"),
+            "host": server.get("host"),
+            "display": server.get("display"),
+        }
+        for server in list_ookla_servers()
+    ]
+
+
+@app.route("/api/speedtest/servers")
+def api_speedtest_servers():
+    """
+    Servers a speedtest can be pointed at, without running one.
+
+    Query parameters:
+    - backend: python or ookla (default SPEEDTEST_BACKEND)
+    - secure: HTTPS server list for the Python backend (default SPEEDTEST_SECURE)
+    - limit: maximum number of servers (default 100)
+    """
+    try:
+        backend = resolve_speedtest_backend(request.args.get("backend"))
+        secure = parse_optional_bool(request.args.get("secure"), "secure")
+    except ValueError as exc:
+        return jsonify(success=False, error=str(exc)), 400
+    secure_mode = SPEEDTEST_SECURE if secure is None else secure
+    protocol = speedtest_protocol(backend, secure_mode)
+    limit = parse_positive_int_arg("limit") or 100
+
+    try:
+        if backend == "python":
+            servers = python_server_items(secure_mode)
+        else:
+            servers = ookla_server_items()
+    except Exception as exc:
+        error_message = str(exc).strip() or type(exc).__name__
+        logger.warning("Speedtest server list failed: %s", error_message)
+        return jsonify(success=False, error=error_message), 502
+
+    excluded = set(SPEEDTEST_EXCLUDE)
+    for server in servers:
+        server["excluded"] = server["id"] in excluded
+    response = jsonify(
+        success=True,
+        backend=backend,
+        protocol=protocol,
+        cache_age_s=speedtest_cache_age((backend, protocol, "servers")),
+        servers=servers[:limit],
+    )
+    response.headers["Cache-Control"] = "private, max-age=60"
+    return response
+
+
+@app.route("/api/speedtest/jobs")
+def api_speedtest_jobs():
+    """Newest speedtest jobs (limit=N, default 20), newest first."""
+    limit = parse_positive_int_arg("limit") or 20
+    jobs = []
+    ahead = 0
+    for row in reversed(fetch_speedtest_jobs(limit)):
+        jobs.append(speedtest_job_item(row, ahead))
+        if row[5] in ("queued", "running"):
+            ahead += 1
+    jobs.reverse()
+    return jsonify(jobs=jobs)
+
+
+@app.route("/api/speedtest/jobs/<int:job_id>")
+def api_speedtest_job(job_id):
+    row, ahead = fetch_speedtest_job(job_id)
+    if row is None:
+        return jsonify(success=False, error=f"No speedtest job {job_id}"), 404
+    return jsonify(success=True, job=speedtest_job_item(row, ahead))
+
 
 @app.route("/api/logs/live")
 def api_logs_live():
@@ -1752,24 +5766,82 @@ def api_logs_live():
     Query parameters:
     - since: last seen sequence number
     - limit: maximum number of lines to return
+    - level: minimum level (debug, info, warning, error, critical)
+    - component: probe, ping, dns, speedtest, db, web or app
+    - q: search words; each must start a word of the message
     """
     since = request.args.get("since", "0")
     limit = request.args.get("limit", "250")
-    return jsonify(get_live_logs(since_seq=since, limit=limit))
+    return jsonify(
+        get_live_logs(
+            since_seq=since,
+            limit=limit,
+            level=request.args.get("level"),
+            component=request.args.get("component"),
+            query=request.args.get("q"),
+        )
+    )
+
+
+@app.route("/api/events")
+def api_events():
+    """
+    Server-Sent Events stream of live updates, pushed once as they happen:
+
+    - probe: a new /api/score/recent item (raw cycle)
+    - speedtest: a new /api/speedtest/latest result
+    - log: one structured record, as in ``records`` of /api/logs/live
+
+    Nothing is read from the database. Returns 503 once
+    LIVE_EVENTS_MAX_CLIENTS streams are open; clients then keep polling.
+    """
+    events = subscribe_events(LIVE_EVENTS_MAX_CLIENTS)
+    if events is None:
+        return jsonify(error="Too many live event streams are open."), 503
+
+    def stream():
+        try:
+            yield "retry: 5000\n\n"
+            # A dropped (lagging) stream ends so the browser reconnects.
+            while events in EVENT_SUBSCRIBERS:
+                try:
+                    yield events.get(timeout=LIVE_EVENTS_KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+        finally:
+            unsubscribe_events(events)
+
+    return Response(
+        stream(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 def start_background_thread():
-    thread = threading.Thread(target=probe_loop, daemon=True)
+    thread = threading.Thread(
+        target=run_prober_election, name="netprobe-election", daemon=True
+    )
     thread.start()
+    return thread
 
 
-# Start probe loop when imported (for gunicorn worker start).
-ensure_db()
-ensure_speedtests_schema()
-start_background_thread()
+# Start the election when imported (for gunicorn worker start). Workers
+# import in parallel, so migrations run one process at a time.
+migration_lock_fd = try_file_lock(MIGRATION_LOCK_PATH, blocking=True)
+try:
+    migrate_db()
+finally:
+    release_file_lock(migration_lock_fd)
+load_hot_window()
+election_thread = start_background_thread()
 
 
 def main():
+    if PROBE_ROLE == "prober":
+        # Dedicated prober (PROBE_ROLE=prober python app.py): no web server.
+        election_thread.join()
+        return
     # For local development only.
     app.run(host="0.0.0.0", port=WEB_PORT)
 
@@ -30,6 +30,7 @@ document.addEventListener("DOMContentLoaded", () => {
 
   const speedtestBackendSelect = document.getElementById("speedtestBackendSelect");
   const speedtestServerInput = document.getElementById("speedtestServerInput");
+  const speedtestServerOptions = document.getElementById("speedtestServerOptions");
   const speedtestSecureCheckbox = document.getElementById(
     "speedtestSecureCheckbox"
   );
@@ -47,6 +48,9 @@ document.addEventListener("DOMContentLoaded", () => {
   const logStatus = document.getElementById("logStatus");
   const liveLogOutput = document.getElementById("liveLogOutput");
   const followLogsCheckbox = document.getElementById("followLogsCheckbox");
+  const logLevelFilter = document.getElementById("logLevelFilter");
+  const logComponentFilter = document.getElementById("logComponentFilter");
+  const logSearchInput = document.getElementById("logSearchInput");
 
   const rangeSelects = document.querySelectorAll(".range-select");
   const panelToggles = document.querySelectorAll(".panel-toggle");
@@ -61,6 +65,24 @@ document.addEventListener("DOMContentLoaded", () => {
   let dnsServerOrder = [];
   let dnsDatasetsInitialized = false;
 
+  // Rows currently plotted, oldest first. Refreshes ask only for rows newer
+  // than the last one (?since=) and patch the charts instead of rebuilding
+  // them. probeBucket is the bin size of a downsampled window (null = raw).
+  let probeRows = [];
+  let probeBucket = null;
+  let probeRequestSeq = 0;
+  let probeFetchesInFlight = 0;
+  let probeRefreshPending = false;
+  let speedtestRows = [];
+  let speedtestRequestSeq = 0;
+  let speedtestFetchesInFlight = 0;
+  let speedtestRefreshPending = false;
+
+  // Live updates pushed over /api/events; the poll timers stand down while
+  // the stream is connected.
+  let liveEvents = null;
+  let liveEventsConnected = false;
+
   // Live log polling state.
   let logViewerOpen = false;
   let logNextSeq = 0;
@@ -69,6 +91,10 @@ document.addEventListener("DOMContentLoaded", () => {
 
   // ----------------- Range -> limit helper -----------------
 
+  // Longer ranges are downsampled server-side to about this many points per
+  // chart, so a year costs the browser the same as an hour.
+  const CHART_POINTS = 720;
+
   function rangeValueToLimit(value) {
     const secondsMap = {
       "5s": 5,
@@ -143,8 +169,12 @@ document.addEventListener("DOMContentLoaded", () => {
     });
   }
 
-  function buildTimeLabels(rows) {
-    return rows.map((row) => formatTickLabelFromTs(row.ts, rows.length));
+  function probeLabel(row) {
+    return formatTickLabelFromTs(row.ts, probeRows.length);
+  }
+
+  function speedtestLabel(row) {
+    return formatTickLabelFromTs(row.ts, speedtestRows.length);
   }
 
   function formatFullTimestamp(tsSeconds) {
@@ -224,6 +254,19 @@ document.addEventListener("DOMContentLoaded", () => {
   const cJitterHistory = makeHistoryChart(document.getElementById("cJitterHistory").getContext("2d"), "Jitter ms");
   const cDnsHistory = makeHistoryChart(document.getElementById("cDnsHistory").getContext("2d"), "DNS ms");
 
+  // DNS tooltips also show the server's success rate and p95 answer time so a
+  // slow resolver can be told apart from a lossy one.
+  cDnsHistory.options.plugins.tooltip.callbacks.label = (ctx) => {
+    const dataset = ctx.dataset;
+    const value = ctx.parsed.y;
+    let text = `${dataset.label}: ${value === null ? "no answer" : `${value.toFixed(1)} ms`}`;
+    const success = dataset.successSeries ? dataset.successSeries[ctx.dataIndex] : null;
+    const p95 = dataset.p95Series ? dataset.p95Series[ctx.dataIndex] : null;
+    if (typeof p95 === "number") text += `, p95 ${p95.toFixed(1)} ms`;
+    if (typeof success === "number") text += `, ${success.toFixed(0)}% ok`;
+    return text;
+  };
+
   const cSpeedHistory = new Chart(
     document.getElementById("cSpeedHistory").getContext("2d"),
     {
@@ -267,6 +310,65 @@ document.addEventListener("DOMContentLoaded", () => {
     return Math.min(val, max);
   }
 
+  // ----------------- Incremental chart updates -----------------
+
+  // Fold rows from a ?since= reply into `rows`. A row with the same ts as the
+  // last one (a downsampled bucket that gained samples) replaces it; newer
+  // rows are appended. The returned patch replays the same edits on a chart.
+  function mergeRows(rows, incoming) {
+    const patch = { reset: false, replaced: null, fresh: [], trim: 0 };
+    incoming.forEach((row) => {
+      const last = rows[rows.length - 1];
+      if (last && row.ts === last.ts) {
+        rows[rows.length - 1] = row;
+        if (patch.fresh.length) {
+          patch.fresh[patch.fresh.length - 1] = row;
+        } else {
+          patch.replaced = row;
+        }
+      } else if (!last || row.ts > last.ts) {
+        rows.push(row);
+        patch.fresh.push(row);
+      }
+    });
+    return patch;
+  }
+
+  function trimRows(rows, patch, count) {
+    if (count <= 0) return;
+    rows.splice(0, count);
+    patch.trim = count;
+  }
+
+  function fullPatch(rows) {
+    return { reset: true, replaced: null, fresh: rows.slice(), trim: 0 };
+  }
+
+  function patchSeries(series, patch, valueFor) {
+    if (patch.replaced && series.length) {
+      series[series.length - 1] = valueFor(patch.replaced);
+    }
+    patch.fresh.forEach((row) => series.push(valueFor(row)));
+    if (patch.trim) series.splice(0, patch.trim);
+  }
+
+  // fieldsByDataset[i] maps dataset property -> value function, e.g.
+  // [{ data: (row) => row.score }].
+  function patchChart(chart, patch, fieldsByDataset, labelFor) {
+    if (patch.reset) chart.data.labels = [];
+    patchSeries(chart.data.labels, patch, labelFor);
+
+    chart.data.datasets.forEach((dataset, idx) => {
+      const fields = fieldsByDataset[idx];
+      if (!fields) return;
+      Object.entries(fields).forEach(([field, valueFor]) => {
+        if (patch.reset || !Array.isArray(dataset[field])) dataset[field] = [];
+        patchSeries(dataset[field], patch, valueFor);
+      });
+    });
+    chart.update();
+  }
+
   // ----------------- DNS per-server helpers -----------------
 
   function ensureDnsDatasets(servers) {
@@ -286,6 +388,8 @@ document.addEventListener("DOMContentLoaded", () => {
         fill: false,
         tension: 0.1,
         hidden: false,
+        // DNS on a slower schedule only has values on some probe rows.
+        spanGaps: (configCache?.dns_probe_interval || probeInterval) > probeInterval,
       });
 
       if (dnsSeriesControls) {
@@ -319,17 +423,95 @@ document.addEventListener("DOMContentLoaded", () => {
 
   // ----------------- Probe data refresh -----------------
 
-  async function refreshProbeData() {
-    const res = await fetch(`/api/score/recent?limit=${currentLimit}`);
-    const json = await res.json();
+  async function refreshProbeData(reset = false) {
+    if (reset) {
+      probeRows = [];
+      probeBucket = null;
+    }
+    const seq = ++probeRequestSeq;
+    const lastRow = probeRows[probeRows.length - 1];
+
+    let url = `/api/score/recent?limit=${currentLimit}&points=${CHART_POINTS}`;
+    if (lastRow) {
+      url += `&since=${lastRow.ts}`;
+      if (probeBucket) url += `&bucket=${probeBucket}`;
+    }
+    let json;
+    probeFetchesInFlight += 1;
+    try {
+      const res = await fetch(url);
+      json = await res.json();
+    } finally {
+      probeFetchesInFlight -= 1;
+    }
+    // A newer request (range change or overlapping tick) owns the charts.
+    if (seq !== probeRequestSeq) return;
     const data = json.data || [];
 
-    if (!data.length) {
+    if (!lastRow && !data.length) {
       generalOutput.textContent = "No probe data yet. Waiting for first measurement...";
+    } else {
+      if (!lastRow) probeBucket = json.bucket_s || null;
+      // Downsampled responses carry the newest raw cycle for the gauges.
+      applyProbeRows(data, json.latest || data[data.length - 1], !lastRow);
+    }
+
+    // A cycle was pushed while this request was out; fetch past it.
+    if (probeRefreshPending && !probeFetchesInFlight) {
+      probeRefreshPending = false;
+      refreshProbeData();
+    }
+  }
+
+  // Fold a probe cycle pushed over /api/events into the newest downsampled
+  // bucket, weighting the averages by sample count like the server does.
+  function foldIntoBucket(sample) {
+    const bucketTs = sample.ts - (sample.ts % probeBucket);
+    const current = probeRows[probeRows.length - 1];
+    const metrics = ["avg_latency_ms", "avg_jitter_ms", "avg_loss_pct", "avg_dns_latency_ms", "score"];
+
+    if (!current || current.ts !== bucketTs) {
+      const row = { ...sample, ts: bucketTs, samples: 1 };
+      metrics.forEach((m) => {
+        row[`${m}_min`] = sample[m];
+        row[`${m}_max`] = sample[m];
+      });
+      return row;
+    }
+
+    const n = current.samples || 1;
+    const row = { ...current, samples: n + 1 };
+    metrics.forEach((m) => {
+      const value = sample[m];
+      if (typeof value !== "number") return;
+      row[m] = typeof current[m] === "number" ? (current[m] * n + value) / (n + 1) : value;
+      row[`${m}_min`] = Math.min(current[`${m}_min`] ?? value, value);
+      row[`${m}_max`] = Math.max(current[`${m}_max`] ?? value, value);
+    });
+    if (!row.dns_per_server && sample.dns_per_server) {
+      row.dns_per_server = sample.dns_per_server;
+      row.dns_success_pct_per_server = sample.dns_success_pct_per_server;
+      row.dns_p95_per_server = sample.dns_p95_per_server;
+    }
+    return row;
+  }
+
+  function handleProbeEvent(sample) {
+    if (probeFetchesInFlight) {
+      probeRefreshPending = true;
+      return;
+    }
+    if (!probeRows.length) {
+      refreshProbeData(true);
       return;
     }
+    applyProbeRows([probeBucket ? foldIntoBucket(sample) : sample], sample, false);
+  }
 
-    const last = data[data.length - 1];
+  // Update the gauges from `last` (the newest raw cycle) and merge `data`
+  // into the plotted window; `reset` starts a new window.
+  function applyProbeRows(data, last, reset) {
+    if (!last) return;
     lastTimestamp = last.ts;
 
     const score = last.score || 0;
@@ -365,46 +547,37 @@ document.addEventListener("DOMContentLoaded", () => {
     document.getElementById("gJitterText").innerText = `Jitter: ${jitter.toFixed(1)} ms`;
     document.getElementById("gDnsText").innerText = `DNS: ${dns.toFixed(1)} ms`;
 
-    const labels = buildTimeLabels(data);
-
-    cScoreHistory.data.labels = labels;
-    cScoreHistory.data.datasets[0].data = data.map((d) => d.score);
-    cScoreHistory.update();
-
-    cLossHistory.data.labels = labels;
-    cLossHistory.data.datasets[0].data = data.map((d) => d.avg_loss_pct);
-    cLossHistory.update();
-
-    cLatencyHistory.data.labels = labels;
-    cLatencyHistory.data.datasets[0].data = data.map((d) => d.avg_latency_ms);
-    cLatencyHistory.update();
-
-    cJitterHistory.data.labels = labels;
-    cJitterHistory.data.datasets[0].data = data.map((d) => d.avg_jitter_ms);
-    cJitterHistory.update();
-
-    cDnsHistory.data.labels = labels;
-
-    const firstRowWithDns = data.find(
-      (row) => row.dns_per_server && Object.keys(row.dns_per_server).length
-    );
-
-    if (firstRowWithDns && firstRowWithDns.dns_per_server) {
-      const servers = Object.keys(firstRowWithDns.dns_per_server);
-      ensureDnsDatasets(servers);
+    const patch = mergeRows(probeRows, data);
+    patch.reset = reset;
 
-      dnsServerOrder.forEach((ip, idx) => {
-        const series = data.map((d) => {
-          if (!d.dns_per_server) return null;
-          const value = d.dns_per_server[ip];
-          return typeof value === "number" ? value : null;
-        });
-        if (cDnsHistory.data.datasets[idx]) {
-          cDnsHistory.data.datasets[idx].data = series;
-        }
-      });
+    // Keep the same window the server would return for a full fetch: the
+    // newest `currentLimit` cycles, or that many probe intervals of buckets.
+    if (probeBucket) {
+      let cutoff = last.ts - (currentLimit - 1) * probeInterval;
+      cutoff -= cutoff % probeBucket;
+      const keepFrom = probeRows.findIndex((row) => row.ts >= cutoff);
+      trimRows(probeRows, patch, keepFrom === -1 ? probeRows.length : keepFrom);
     } else {
-      if (!dnsDatasetsInitialized) {
+      trimRows(probeRows, patch, probeRows.length - currentLimit);
+    }
+    if (!patch.reset && !patch.replaced && !patch.fresh.length && !patch.trim) return;
+
+    patchChart(cScoreHistory, patch, [{ data: (d) => d.score }], probeLabel);
+    patchChart(cLossHistory, patch, [{ data: (d) => d.avg_loss_pct }], probeLabel);
+    patchChart(cLatencyHistory, patch, [{ data: (d) => d.avg_latency_ms }], probeLabel);
+    patchChart(cJitterHistory, patch, [{ data: (d) => d.avg_jitter_ms }], probeLabel);
+
+    // The DNS datasets are created from the first rows that carry per-server
+    // detail; when that happens they are filled from the whole window.
+    let dnsPatch = patch;
+    if (!dnsDatasetsInitialized) {
+      const firstRowWithDns = probeRows.find(
+        (row) => row.dns_per_server && Object.keys(row.dns_per_server).length
+      );
+
+      if (firstRowWithDns) {
+        ensureDnsDatasets(Object.keys(firstRowWithDns.dns_per_server));
+      } else {
         cDnsHistory.data.datasets = [
           {
             label: "DNS ms",
@@ -415,9 +588,23 @@ document.addEventListener("DOMContentLoaded", () => {
         ];
         dnsDatasetsInitialized = true;
       }
-      cDnsHistory.data.datasets[0].data = data.map((d) => d.avg_dns_latency_ms);
+      dnsPatch = fullPatch(probeRows);
     }
-    cDnsHistory.update();
+
+    const pick = (key, ip) => (d) => {
+      if (!d[key]) return null;
+      const value = d[key][ip];
+      return typeof value === "number" ? value : null;
+    };
+
+    const dnsFields = dnsServerOrder.length
+      ? dnsServerOrder.map((ip) => ({
+          data: pick("dns_per_server", ip),
+          successSeries: pick("dns_success_pct_per_server", ip),
+          p95Series: pick("dns_p95_per_server", ip),
+        }))
+      : [{ data: (d) => d.avg_dns_latency_ms }];
+    patchChart(cDnsHistory, dnsPatch, dnsFields, probeLabel);
   }
 
   // ----------------- Config / Env display -----------------
@@ -465,12 +652,33 @@ document.addEventListener("DOMContentLoaded", () => {
     lines.push("");
 
     lines.push("== Ping Targets ==");
-    if (cfg.gateway_ip) lines.push(`Gateway: ${cfg.gateway_ip}`);
-    if (cfg.router_ip) lines.push(`Router: ${cfg.router_ip}`);
-    if (cfg.sites && cfg.sites.length) lines.push(`Sites: ${cfg.sites.join(", ")}`);
+    if (cfg.gateway_ip) {
+      lines.push(
+        `Gateway: ${cfg.gateway_ip} (every ${cfg.gateway_probe_interval}s, ${cfg.gateway_ping_count} pkt)`
+      );
+    }
+    if (cfg.router_ip) {
+      lines.push(
+        `Router: ${cfg.router_ip} (every ${cfg.router_probe_interval}s, ${cfg.router_ping_count} pkt)`
+      );
+    }
+    if (cfg.sites && cfg.sites.length) {
+      lines.push(
+        `Sites: ${cfg.sites.join(", ")} (every ${cfg.sites_probe_interval}s, ${cfg.sites_ping_count} pkt)`
+      );
+    }
+    const overrides = Object.entries(cfg.probe_target_schedules || {});
+    if (overrides.length) {
+      lines.push(
+        `Overrides: ${overrides
+          .map(([host, o]) => `${host}=${o.interval}s${o.count ? `/${o.count} pkt` : ""}`)
+          .join(", ")}`
+      );
+    }
     lines.push("");
 
     lines.push("== DNS ==");
+    lines.push(`Probe interval: ${cfg.dns_probe_interval}s`);
     if (Array.isArray(cfg.dns_test_sites) && cfg.dns_test_sites.length) {
       lines.push(`Test domains: ${cfg.dns_test_sites.join(", ")}`);
     } else if (cfg.dns_test_site) {
@@ -605,6 +813,45 @@ document.addEventListener("DOMContentLoaded", () => {
     return [`Speedtest failed: ${cleaned}`, "", reminder].join("\n");
   }
 
+  // Server ID suggestions come from the cached /api/speedtest/servers list and
+  // are reloaded when the backend or protocol changes.
+  let speedtestServerListKey = null;
+
+  async function loadSpeedtestServers() {
+    if (!speedtestServerOptions) return;
+    const backend = selectedSpeedtestBackend();
+    const secure = speedtestSecureCheckbox ? speedtestSecureCheckbox.checked : true;
+    const key = `${backend}:${secure}`;
+    if (key === speedtestServerListKey) return;
+    speedtestServerListKey = key;
+
+    try {
+      const res = await fetch(
+        `/api/speedtest/servers?backend=${encodeURIComponent(backend)}&secure=${secure}&limit=50`
+      );
+      const json = await res.json();
+      if (!json.success) throw new Error(json.error);
+      speedtestServerOptions.replaceChildren(
+        ...json.servers
+          .filter((server) => !server.excluded)
+          .map((server) => {
+            const option = document.createElement("option");
+            const place = [server.name, server.location, server.country]
+              .filter(Boolean)
+              .join(", ");
+            const distance =
+              typeof server.distance_km === "number" ? ` (${server.distance_km} km)` : "";
+            option.value = server.id;
+            option.label = `${place || server.display || server.id}${distance}`;
+            return option;
+          })
+      );
+    } catch (_) {
+      // Try again the next time the field is focused.
+      speedtestServerListKey = null;
+    }
+  }
+
   function selectedSpeedtestBackend() {
     return speedtestBackendSelect?.value || configCache?.speedtest_backend || "python";
   }
@@ -640,23 +887,59 @@ document.addEventListener("DOMContentLoaded", () => {
     speedtestServerInput.disabled = speedtestForceAutoCheckbox.checked;
   }
 
-  async function refreshSpeedtestHistory() {
-    const res = await fetch(`/api/speedtest/history?limit=${currentLimit}`);
-    const json = await res.json();
-    const tests = json.tests || [];
+  async function refreshSpeedtestHistory(reset = false) {
+    if (reset) speedtestRows = [];
+    const seq = ++speedtestRequestSeq;
+    const lastRow = speedtestRows[speedtestRows.length - 1];
+
+    let url = `/api/speedtest/history?limit=${currentLimit}`;
+    if (lastRow) url += `&since=${lastRow.ts}`;
+    let json;
+    speedtestFetchesInFlight += 1;
+    try {
+      const res = await fetch(url);
+      json = await res.json();
+    } finally {
+      speedtestFetchesInFlight -= 1;
+    }
+    if (seq !== speedtestRequestSeq) return;
+    applySpeedtestRows(json.tests || [], !lastRow);
+
+    if (speedtestRefreshPending && !speedtestFetchesInFlight) {
+      speedtestRefreshPending = false;
+      refreshSpeedtestHistory();
+    }
+  }
+
+  function handleSpeedtestEvent(result) {
+    renderSpeedtestSummary(result);
+    if (speedtestFetchesInFlight) {
+      speedtestRefreshPending = true;
+      return;
+    }
+    applySpeedtestRows([result], !speedtestRows.length);
+  }
+
+  function applySpeedtestRows(tests, reset) {
     if (!tests.length) return;
 
-    const labels = tests.map((t) => formatTickLabelFromTs(t.ts, tests.length));
-    const downs = tests.map((t) => t.download_mbps);
-    const ups = tests.map((t) => t.upload_mbps);
+    const patch = mergeRows(speedtestRows, tests);
+    patch.reset = reset;
+    trimRows(speedtestRows, patch, speedtestRows.length - currentLimit);
 
-    cSpeedHistory.data.labels = labels;
-    cSpeedHistory.data.datasets[0].data = downs;
-    cSpeedHistory.data.datasets[1].data = ups;
-    cSpeedHistory.update();
+    patchChart(
+      cSpeedHistory,
+      patch,
+      [{ data: (t) => t.download_mbps }, { data: (t) => t.upload_mbps }],
+      speedtestLabel
+    );
 
-    const last = tests[tests.length - 1];
-    const maxMbps = Math.max(...downs, ...ups, 1);
+    const last = speedtestRows[speedtestRows.length - 1];
+    const maxMbps = Math.max(
+      ...cSpeedHistory.data.datasets[0].data,
+      ...cSpeedHistory.data.datasets[1].data,
+      1
+    );
     const used = clamp((last.download_mbps / maxMbps) * 100, 100);
     gSpeed.data.datasets[0].data = [used, 100 - used];
     gSpeed.update();
@@ -668,25 +951,65 @@ document.addEventListener("DOMContentLoaded", () => {
     try {
       const res = await fetch("/api/speedtest/latest");
       const json = await res.json();
-      const r = json.result;
-      if (!r) return;
-
-      const serverBits = [];
-      if (r.server?.name) serverBits.push(r.server.name);
-      if (r.server?.country) serverBits.push(r.server.country);
-      const serverText = serverBits.length ? ` via ${serverBits.join(", ")}` : "";
-      const requestedText = r.requested_server_id ? ` [requested ${r.requested_server_id}]` : "";
-      const backendText = r.backend ? ` [${r.backend}]` : "";
-
-      speedtestSummary.textContent = `Speedtest: ${r.download_mbps?.toFixed(1)}↓ / ${r.upload_mbps?.toFixed(1)}↑ Mbps (ping ${r.ping_ms?.toFixed(1)} ms)${serverText}${requestedText}${backendText}`;
+      if (json.result) renderSpeedtestSummary(json.result);
     } catch (_) {
       // Ignore summary refresh errors so the rest of the dashboard keeps working.
     }
   }
 
+  function renderSpeedtestSummary(r) {
+    const serverBits = [];
+    if (r.server?.name) serverBits.push(r.server.name);
+    if (r.server?.country) serverBits.push(r.server.country);
+    const serverText = serverBits.length ? ` via ${serverBits.join(", ")}` : "";
+    const requestedText = r.requested_server_id ? ` [requested ${r.requested_server_id}]` : "";
+    const backendText = r.backend ? ` [${r.backend}]` : "";
+
+    speedtestSummary.textContent = `Speedtest: ${r.download_mbps?.toFixed(1)}↓ / ${r.upload_mbps?.toFixed(1)}↑ Mbps (ping ${r.ping_ms?.toFixed(1)} ms)${serverText}${requestedText}${backendText}`;
+  }
+
+
+  const SPEEDTEST_PHASES = {
+    queued: "queued",
+    starting: "starting",
+    selecting: "selecting a server",
+    ping: "measuring ping",
+    download: "testing download",
+    upload: "testing upload",
+    saving: "saving the result",
+  };
+
+  function describeSpeedtestJob(job) {
+    if (job.state === "queued") {
+      return job.ahead
+        ? `queued behind ${job.ahead} test${job.ahead === 1 ? "" : "s"}`
+        : "queued";
+    }
+    const p = job.progress || {};
+    const bits = [SPEEDTEST_PHASES[job.phase] || job.phase];
+    if (typeof p.pct === "number") bits.push(`${p.pct.toFixed(0)}%`);
+    if (typeof p.ping_ms === "number") bits.push(`ping ${p.ping_ms.toFixed(1)} ms`);
+    if (typeof p.download_mbps === "number") bits.push(`${p.download_mbps.toFixed(1)}↓ Mbps`);
+    if (typeof p.upload_mbps === "number") bits.push(`${p.upload_mbps.toFixed(1)}↑ Mbps`);
+    if (p.server?.name) bits.push(`via ${p.server.name}`);
+    return bits.join(" · ");
+  }
+
+  // Follow a queued job until the prober finishes it; returns the final job.
+  async function watchSpeedtestJob(job) {
+    while (job.state !== "done" && job.state !== "failed") {
+      speedtestSummary.textContent = `Speedtest: ${describeSpeedtestJob(job)}`;
+      await new Promise((resolve) => setTimeout(resolve, 1000));
+      const res = await fetch(`/api/speedtest/jobs/${job.id}`);
+      if (!res.ok) throw new Error(`speedtest job ${job.id}: HTTP ${res.status}`);
+      job = (await res.json()).job;
+    }
+    return job;
+  }
+
   async function runSpeedtestNow() {
-    generalOutput.textContent = "Running speedtest... this can take a bit...";
-    speedtestSummary.textContent = "Speedtest: running...";
+    generalOutput.textContent = "Queueing speedtest... this can take a bit...";
+    speedtestSummary.textContent = "Speedtest: queued";
 
     let requestedServerId = null;
     const backend = selectedSpeedtestBackend();
@@ -705,6 +1028,7 @@ document.addEventListener("DOMContentLoaded", () => {
       return;
     }
 
+    if (btnRunSpeedtest) btnRunSpeedtest.disabled = true;
     try {
       const res = await fetch("/api/speedtest/run", {
         method: "POST",
@@ -734,16 +1058,17 @@ document.addEventListener("DOMContentLoaded", () => {
       }
 
       const json = await res.json();
-      if (!json.success) {
+      const job = json.success ? await watchSpeedtestJob(json.job) : null;
+      if (!job || job.state === "failed") {
         generalOutput.textContent = formatSpeedtestFailure(
-          json.error || "unknown error",
+          (job ? job.error : json.error) || "unknown error",
           backend
         );
         speedtestSummary.textContent = "Speedtest: failed";
         return;
       }
 
-      const r = json.result;
+      const r = job.result;
       const textLines = [
         "== Manual Speedtest Result ==",
         `Time: ${formatFullTimestamp(r.timestamp)}`,
@@ -800,6 +1125,8 @@ document.addEventListener("DOMContentLoaded", () => {
     } catch (err) {
       generalOutput.textContent = formatSpeedtestFailure(err, backend);
       speedtestSummary.textContent = "Speedtest: error";
+    } finally {
+      if (btnRunSpeedtest) btnRunSpeedtest.disabled = false;
     }
   }
 
@@ -835,12 +1162,48 @@ document.addEventListener("DOMContentLoaded", () => {
     }
   }
 
+  // Level / component / search filters are applied by the server; pushed
+  // log events are checked against the same rules in the browser.
+  const LOG_LEVELS = { debug: 10, info: 20, warning: 30, error: 40, critical: 50 };
+  const LOG_TOKEN_RE = /[\w.:-]+/g;
+
+  function logFilterQuery() {
+    const params = new URLSearchParams();
+    if (logLevelFilter?.value) params.set("level", logLevelFilter.value);
+    if (logComponentFilter?.value) params.set("component", logComponentFilter.value);
+    if (logSearchInput?.value.trim()) params.set("q", logSearchInput.value.trim());
+    const query = params.toString();
+    return query ? `&${query}` : "";
+  }
+
+  function logRecordMatches(record) {
+    const minLevel = LOG_LEVELS[logLevelFilter?.value || ""];
+    if (minLevel && (LOG_LEVELS[String(record.level).toLowerCase()] || 0) < minLevel) {
+      return false;
+    }
+    const component = logComponentFilter?.value;
+    if (component && record.component !== component) return false;
+
+    const terms = (logSearchInput?.value || "").toLowerCase().match(LOG_TOKEN_RE) || [];
+    if (!terms.length) return true;
+    const tokens = String(record.message || "").toLowerCase().match(LOG_TOKEN_RE) || [];
+    return terms.every((term) => tokens.some((token) => token.startsWith(term)));
+  }
+
+  function applyLogFilters() {
+    logNextSeq = 0;
+    liveLogOutput.textContent = "Log viewer ready.";
+    refreshLiveLogs(true);
+  }
+
   async function refreshLiveLogs(force = false) {
     if (!logViewerOpen && !force) return;
 
     try {
       const limit = force ? 250 : 120;
-      const res = await fetch(`/api/logs/live?since=${encodeURIComponent(logNextSeq)}&limit=${limit}`);
+      const res = await fetch(
+        `/api/logs/live?since=${encodeURIComponent(logNextSeq)}&limit=${limit}${logFilterQuery()}`
+      );
       const json = await res.json();
       appendLogLines(json.lines || []);
       if (typeof json.next_seq === "number") {
@@ -880,13 +1243,48 @@ document.addEventListener("DOMContentLoaded", () => {
     if (logViewerOpen) {
       updateLogStatus();
       refreshLiveLogs(true);
-      startLogPolling();
+      if (!liveEventsConnected) startLogPolling();
     } else {
       stopLogPolling();
       updateLogStatus();
     }
   }
 
+  // ----------------- Live updates -----------------
+
+  function handleLogEvent(entry) {
+    if (!logViewerOpen || entry.seq <= logNextSeq) return;
+    if (logRecordMatches(entry)) appendLogLines([entry.line]);
+    logNextSeq = entry.seq;
+  }
+
+  // Subscribe to /api/events. While it is connected new probe cycles,
+  // speedtests and log lines arrive as they happen and the poll timers skip
+  // their work; on every (re)connect a since= refresh fills any gap.
+  function startLiveEvents() {
+    if (!window.EventSource || !configCache?.live_events_max_clients) return;
+
+    liveEvents = new EventSource("/api/events");
+    liveEvents.addEventListener("open", () => {
+      liveEventsConnected = true;
+      stopLogPolling();
+      refreshProbeData();
+      refreshSpeedtestHistory();
+      refreshSpeedtestSummaryOnce();
+      refreshLiveLogs();
+    });
+    liveEvents.addEventListener("error", () => {
+      liveEventsConnected = false;
+      if (logViewerOpen && !logPollHandle) startLogPolling();
+      // EventSource reconnects by itself unless the server refused the
+      // stream (e.g. 503 at LIVE_EVENTS_MAX_CLIENTS); polling carries on.
+      if (liveEvents.readyState === EventSource.CLOSED) liveEvents = null;
+    });
+    liveEvents.addEventListener("probe", (e) => handleProbeEvent(JSON.parse(e.data)));
+    liveEvents.addEventListener("speedtest", (e) => handleSpeedtestEvent(JSON.parse(e.data)));
+    liveEvents.addEventListener("log", (e) => handleLogEvent(JSON.parse(e.data)));
+  }
+
   // ----------------- Countdown -----------------
 
   function updateCountdown() {
@@ -959,8 +1357,8 @@ document.addEventListener("DOMContentLoaded", () => {
         other.value = value;
       });
       currentLimit = rangeValueToLimit(value);
-      refreshProbeData();
-      refreshSpeedtestHistory();
+      refreshProbeData(true);
+      refreshSpeedtestHistory(true);
     });
   });
 
@@ -969,6 +1367,7 @@ document.addEventListener("DOMContentLoaded", () => {
     updateBackendControls();
   });
 
+  speedtestServerInput?.addEventListener("focus", loadSpeedtestServers);
   if (speedtestServerInput) {
     speedtestServerInput.addEventListener("input", () => {
       speedtestServerInput.dataset.userEdited = "true";
@@ -996,6 +1395,13 @@ document.addEventListener("DOMContentLoaded", () => {
       liveLogOutput.scrollTop = liveLogOutput.scrollHeight;
     }
   });
+  logLevelFilter?.addEventListener("change", applyLogFilters);
+  logComponentFilter?.addEventListener("change", applyLogFilters);
+  let logSearchTimer = null;
+  logSearchInput?.addEventListener("input", () => {
+    clearTimeout(logSearchTimer);
+    logSearchTimer = setTimeout(applyLogFilters, 300);
+  });
   followLogsCheckbox?.addEventListener("change", () => {
     updateLogStatus();
     if (followLogsCheckbox.checked) {
@@ -1014,9 +1420,11 @@ document.addEventListener("DOMContentLoaded", () => {
       refreshSpeedtestHistory();
       refreshSpeedtestSummaryOnce();
       updateLogStatus();
+      startLiveEvents();
     });
 
   setInterval(() => {
+    if (liveEventsConnected) return;
     refreshProbeData();
     refreshSpeedtestHistory();
     refreshSpeedtestSummaryOnce();
@@ -1026,5 +1434,6 @@ document.addEventListener("DOMContentLoaded", () => {
 
   window.addEventListener("beforeunload", () => {
     stopLogPolling();
+    if (liveEvents) liveEvents.close();
   });
 });